@@ -0,0 +1,541 @@
+"""
+Agregasi per field / region di atas hasil scoring (cluster, distance_to_center, fertility_score).
+
+Setiap sampel diberi tag field_id dan/atau region_id. Untuk setiap id disimpan rollup inkremental
+dalam array NumPy (satu baris per id, kapasitas digandakan saat penuh):
+  - jumlah sampel dan jumlah per cluster             -> cluster share
+  - mean dan M2 fertility_score (Welford / Chan)     -> mean, variance, std
+  - histogram log-bucket distance_to_center          -> percentil aproksimasi (error relatif <= ALPHA)
+  - min / max distance_to_center (exact)
+Query satu id hanya membaca barisnya sendiri (O(n_clusters + n_bucket)), tidak pernah men-scan sampel mentah,
+dan rollup bisa digabung (merge) karena semua komponennya additive.
+
+Beberapa process (worker gunicorn / uvicorn) berbagi rollup lewat satu direktori snapshot (SnapshotDirectory):
+setiap process hanya menulis file miliknya sendiri, query menggabungkan semua file dengan merge().
+
+    python aggregation.py --data farms.csv --save rollups.npz          # kolom field_id / region_id
+    python aggregation.py --load rollups.npz --level region --show jabar
+    python aggregation.py --load rollups/ --level region --show jabar  # direktori snapshot server
+"""
+import argparse
+import fcntl
+import glob
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import FEATURES, fertility_score
+
+LEVELS = ("field", "region")
+# Percentil distance yang dilaporkan secara default
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+# Akurasi relatif sketch distance: estimasi percentil berada dalam +-ALPHA dari nilai sebenarnya
+ALPHA = 0.01
+# Distance di luar [MIN_DISTANCE, MAX_DISTANCE] masuk bucket paling bawah / atas (dibatasi oleh min/max exact)
+MIN_DISTANCE = 1e-3
+MAX_DISTANCE = 1e3
+SNAPSHOT_PATTERN = "rollups-*.npz"
+BASE_SNAPSHOT = "rollups-base.npz"
+
+
+class DistanceSketch:
+    """Log-spaced bucket layout shared by every row of a rollup table (DDSketch-style, fixed range)"""
+
+    def __init__(self, alpha=ALPHA, min_value=MIN_DISTANCE, max_value=MAX_DISTANCE):
+        self.alpha = alpha
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        # Bucket 0: nilai <= min_value, bucket i >= 1: (gamma^(offset+i-1), gamma^(offset+i)]
+        self.n_buckets = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 2
+
+    def bucket(self, values):
+        values = np.maximum(np.asarray(values, dtype=np.float64), self.min_value)
+        keys = np.ceil(np.log(values) / self._log_gamma).astype(np.int64) - self._offset
+        return np.clip(keys, 0, self.n_buckets - 1)
+
+    def value(self, buckets):
+        """Representative value of buckets (relative error <= alpha inside the covered range)"""
+        buckets = np.asarray(buckets, dtype=np.float64)
+        return np.where(buckets == 0, self.min_value,
+                        2 * self.gamma ** (buckets + self._offset) / (self.gamma + 1))
+
+
+class RollupTable:
+    """Incremental per-id rollups in compact arrays (one row per id)"""
+
+    def __init__(self, n_clusters, sketch=None, capacity=64):
+        self.n_clusters = n_clusters
+        self.sketch = sketch or DistanceSketch()
+        self.index = {}
+        self.ids = []
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.cluster_counts = np.zeros((capacity, n_clusters), dtype=np.int64)
+        self.fertility_mean = np.zeros(capacity)
+        self.fertility_m2 = np.zeros(capacity)
+        self.distance_min = np.full(capacity, np.inf)
+        self.distance_max = np.full(capacity, -np.inf)
+        self.distance_hist = np.zeros((capacity, self.sketch.n_buckets), dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def capacity(self):
+        return len(self.count)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.count, self.cluster_counts, self.fertility_mean, self.fertility_m2,
+                                      self.distance_min, self.distance_max, self.distance_hist))
+
+    def _grow(self, capacity):
+        def resize(a, fill=0):
+            grown = np.full((capacity,) + a.shape[1:], fill, dtype=a.dtype)
+            grown[:len(a)] = a
+            return grown
+        self.count = resize(self.count)
+        self.cluster_counts = resize(self.cluster_counts)
+        self.fertility_mean = resize(self.fertility_mean)
+        self.fertility_m2 = resize(self.fertility_m2)
+        self.distance_min = resize(self.distance_min, np.inf)
+        self.distance_max = resize(self.distance_max, -np.inf)
+        self.distance_hist = resize(self.distance_hist)
+
+    def _widen(self, n_clusters):
+        # Model baru dengan lebih banyak cluster: kolom baru dimulai dari nol
+        widened = np.zeros((self.capacity, n_clusters), dtype=np.int64)
+        widened[:, :self.n_clusters] = self.cluster_counts
+        self.cluster_counts = widened
+        self.n_clusters = n_clusters
+
+    def rows(self, ids):
+        """Row of every id (new ids get a fresh row)"""
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, key in enumerate(ids):
+            row = self.index.get(key)
+            if row is None:
+                row = self.index[key] = len(self.ids)
+                self.ids.append(key)
+            rows[i] = row
+        if len(self.ids) > self.capacity:
+            self._grow(max(len(self.ids), 2 * self.capacity))
+        return rows
+
+    def add(self, ids, clusters, distances, fertility):
+        """Fold a batch of scored samples into the rollups of their ids"""
+        keys, inverse = np.unique(np.asarray(ids, dtype=object), return_inverse=True)
+        rows = self.rows(keys.tolist())
+        clusters = np.asarray(clusters, dtype=np.int64)
+        distances = np.asarray(distances, dtype=np.float64)
+        fertility = np.asarray(fertility, dtype=np.float64)
+        if len(clusters) and clusters.max() >= self.n_clusters:
+            self._widen(int(clusters.max()) + 1)
+
+        # Statistik batch per id, lalu digabung dengan rollup lama (Chan et al.)
+        n_b = np.bincount(inverse, minlength=len(keys)).astype(np.float64)
+        mean_b = np.bincount(inverse, fertility, minlength=len(keys)) / n_b
+        m2_b = np.bincount(inverse, (fertility - mean_b[inverse]) ** 2, minlength=len(keys))
+        n_a = self.count[rows].astype(np.float64)
+        n = n_a + n_b
+        delta = mean_b - self.fertility_mean[rows]
+        self.fertility_mean[rows] += delta * n_b / n
+        self.fertility_m2[rows] += m2_b + delta ** 2 * n_a * n_b / n
+        self.count[rows] += n_b.astype(np.int64)
+
+        sample_rows = rows[inverse]
+        np.add.at(self.cluster_counts, (sample_rows, clusters), 1)
+        np.add.at(self.distance_hist, (sample_rows, self.sketch.bucket(distances)), 1)
+        np.minimum.at(self.distance_min, sample_rows, distances)
+        np.maximum.at(self.distance_max, sample_rows, distances)
+
+    def merge(self, other):
+        """Add the rollups of another table (e.g. another worker or an offline run) into this one"""
+        if other.sketch.n_buckets != self.sketch.n_buckets or other.sketch.alpha != self.sketch.alpha:
+            raise ValueError("Layout sketch distance berbeda, rollup tidak bisa digabung")
+        if other.n_clusters > self.n_clusters:
+            self._widen(other.n_clusters)
+        rows = self.rows(other.ids)
+        src = np.arange(len(other.ids))
+        n_a = self.count[rows].astype(np.float64)
+        n_b = other.count[src].astype(np.float64)
+        n = np.maximum(n_a + n_b, 1)
+        delta = other.fertility_mean[src] - self.fertility_mean[rows]
+        self.fertility_mean[rows] += delta * n_b / n
+        self.fertility_m2[rows] += other.fertility_m2[src] + delta ** 2 * n_a * n_b / n
+        self.count[rows] += other.count[src]
+        self.cluster_counts[rows, :other.n_clusters] += other.cluster_counts[src]
+        self.distance_hist[rows] += other.distance_hist[src]
+        self.distance_min[rows] = np.minimum(self.distance_min[rows], other.distance_min[src])
+        self.distance_max[rows] = np.maximum(self.distance_max[rows], other.distance_max[src])
+
+    def quantiles(self, row, qs=DEFAULT_QUANTILES):
+        hist = self.distance_hist[row]
+        total = int(self.count[row])
+        if total == 0:
+            return {}
+        cumulative = np.cumsum(hist)
+        # Rank (0-based) seperti percentil "lower"; hasil dibatasi min/max exact
+        ranks = np.floor(np.asarray(qs) * (total - 1))
+        buckets = np.searchsorted(cumulative, ranks, side="right")
+        values = np.clip(self.sketch.value(buckets), self.distance_min[row], self.distance_max[row])
+        return {f"p{q * 100:g}": round(float(v), 4) for q, v in zip(qs, values)}
+
+    def summary(self, key, qs=DEFAULT_QUANTILES):
+        """Rollup of one id, or None if it has no samples"""
+        row = self.index.get(key)
+        if row is None:
+            return None
+        n = int(self.count[row])
+        variance = max(self.fertility_m2[row] / n, 0.0) if n else 0.0
+        return {
+            "count": n,
+            "cluster_counts": self.cluster_counts[row].tolist(),
+            "cluster_share": [round(c / n, 4) for c in self.cluster_counts[row].tolist()],
+            "fertility_score": {"mean": round(float(self.fertility_mean[row]), 4),
+                                "variance": round(float(variance), 4), "std": round(math.sqrt(variance), 4)},
+            "distance_to_center": {"min": round(float(self.distance_min[row]), 4),
+                                   "max": round(float(self.distance_max[row]), 4), **self.quantiles(row, qs)},
+        }
+
+    def listing(self):
+        return [{"id": key, "count": int(c)} for key, c in zip(self.ids, self.count[:len(self.ids)].tolist())]
+
+    def subset(self, keys):
+        """Copy of the rows of keys (ids without samples are skipped)"""
+        rows = [self.index[key] for key in keys if key in self.index]
+        table = RollupTable(self.n_clusters, self.sketch, capacity=max(len(rows), 1))
+        table.rows([self.ids[row] for row in rows])
+        n = len(rows)
+        table.count[:n] = self.count[rows]
+        table.cluster_counts[:n] = self.cluster_counts[rows]
+        table.fertility_mean[:n] = self.fertility_mean[rows]
+        table.fertility_m2[:n] = self.fertility_m2[rows]
+        table.distance_min[:n] = self.distance_min[rows]
+        table.distance_max[:n] = self.distance_max[rows]
+        table.distance_hist[:n] = self.distance_hist[rows]
+        return table
+
+    def state(self, prefix):
+        n = len(self.ids)
+        return {f"{prefix}ids": np.array(self.ids, dtype=str), f"{prefix}count": self.count[:n],
+                f"{prefix}cluster_counts": self.cluster_counts[:n], f"{prefix}fertility_mean": self.fertility_mean[:n],
+                f"{prefix}fertility_m2": self.fertility_m2[:n], f"{prefix}distance_min": self.distance_min[:n],
+                f"{prefix}distance_max": self.distance_max[:n], f"{prefix}distance_hist": self.distance_hist[:n]}
+
+    @classmethod
+    def from_state(cls, state, prefix, sketch):
+        cluster_counts = state[f"{prefix}cluster_counts"]
+        table = cls(cluster_counts.shape[1], sketch, capacity=max(len(cluster_counts), 64))
+        table.rows(state[f"{prefix}ids"].tolist())
+        n = len(table.ids)
+        table.count[:n] = state[f"{prefix}count"]
+        table.cluster_counts[:n] = cluster_counts
+        table.fertility_mean[:n] = state[f"{prefix}fertility_mean"]
+        table.fertility_m2[:n] = state[f"{prefix}fertility_m2"]
+        table.distance_min[:n] = state[f"{prefix}distance_min"]
+        table.distance_max[:n] = state[f"{prefix}distance_max"]
+        table.distance_hist[:n] = state[f"{prefix}distance_hist"]
+        return table
+
+
+def tag_column(rows, name):
+    """String ids of one tag (None where the sample has no tag), or None if no sample carries it"""
+    tags = [row.get(name) if isinstance(row, dict) else None for row in rows]
+    if all(tag is None for tag in tags):
+        return None
+    return [None if tag is None else str(tag) for tag in tags]
+
+
+class AggregationEngine:
+    """Per-field and per-region rollups of scored samples (thread-safe)"""
+
+    def __init__(self, n_clusters, alpha=ALPHA):
+        sketch = DistanceSketch(alpha)
+        self.tables = {level: RollupTable(n_clusters, sketch) for level in LEVELS}
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def add_scored(self, tags, clusters, distances, fertility):
+        """Add already scored samples; tags maps level -> list of ids (None = sample not tagged at that level)"""
+        clusters, distances, fertility = np.asarray(clusters), np.asarray(distances), np.asarray(fertility)
+        with self._lock:
+            for level, ids in tags.items():
+                if ids is None:
+                    continue
+                ids = np.asarray(ids, dtype=object)
+                tagged = np.flatnonzero(ids != None)  # noqa: E711 (perbandingan elementwise)
+                if len(tagged):
+                    self.tables[level].add(ids[tagged], clusters[tagged], distances[tagged], fertility[tagged])
+            self.samples += len(clusters)
+
+    def ingest(self, scorer, X, tags):
+        """Score X (n, 7) in one batch and add it; returns (clusters, distances, fertility)"""
+        clusters, distances = scorer.score_batch(X)
+        fertility = fertility_score(X)
+        self.add_scored(tags, clusters, distances, fertility)
+        return clusters, distances, fertility
+
+    def summary(self, level, key, qs=DEFAULT_QUANTILES):
+        with self._lock:
+            return self.tables[level].summary(key, qs)
+
+    def listing(self, level):
+        with self._lock:
+            return self.tables[level].listing()
+
+    def subset(self, level, keys):
+        with self._lock:
+            return self.tables[level].subset(keys)
+
+    def merge(self, other):
+        with self._lock:
+            for level in LEVELS:
+                self.tables[level].merge(other.tables[level])
+            self.samples += other.samples
+
+    def close(self):
+        """Nothing to persist for an in-memory engine (see SnapshotDirectory)"""
+
+    def stats(self):
+        with self._lock:
+            return {"samples": self.samples, **{f"{level}s": len(t) for level, t in self.tables.items()},
+                    "bytes": sum(t.nbytes for t in self.tables.values())}
+
+    def save(self, path):
+        """Write a snapshot (.npz); written to a temporary file first, so readers never see half a file"""
+        with self._lock:
+            state = {"samples": np.int64(self.samples), "alpha": np.float64(self.tables["field"].sketch.alpha)}
+            for level, table in self.tables.items():
+                state.update(table.state(f"{level}_"))
+        tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **state)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as state:
+            engine = cls(1, float(state["alpha"]))
+            sketch = engine.tables["field"].sketch
+            engine.tables = {level: RollupTable.from_state(state, f"{level}_", sketch) for level in LEVELS}
+            engine.samples = int(state["samples"])
+        return engine
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SnapshotDirectory:
+    """Rollups shared by the processes of one host through one snapshot file per process in a directory
+
+    Samples go to the live engine of this process only, written to <dir>/rollups-<pid>-<start>.npz every
+    flush_interval seconds (when changed) and at exit. Queries merge the snapshots of the other processes
+    with the live engine, so every worker answers with the same totals (at most flush_interval seconds
+    behind). Snapshots of processes that no longer run are compacted into rollups-base.npz.
+    """
+
+    def __init__(self, directory, n_clusters, alpha=ALPHA, flush_interval=5.0):
+        self.directory = directory
+        self.n_clusters = n_clusters
+        self.alpha = alpha
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        self._pid = None
+        self._live = None
+        self.path = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flushed_samples = 0
+        self._dirty = False
+        # Snapshot process lain: {path: (stamp, engine)}, file hanya dibaca ulang jika stamp-nya berubah.
+        # Query satu id membaca baris id itu dari setiap engine; merge penuh hanya untuk others() / merged().
+        self._files = {}
+        self._others = None
+        self._others_stamp = None
+
+    def live(self):
+        """Engine of this process (a new, empty one after fork: the parent's samples are in its own file)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._live = AggregationEngine(self.n_clusters, self.alpha)
+                    self.path = os.path.join(self.directory, f"rollups-{os.getpid()}-{time.time_ns()}.npz")
+                    self._files, self._others, self._others_stamp = {}, None, None
+                    self._dirty = False
+                    self._stop.clear()
+                    self._pid = os.getpid()
+                    if self.flush_interval > 0:
+                        threading.Thread(target=self._run, name="aggregation-flush", daemon=True).start()
+        return self._live
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._dirty:
+                self.flush()
+
+    def _locked(self, mode):
+        """Open lock file of the directory, flock-ed in mode (LOCK_SH to read, LOCK_EX to compact)"""
+        f = open(os.path.join(self.directory, ".lock"), "a")
+        fcntl.flock(f, mode)
+        return f
+
+    def flush(self):
+        """Write this process's snapshot, then compact the snapshots of exited processes"""
+        if self._pid != os.getpid():
+            return
+        self._dirty = False
+        self._live.save(self.path)
+        self.compact()
+
+    def compact(self):
+        with self._locked(fcntl.LOCK_EX):
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, SNAPSHOT_PATTERN)):
+                pid = os.path.basename(path).split("-")[1]
+                if pid.isdigit() and path != self.path and not _process_alive(int(pid)):
+                    dead.append(path)
+            if not dead:
+                return
+            base_path = os.path.join(self.directory, BASE_SNAPSHOT)
+            base = AggregationEngine.load(base_path) if os.path.exists(base_path) else AggregationEngine(
+                self.n_clusters, self.alpha)
+            for path in dead:
+                base.merge(AggregationEngine.load(path))
+            base.save(base_path)
+            for path in dead:
+                os.remove(path)
+
+    def close(self):
+        """Final flush of this process (atexit / worker_exit)"""
+        if self._pid == os.getpid():
+            self._stop.set()
+            self.flush()
+
+    def snapshots(self):
+        """Engines of every snapshot except this process's own (a file is re-read only when it changed)"""
+        self.live()
+        with self._locked(fcntl.LOCK_SH):
+            paths = sorted(p for p in glob.glob(os.path.join(self.directory, SNAPSHOT_PATTERN)) if p != self.path)
+            files = {}
+            for path in paths:
+                st = os.stat(path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                cached = self._files.get(path)
+                files[path] = cached if cached is not None and cached[0] == stamp else (
+                    stamp, AggregationEngine.load(path))
+        self._files = files
+        return [engine for _, engine in files.values()]
+
+    def others(self):
+        """Merged rollups of every snapshot except this process's own (re-merged only when a file changed)"""
+        engines = self.snapshots()
+        stamps = {path: stamp for path, (stamp, _) in self._files.items()}
+        if stamps != self._others_stamp:
+            merged = AggregationEngine(self.n_clusters, self.alpha)
+            for engine in engines:
+                merged.merge(engine)
+            self._others, self._others_stamp = merged, stamps
+        return self._others
+
+    def engines(self):
+        return [*self.snapshots(), self.live()]
+
+    def add_scored(self, tags, clusters, distances, fertility):
+        self.live().add_scored(tags, clusters, distances, fertility)
+        self._dirty = True
+
+    def ingest(self, scorer, X, tags):
+        result = self.live().ingest(scorer, X, tags)
+        self._dirty = True
+        return result
+
+    def summary(self, level, key, qs=DEFAULT_QUANTILES):
+        engines = self.engines()
+        table = RollupTable(self.n_clusters, engines[-1].tables[level].sketch)
+        for engine in engines:
+            table.merge(engine.subset(level, [key]))
+        return table.summary(key, qs)
+
+    def listing(self, level):
+        counts = {}
+        for engine in self.engines():
+            for row in engine.listing(level):
+                counts[row["id"]] = counts.get(row["id"], 0) + row["count"]
+        return [{"id": key, "count": count} for key, count in counts.items()]
+
+    def stats(self):
+        engines = self.engines()
+        stats = {"samples": sum(engine.samples for engine in engines)}
+        for level in LEVELS:
+            stats[f"{level}s"] = len(set().union(*(engine.tables[level].ids for engine in engines)))
+        return {**stats, "bytes": sum(engine.stats()["bytes"] for engine in engines), "snapshots": len(self._files)}
+
+    def merged(self):
+        """One engine with every process's rollups (for the CLI / offline export)"""
+        merged = AggregationEngine(self.n_clusters, self.alpha)
+        for engine in self.engines():
+            merged.merge(engine)
+        return merged
+
+
+def load_rollups(path):
+    """Engine from a snapshot file or from a server's snapshot directory (all processes merged)"""
+    if os.path.isdir(path):
+        return SnapshotDirectory(path, 1, flush_interval=0).merged()
+    return AggregationEngine.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="CSV berisi kolom fitur dan kolom id field / region")
+    parser.add_argument("--field-column", default="field_id")
+    parser.add_argument("--region-column", default="region_id")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--load", help="Snapshot rollup (.npz) atau direktori snapshot server yang dimuat / digabung")
+    parser.add_argument("--save", help="Simpan snapshot rollup ke file .npz")
+    parser.add_argument("--level", choices=LEVELS, default="region")
+    parser.add_argument("--show", nargs="*", help="Tampilkan rollup id ini (tanpa id: 10 id pertama)")
+    args = parser.parse_args()
+
+    import json
+    engine = load_rollups(args.load) if args.load else None
+    if args.data:
+        import pandas as pd
+        from model_bundle import load_bundle
+        scorer = load_bundle().scorer()
+        data = engine
+        engine = AggregationEngine(scorer.n_clusters)
+        for chunk in pd.read_csv(args.data, chunksize=args.chunk_size):
+            tags = {level: chunk[column].astype(str).where(chunk[column].notna(), None).tolist()
+                    for level, column in (("field", args.field_column), ("region", args.region_column))
+                    if column in chunk}
+            engine.ingest(scorer, chunk[FEATURES].to_numpy(dtype=np.float64), tags)
+        if data is not None:
+            engine.merge(data)
+    if engine is None:
+        parser.error("--data atau --load wajib diisi")
+
+    print(f"[INFO] Rollup: {json.dumps(engine.stats())}")
+    if args.show is not None:
+        for key in args.show or [row["id"] for row in engine.listing(args.level)[:10]]:
+            print(f"  {args.level} {key}: {json.dumps(engine.summary(args.level, key))}")
+    if args.save:
+        engine.save(args.save)
+        print(f"[INFO] Snapshot disimpan: {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,187 @@
-from flask import Flask, request, jsonify, render_template
-import pandas as pd
-import joblib
+from flask import Flask, request, jsonify, render_template, Response
 import numpy as np
+import json
 import os
+import time
+from inference import FEATURES, fertility_score as batch_fertility_score
+from model_bundle import load_bundle, BUNDLE_PATH
+from prediction_cache import PredictionCache, parse_quantum
+from online_update import FeedbackSpool, model_drift, promoted_bundle, SPOOL_PATH
+from model_reload import ModelReloader, file_stamp
+from precision_check import compare_precision
+from model_registry import default_registry, ModelUnavailable
+from shared_store import attach_from_env
+from prediction_log import PredictionLog
+from feature_schema import FeatureSchema, InvalidInput
+from aggregation import AggregationEngine, SnapshotDirectory, BASE_SNAPSHOT, DEFAULT_QUANTILES, LEVELS, tag_column
+import metrics
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
-# Load model clustering dan scaler
-try:
-    model_cluster = joblib.load("model_cluster.pkl")
-    scaler = joblib.load("scaler.pkl")
-    cluster_info = joblib.load("cluster_info.pkl")
-except Exception as e:
-    print(f"[ERROR] Gagal memuat file: {e}")
-    print("[INFO] Pastikan sudah menjalankan train_model.py terlebih dahulu")
-    exit()
+# Batas ukuran request untuk /predict/batch (bisa diatur lewat environment)
+BATCH_MAX_ROWS = int(os.environ.get("BATCH_MAX_ROWS", 50000))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", 16 * 1024 * 1024))
+
+# Cache response /predict (opsional, aktif jika PREDICT_CACHE_SIZE > 0).
+# Input dibulatkan per fitur sesuai PREDICT_CACHE_QUANTUM, mis. "N=1,P=1,K=1,ph=0.1", hanya untuk key cache:
+# miss di-score dari input asli, hit mengembalikan hasil sampel pertama di bucket yang sama (lihat tolerance).
+PREDICT_CACHE_SIZE = int(os.environ.get("PREDICT_CACHE_SIZE", 0))
+prediction_cache = None
+if PREDICT_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(
+        max_size=PREDICT_CACHE_SIZE,
+        ttl=float(os.environ.get("PREDICT_CACHE_TTL", 300)),
+        quantum=parse_quantum(os.environ.get("PREDICT_CACHE_QUANTUM")),
+    )
+
+# Online learning (opsional): sampel terkonfirmasi dari POST /feedback ditulis ke spool yang
+# diproses oleh online_update.py, dan model baru dari file bundle dipakai tanpa restart worker.
+ONLINE_LEARNING = os.environ.get("ONLINE_LEARNING", "0") == "1"
+feedback_spool = FeedbackSpool(os.environ.get("ONLINE_SPOOL", SPOOL_PATH)) if ONLINE_LEARNING else None
+# Hot reload: interval (detik) pengecekan file model bundle oleh thread background, 0 = hanya lewat
+# signal / endpoint admin. Model baru divalidasi dulu terhadap canary set dari data_core.csv.
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+RELOAD_CANARY = os.environ.get("RELOAD_CANARY", "data_core.csv")
+RELOAD_MAX_DISTANCE_RATIO = float(os.environ.get("RELOAD_MAX_DISTANCE_RATIO", 2.0))
+# Mode scoring float32 (opsional). Setiap model yang dimuat dicek dulu terhadap float64 pada canary set;
+# jika ada assignment yang berbeda jauh dari batas cluster, worker kembali ke float64 (lihat precision_check.py)
+SCORING_DTYPE = os.environ.get("SCORING_DTYPE", "float64")
+# Agregasi per field / region (opsional): sampel ber-tag field_id / region_id dari /aggregate/ingest dan
+# /predict/batch dijumlahkan ke rollup inkremental (aggregation.py). Tanpa AGGREGATION_SNAPSHOT state hanya
+# ada di memori process (pakai satu worker). AGGREGATION_SNAPSHOT berisi direktori: setiap worker menulis
+# snapshot miliknya sendiri (tiap AGGREGATION_FLUSH_SECONDS dan saat berhenti), query menggabungkan semuanya.
+AGGREGATION = os.environ.get("AGGREGATION", "0") == "1"
+AGGREGATION_SNAPSHOT = os.environ.get("AGGREGATION_SNAPSHOT")
+AGGREGATION_FLUSH_SECONDS = float(os.environ.get("AGGREGATION_FLUSH_SECONDS", 5))
+# Log prediksi append-only (opsional, aktif jika PREDICTION_LOG berisi direktori): input dan output setiap
+# prediksi ditulis thread background ke segment terkompresi (prediction_log.py), request tidak pernah menunggu disk
+PREDICTION_LOG = os.environ.get("PREDICTION_LOG")
+PREDICTION_LOG_QUEUE = int(os.environ.get("PREDICTION_LOG_QUEUE", 100_000))
+PREDICTION_LOG_SEGMENT_MB = float(os.environ.get("PREDICTION_LOG_SEGMENT_MB", 64))
+# Token untuk POST /admin/reload (endpoint mati jika tidak di-set)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Rentang valid (ditolak jika di luar) dan rentang data training (ditandai out_of_distribution) per fitur
+schema = FeatureSchema.load(os.environ.get("FEATURE_RANGES", "feature_ranges.json"))
+
+bundle = None
+scorer = None
+# (scorer, bundle) yang selalu berpasangan: satu rebind global, jadi pembaca tidak pernah melihat scorer
+# dari model lama dengan checksum model baru saat hot reload
+active_model = (None, None)
+model_generation = 0
+model_load_error = None
+model_load_seconds = None
+model_drift_last = None
+
+def bundle_path():
+    """Active bundle: with online learning the learner's bundle, as long as it was built on the current one"""
+    path = os.environ.get("MODEL_BUNDLE", BUNDLE_PATH)
+    if ONLINE_LEARNING:
+        return promoted_bundle(path, os.environ.get("ONLINE_BUNDLE"))
+    return path
+
+def install_model(new_bundle, new_scorer, stamp=None, report=None):
+    """Swap in an already loaded model; requests in flight keep their reference to the old one"""
+    global bundle, scorer, active_model, model_generation, model_load_error, model_drift_last
+    old_scorer = scorer
+    active_model = (new_scorer, new_bundle)
+    bundle, scorer = new_bundle, new_scorer
+    model_generation += 1
+    model_load_error = None
+    reloader.stamp = stamp
+    # Hasil yang di-cache berasal dari model lama, buang semuanya
+    if prediction_cache is not None:
+        prediction_cache.invalidate(model_generation)
+    if old_scorer is not None:
+        model_drift_last = model_drift(old_scorer, new_scorer)
+        print(f"[INFO] Model diganti (generasi {model_generation}, crc32={new_bundle.checksum:08x}): "
+              f"{json.dumps(model_drift_last)}")
+
+def make_scorer(new_bundle):
+    """Scorer in SCORING_DTYPE, or float64 if the reduced precision fails its guardrail"""
+    # Parameter dari shared memory jika segment berisi versi model yang sama (lihat shared_store.py)
+    new_scorer = shared_store.cluster_scorer(new_bundle) if shared_store is not None else None
+    if new_scorer is None:
+        new_scorer = new_bundle.scorer()
+    if SCORING_DTYPE == "float64":
+        return new_scorer
+    canary = reloader.canary()
+    report = compare_precision(new_scorer, canary, SCORING_DTYPE) if canary is not None else None
+    if report is not None and report["far_from_boundary"]:
+        print(f"[ERROR] Scoring {SCORING_DTYPE} tidak konsisten dengan float64 "
+              f"({report['far_from_boundary']} baris canary), memakai float64")
+        return new_scorer
+    return new_scorer.with_dtype(SCORING_DTYPE)
+
+def load_model(path=None):
+    """Load the model bundle; on failure keep the previous model (if any) and report the error"""
+    global model_load_error, model_load_seconds
+    start = time.perf_counter()
+    path = path or bundle_path()
+    try:
+        stamp = (file_stamp(path), file_stamp(path + ".reload"))
+        new_bundle = load_bundle(path)
+        # Kernel inference NumPy (tanpa DataFrame / validasi sklearn per request)
+        install_model(new_bundle, make_scorer(new_bundle), stamp)
+    except Exception as e:
+        model_load_error = str(e)
+        print(f"[ERROR] Gagal memuat file: {e}")
+        print("[INFO] Pastikan sudah menjalankan train_model.py terlebih dahulu")
+    model_load_seconds = time.perf_counter() - start
+    return model_load_error is None
+
+reloader = ModelReloader(bundle_path, lambda: scorer, install_model, interval=MODEL_WATCH_INTERVAL,
+                         canary_path=RELOAD_CANARY, max_distance_ratio=RELOAD_MAX_DISTANCE_RATIO,
+                         make_scorer=make_scorer)
+
+def install_reload_signal():
+    """SIGHUP -> reload in the background (called per worker, see gunicorn.conf.py post_worker_init)"""
+    import signal
+    signal.signal(signal.SIGHUP, lambda signum, frame: reloader.request())
+    reloader.ensure_started()
+
+# Model klasifikasi tanaman dan regresi fertility (pickle), dimuat saat pertama dipakai oleh /predict/all.
+# Dengan MODEL_SHM (shared_store.py) semua array model dibaca dari satu segment shared memory
+shared_store = attach_from_env()
+registry = default_registry(shared_store)
+# PRELOAD_MODELS="crop,fertility": muat saat import (dengan gunicorn --preload dibagi ke worker lewat fork)
+for _name in filter(None, os.environ.get("PRELOAD_MODELS", "").split(",")):
+    try:
+        registry.get(_name.strip())
+    except ModelUnavailable:
+        pass
+
+# Load model clustering dan scaler dari model bundle (mmap, tanpa sklearn).
+# Dengan gunicorn --preload ini berjalan sekali di master, worker berbagi page hasil fork.
+load_model()
+
+prediction_log = None
+if PREDICTION_LOG:
+    import atexit
+    prediction_log = PredictionLog(PREDICTION_LOG, max_pending=PREDICTION_LOG_QUEUE,
+                                   segment_bytes=int(PREDICTION_LOG_SEGMENT_MB * 1024 * 1024))
+    atexit.register(prediction_log.close)
+
+aggregation = None
+if AGGREGATION:
+    n_clusters = scorer.n_clusters if scorer is not None else 1
+    if AGGREGATION_SNAPSHOT:
+        if os.path.isfile(AGGREGATION_SNAPSHOT):
+            raise SystemExit(f"[ERROR] AGGREGATION_SNAPSHOT={AGGREGATION_SNAPSHOT} adalah file; sekarang harus "
+                             f"direktori (pindahkan file lama ke dalamnya sebagai {BASE_SNAPSHOT})")
+        import atexit
+        aggregation = SnapshotDirectory(AGGREGATION_SNAPSHOT, n_clusters, flush_interval=AGGREGATION_FLUSH_SECONDS)
+        atexit.register(aggregation.close)
+    else:
+        aggregation = AggregationEngine(n_clusters)
+
+@app.before_request
+def start_model_reloader():
+    # Thread watcher dijalankan per process (setelah fork), bukan di master gunicorn
+    reloader.ensure_started()
+    if prediction_log is not None:
+        prediction_log.ensure_started()
 
 # Route halaman utama
 @app.route('/')
@@ -25,79 +192,395 @@ def index():
 def input_data():
     return render_template('input_data.html')
 
+# Liveness: proses hidup dan bisa melayani request
+@app.route('/healthz')
+def healthz():
+    return jsonify({"status": "ok"})
+
+# Readiness: model sudah termuat dan siap dipakai untuk prediksi
+@app.route('/ready')
+def ready():
+    if scorer is None:
+        return jsonify({"status": "not ready", "error": model_load_error}), 503
+    return jsonify({
+        "status": "ready",
+        "n_clusters": scorer.n_clusters,
+        "scoring_dtype": scorer.dtype.name,
+        "model_checksum": f"{bundle.checksum:08x}",
+        "model_load_ms": round(model_load_seconds * 1000, 3),
+        "model_generation": model_generation,
+        "model_drift": model_drift_last,
+        "last_reload": reloader.last_result,
+        "models": registry.status(),
+    })
+
+def model_not_ready():
+    return jsonify({"error": "Model belum siap", "detail": model_load_error}), 503
+
+def length_required():
+    # Tanpa Content-Length (mis. chunked) ukuran body tidak bisa dicek sebelum dibaca
+    return jsonify({"error": "Header Content-Length wajib ada"}), 411
+
+def body_too_large():
+    return jsonify({"error": f"Body maksimal {BATCH_MAX_BYTES} bytes"}), 413
+
 # Route prediksi cluster
 @app.route('/predict', methods=["POST"])
 def predict():
-    data = request.get_json()
-    
-    features = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+    timer = metrics.timer("predict")
     try:
-        # Buat dataframe input dan scaling
-        df_input = pd.DataFrame([data], columns=features)
-        df_scaled = scaler.transform(df_input)
-
-        # Prediksi cluster
-        cluster_pred = model_cluster.predict(df_scaled)[0]
-        
-        # Hitung jarak ke cluster center
-        cluster_center = model_cluster.cluster_centers_[cluster_pred]
-        distance_to_center = np.linalg.norm(df_scaled[0] - cluster_center)
-        
-        # Ambil karakteristik cluster
-        cluster_characteristics = cluster_info.iloc[cluster_pred].to_dict()
-        
-        # Hitung fertility score (formula sederhana)
-        fertility_score = data['N'] * 0.4 + data['P'] * 0.3 + data['K'] * 0.3
-        fertility_score = round(fertility_score, 2)
-        
-        # Deskripsi cluster berdasarkan karakteristik
-        cluster_desc = generate_cluster_description(cluster_pred, cluster_characteristics)
-
-        return jsonify({
-            "cluster": int(cluster_pred),
-            "cluster_name": f"Cluster {cluster_pred}",
-            "distance_to_center": round(float(distance_to_center), 4),
-            "fertility_score": fertility_score,
-            "cluster_characteristics": cluster_characteristics,
-            "cluster_description": cluster_desc
-        })
-    except Exception as e:
+        if scorer is None:
+            timer.finish("not_ready")
+            return model_not_ready()
+
+        x, errors, ood = schema.validate_one(request.get_json(silent=True))
+        timer.mark("json_parse")
+        if errors:
+            timer.finish("client_error")
+            return invalid_sample_response(errors)
+        outcome = "ok"
+        if prediction_cache is None:
+            result, cluster_pred, distance_to_center, checksum = score_prediction(x, timer)
+        else:
+            generation = model_generation
+            key = prediction_cache.key(x)
+            entry = prediction_cache.get(key)
+            timer.mark("cache_lookup")
+            outcome = "cache_hit"
+            if entry is None:
+                # Nilai yang dibulatkan hanya dipakai sebagai key; miss selalu di-score dari input asli
+                entry = score_prediction(x, timer)
+                prediction_cache.put(key, entry, generation)
+                outcome = "ok"
+            result, cluster_pred, distance_to_center, checksum = entry
+            if outcome == "cache_hit" and prediction_log is not None:
+                # Entry di-score dari sampel lain di bucket yang sama: log memakai jarak input ini ke cluster tersebut
+                model, model_bundle = active_model
+                if model_bundle.checksum == checksum:
+                    distance_to_center = model.distance_one(x, cluster_pred)
+        if prediction_log is not None:
+            prediction_log.log(0, x, cluster_pred, distance_to_center, checksum)
+        response = Response(with_ood_flags(result, ood, "predict"), mimetype="application/json")
+        timer.mark("serialize")
+        timer.finish(outcome)
+        return response
+    except Exception:
+        timer.finish("error")
+        raise
+
+def invalid_sample_response(errors):
+    return jsonify({"error": "Input tidak valid", "fields": errors}), 400
+
+def invalid_batch_body(e):
+    return {"error": f"Format sampel tidak valid: {e}", "errors": getattr(e, "errors", [])}
+
+def invalid_batch_response(e):
+    return jsonify(invalid_batch_body(e)), 400
+
+def with_ood_flags(body, ood, route):
+    """Add "out_of_distribution": [features] to a JSON body when the input is outside the training ranges"""
+    if not ood:
+        return body
+    if metrics.METRICS_ENABLED:
+        for feature in ood:
+            metrics.out_of_distribution_total.inc(route, feature)
+    return body[:-1] + b',"out_of_distribution":' + json.dumps(ood).encode() + b"}"
+
+def build_prediction(x, timer=metrics.NULL_TIMER):
+    """Score one sample (7 floats in FEATURES order) and build the /predict response body"""
+    return score_prediction(x, timer)[0]
+
+def score_prediction(x, timer=metrics.NULL_TIMER):
+    """(/predict body, cluster, distance_to_center, model checksum) for one sample"""
+    # Scaling, prediksi cluster dan jarak ke cluster center sekaligus
+    model, model_bundle = active_model
+    cluster_pred, distance_to_center = model.score_one(x)
+    timer.mark("score")
+    body = prediction_response(x, cluster_pred, distance_to_center, model)
+    timer.mark("render")
+    return body, cluster_pred, distance_to_center, model_bundle.checksum
+
+def prediction_response(x, cluster_pred, distance_to_center, model=None):
+    """JSON body (bytes) of the /predict response for an already scored sample"""
+    # Hitung fertility score (formula sederhana)
+    fertility_score = x[0] * 0.4 + x[1] * 0.3 + x[2] * 0.3
+    fertility_score = round(fertility_score, 2)
+
+    # Karakteristik dan deskripsi cluster sudah diserialisasi saat training (tabel profil di model bundle)
+    entry = (model or scorer).table[cluster_pred]
+    return entry.response_body(round(float(distance_to_center), 4), fertility_score)
+
+# Semua model sekaligus: cluster, rekomendasi tanaman dan fertility (regresi) dari satu vektor ter-scale
+@app.route('/predict/all', methods=["POST"])
+def predict_all():
+    timer = metrics.timer("predict_all")
+    try:
+        if scorer is None:
+            timer.finish("not_ready")
+            return model_not_ready()
+
+        x, errors, ood = schema.validate_one(request.get_json(silent=True))
+        timer.mark("json_parse")
+        if errors:
+            timer.finish("client_error")
+            return invalid_sample_response(errors)
+
+        body, errors = build_full_prediction(x, timer)
+        response = Response(with_ood_flags(body, ood, "predict_all"), mimetype="application/json")
+        timer.mark("serialize")
+        timer.finish("ok" if not errors else "partial")
+        return response
+    except Exception:
+        timer.finish("error")
+        raise
+
+def build_full_prediction(x, timer=metrics.NULL_TIMER):
+    """/predict/all body (bytes) and the errors of models that could not be loaded"""
+    model, model_bundle = active_model
+    z = model.transform(x)
+    cluster_pred, distance_to_center = model.score_scaled_one(z)
+    timer.mark("score")
+    if prediction_log is not None:
+        prediction_log.log(1, x, cluster_pred, distance_to_center, model_bundle.checksum)
+
+    extra, errors = [], {}
+    try:
+        crop = registry.get("crop")
+        crop_class, confidence = crop.predict_one(crop.scaler.input_for(x, model, z))
+        extra += [b",", crop.fragments[crop_class], b',"crop_confidence":', repr(round(confidence, 4)).encode()]
+    except ModelUnavailable as e:
+        errors["crop"] = str(e)
+    timer.mark("crop")
+    try:
+        fertility = registry.get("fertility")
+        fertility_predicted = round(fertility.predict_one(fertility.scaler.input_for(x, model, z)), 2)
+        extra += [b',"fertility_predicted":', repr(fertility_predicted).encode()]
+    except ModelUnavailable as e:
+        errors["fertility"] = str(e)
+    timer.mark("fertility")
+    if errors:
+        extra += [b',"model_errors":', json.dumps(errors).encode()]
+
+    # Body /predict tanpa kurung kurawal penutup, lalu field dari model lain
+    body = prediction_response(x, cluster_pred, distance_to_center, model)
+    return body[:-1] + b"".join(extra) + b"}", errors
+
+# Statistik cache untuk menentukan ukuran cache
+@app.route('/cache/stats')
+def cache_stats():
+    if prediction_cache is None:
+        return jsonify({"enabled": False})
+    stats = prediction_cache.stats()
+    if scorer is not None:
+        # Selisih maksimum hit terhadap hasil exact untuk model yang aktif
+        stats["tolerance"] = prediction_cache.tolerance(scorer.scale)
+    return jsonify({"enabled": True, **stats})
+
+# Route prediksi cluster untuk banyak sampel sekaligus
+@app.route('/predict/batch', methods=["POST"])
+def predict_batch():
+    timer = metrics.timer("predict_batch")
+    try:
+        if scorer is None:
+            timer.finish("not_ready")
+            return model_not_ready()
+        if request.content_length is None:
+            timer.finish("client_error")
+            return length_required()
+        if request.content_length > BATCH_MAX_BYTES:
+            timer.finish("too_large")
+            return body_too_large()
+
+        status, payload, outcome = batch_prediction(request.get_data(), request.mimetype, timer)
+        response = jsonify(payload), status
+        timer.mark("serialize")
+        timer.finish(outcome)
+        return response
+    except Exception:
+        timer.finish("error")
+        raise
+
+def batch_prediction(body, mimetype, timer=metrics.NULL_TIMER):
+    """(status, JSON payload, metrics outcome) of a /predict/batch body, shared by app.py and asgi_app.py"""
+    try:
+        rows = parse_batch_body(body, mimetype)
+    except ValueError as e:
+        return 400, {"error": str(e)}, "client_error"
+    timer.mark("json_parse")
+
+    if len(rows) == 0:
+        return 400, {"error": "Batch kosong"}, "client_error"
+    if len(rows) > BATCH_MAX_ROWS:
+        return 413, {"error": f"Maksimal {BATCH_MAX_ROWS} sampel per request"}, "too_large"
+
+    try:
+        validated = schema.to_matrix(rows)
+    except InvalidInput as e:
+        return 400, invalid_batch_body(e), "client_error"
+    X = validated.X
+    timer.mark("to_matrix")
+
+    model, model_bundle = active_model
+    clusters, distances = model.score_batch(X)
+    fertility_scores = batch_fertility_score(X)
+    timer.mark("score")
+    if prediction_log is not None:
+        prediction_log.log_batch(2, X, clusters, distances, model_bundle.checksum)
+    if aggregation is not None:
+        tags = {level: tag_column(rows, f"{level}_id") for level in LEVELS}
+        if any(ids is not None for ids in tags.values()):
+            aggregation.add_scored(tags, clusters, distances, fertility_scores)
+            timer.mark("aggregate")
+
+    results = [
+        {"cluster": c, "distance_to_center": d, "fertility_score": f}
+        for c, d, f in zip(clusters.tolist(), np.round(distances, 4).tolist(), fertility_scores.tolist())
+    ]
+    payload = {"count": len(results), "results": results}
+    ood_rows = validated.ood_rows()
+    if len(ood_rows):
+        # Indeks sampel yang di luar rentang data training (tetap di-score)
+        payload["out_of_distribution_rows"] = ood_rows.tolist()
+        if metrics.METRICS_ENABLED:
+            for feature, n in zip(FEATURES, validated.ood[ood_rows].sum(axis=0).tolist()):
+                if n:
+                    metrics.out_of_distribution_total.inc("predict_batch", feature, amount=n)
+    return 200, payload, "ok"
+
+# Agregasi: sampel ber-tag field_id / region_id di-score lalu masuk rollup, tanpa hasil per sampel
+@app.route('/aggregate/ingest', methods=["POST"])
+def aggregate_ingest():
+    if aggregation is None:
+        return jsonify({"error": "Agregasi tidak aktif, set AGGREGATION=1"}), 404
+    if scorer is None:
+        return model_not_ready()
+    if request.content_length is None:
+        return length_required()
+    if request.content_length > BATCH_MAX_BYTES:
+        return body_too_large()
+    try:
+        rows = parse_batch_body(request.get_data(), request.mimetype)
+        if len(rows) == 0:
+            return jsonify({"error": "Batch kosong"}), 400
+        if len(rows) > BATCH_MAX_ROWS:
+            return jsonify({"error": f"Maksimal {BATCH_MAX_ROWS} sampel per request"}), 413
+        X = batch_to_matrix(rows)
+    except (KeyError, TypeError, ValueError) as e:
+        return invalid_batch_response(e)
+    tags = {level: tag_column(rows, f"{level}_id") for level in LEVELS}
+    if all(ids is None for ids in tags.values()):
+        return jsonify({"error": "Sampel harus punya field_id dan/atau region_id"}), 400
+    aggregation.ingest(scorer, X, tags)
+    return jsonify({"accepted": len(X), **aggregation.stats()})
+
+# Daftar id (dengan jumlah sampel) per level: field atau region
+@app.route('/aggregate/<level>')
+def aggregate_list(level):
+    if aggregation is None:
+        return jsonify({"error": "Agregasi tidak aktif, set AGGREGATION=1"}), 404
+    if level not in LEVELS:
+        return jsonify({"error": f"Level harus salah satu dari {list(LEVELS)}"}), 404
+    return jsonify({"level": level, "ids": aggregation.listing(level)})
+
+# Rollup satu field / region: cluster share, fertility mean/std, percentil distance (?q=0.5,0.9)
+@app.route('/aggregate/<level>/<path:key>')
+def aggregate_summary(level, key):
+    if aggregation is None:
+        return jsonify({"error": "Agregasi tidak aktif, set AGGREGATION=1"}), 404
+    if level not in LEVELS:
+        return jsonify({"error": f"Level harus salah satu dari {list(LEVELS)}"}), 404
+    try:
+        qs = [float(q) for q in request.args["q"].split(",")] if "q" in request.args else None
+        if qs is not None and not all(0 <= q <= 1 for q in qs):
+            raise ValueError("q harus di antara 0 dan 1")
+    except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    summary = aggregation.summary(level, key, qs or DEFAULT_QUANTILES)
+    if summary is None:
+        return jsonify({"error": f"{level} '{key}' belum punya sampel"}), 404
+    return jsonify({"level": level, "id": key, **summary})
 
-def generate_cluster_description(cluster_id, characteristics):
-    """Generate description based on cluster characteristics"""
-    desc_parts = []
-    
-    # Analisis berdasarkan nilai fitur
-    if characteristics['N'] > 100:
-        desc_parts.append("tinggi nitrogen")
-    elif characteristics['N'] < 70:
-        desc_parts.append("rendah nitrogen")
-    else:
-        desc_parts.append("sedang nitrogen")
-    
-    if characteristics['P'] > 60:
-        desc_parts.append("tinggi fosfor")
-    elif characteristics['P'] < 40:
-        desc_parts.append("rendah fosfor")
-    
-    if characteristics['K'] > 60:
-        desc_parts.append("tinggi kalium")
-    elif characteristics['K'] < 40:
-        desc_parts.append("rendah kalium")
-    
-    if characteristics['temperature'] > 30:
-        desc_parts.append("suhu tinggi")
-    elif characteristics['temperature'] < 20:
-        desc_parts.append("suhu rendah")
-    
-    if characteristics['rainfall'] > 200:
-        desc_parts.append("curah hujan tinggi")
-    elif characteristics['rainfall'] < 150:
-        desc_parts.append("curah hujan rendah")
-    
-    description = f"Cluster {cluster_id} memiliki karakteristik tanah dengan kandungan " + ", ".join(desc_parts) + "."
-    return description
+# Reload model: validasi + swap di worker ini, lalu file trigger membuat worker lain ikut reload
+@app.route('/admin/reload', methods=["POST"])
+def admin_reload():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint admin tidak aktif, set ADMIN_TOKEN"}), 404
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Token admin tidak valid"}), 403
+    with open(reloader.trigger_path(), "w") as f:
+        f.write(str(time.time()))
+    result = reloader.check(force=True)
+    return jsonify(result), 200 if result["status"] == "swapped" else 409
+
+# Sampel terkonfirmasi untuk online learning (diproses oleh online_update.py)
+@app.route('/feedback', methods=["POST"])
+def feedback():
+    if feedback_spool is None:
+        return jsonify({"error": "Online learning tidak aktif, set ONLINE_LEARNING=1"}), 404
+    if request.content_length is None:
+        return length_required()
+    if request.content_length > BATCH_MAX_BYTES:
+        return body_too_large()
+    try:
+        rows = parse_batch_body(request.get_data(), request.mimetype)
+        if len(rows) == 0:
+            return jsonify({"error": "Batch kosong"}), 400
+        if len(rows) > BATCH_MAX_ROWS:
+            return jsonify({"error": f"Maksimal {BATCH_MAX_ROWS} sampel per request"}), 413
+        X = batch_to_matrix(rows)
+    except (KeyError, TypeError, ValueError) as e:
+        return invalid_batch_response(e)
+    feedback_spool.append(X)
+    return jsonify({"accepted": len(X)})
+
+# Metrik Prometheus (aktif jika METRICS_ENABLED=1)
+metrics.registry.add(metrics.Gauge(
+    "soilsense_model_ready", "1 jika model termuat", lambda: int(scorer is not None)))
+metrics.registry.add(metrics.Gauge(
+    "soilsense_model_load_seconds", "Durasi load model bundle terakhir", lambda: model_load_seconds))
+metrics.registry.add(metrics.Gauge(
+    "soilsense_model_generation", "Jumlah model bundle yang berhasil dimuat", lambda: model_generation))
+if prediction_log is not None:
+    for field in ("logged", "dropped", "pending", "bytes_written", "write_errors"):
+        metrics.registry.add(metrics.Gauge(
+            f"soilsense_prediction_log_{field}", f"Log prediksi: {field}",
+            lambda field=field: prediction_log.stats()[field]))
+if aggregation is not None:
+    for field in ("samples", "fields", "regions", "bytes"):
+        metrics.registry.add(metrics.Gauge(
+            f"soilsense_aggregation_{field}", f"Rollup agregasi: {field}",
+            lambda field=field: aggregation.stats()[field]))
+if prediction_cache is not None:
+    for field in ("hits", "misses", "evictions", "size"):
+        metrics.registry.add(metrics.Gauge(
+            f"soilsense_cache_{field}", f"Prediction cache: {field}",
+            lambda field=field: prediction_cache.stats()[field]))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics tidak aktif, set METRICS_ENABLED=1"}), 404
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+def parse_batch_body(body, mimetype):
+    """Parse a JSON array or NDJSON body into a list of samples"""
+    try:
+        text = body.decode("utf-8")
+        if mimetype in ("application/x-ndjson", "application/ndjson"):
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        rows = json.loads(text)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Body tidak bisa di-parse: {e}")
+    if isinstance(rows, dict):
+        rows = rows.get("samples")
+    if not isinstance(rows, list):
+        raise ValueError("Body harus berupa array sampel atau {\"samples\": [...]}")
+    return rows
+
+def batch_to_matrix(rows):
+    """Convert samples (objects or 7-element arrays) into an (n, 7) float matrix (InvalidInput on bad rows)"""
+    return schema.to_matrix(rows).X
 
 if __name__ == "__main__":
+    install_reload_signal()
     app.run(debug=True)
\ No newline at end of file
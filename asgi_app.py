@@ -0,0 +1,285 @@
+"""
+Mode serving ASGI untuk API prediksi, dengan request coalescing.
+
+Route sama dengan app.py (/, /input, /predict, /predict/all, /predict/batch, /healthz, /ready, /metrics,
+/static/...).
+Request /predict yang datang bersamaan dalam satu jendela waktu singkat (default 2 ms) digabung
+menjadi satu pemanggilan ClusterScorer.score_batch, lalu hasilnya dikembalikan ke masing-masing caller.
+Koneksi yang lambat hanya memegang coroutine, bukan thread worker.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+
+Model, helper parsing dan format response dipakai bersama dengan app.py.
+"""
+import asyncio
+import json
+import mimetypes
+import os
+
+import numpy as np
+
+import app as flask_app
+import metrics
+from inference import FEATURES
+
+COALESCE_WINDOW = float(os.environ.get("COALESCE_WINDOW_MS", 2)) / 1000
+COALESCE_MAX_BATCH = int(os.environ.get("COALESCE_MAX_BATCH", 512))
+STATIC_DIR = os.path.abspath(flask_app.app.static_folder)
+
+
+class PredictionCoalescer:
+    """Collects concurrent single-sample predictions and scores them in one vectorized call"""
+
+    def __init__(self, window=COALESCE_WINDOW, max_batch=COALESCE_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.samples = 0
+
+    async def submit(self, x):
+        """Queue one 7-feature sample and wait for its (cluster, distance_to_center, scorer, model checksum)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((x, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        # Scorer dan bundle dari snapshot yang sama, checksum di log selalu milik model yang men-score
+        scorer, model_bundle = flask_app.active_model
+        try:
+            clusters, distances = scorer.score_batch(np.array([x for x, _ in pending], dtype=np.float64))
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.samples += len(pending)
+        for (_, future), cluster, distance in zip(pending, clusters.tolist(), distances.tolist()):
+            if not future.done():
+                future.set_result((cluster, distance, scorer, model_bundle.checksum))
+
+
+coalescer = PredictionCoalescer()
+_pages = {}
+
+
+def render_page(template):
+    """Render a Flask template once (inside a request context for url_for) and cache the bytes"""
+    if template not in _pages:
+        with flask_app.app.test_request_context():
+            _pages[template] = flask_app.render_template(template).encode("utf-8")
+    return _pages[template]
+
+
+async def send_response(send, status, body, content_type="application/json"):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def head_only(send):
+    """send() for HEAD requests: the same status and headers as GET, without the body"""
+    async def send_headers(message):
+        if message["type"] == "http.response.body":
+            message = {**message, "body": b""}
+        await send(message)
+    return send_headers
+
+
+async def send_json(send, status, payload):
+    # Body /predict sudah berupa bytes JSON (dirangkai dari tabel profil cluster)
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    await send_response(send, status, body)
+
+
+async def read_body(receive, max_bytes):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_bytes:
+            raise ValueError(f"Body maksimal {max_bytes} bytes")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def model_not_ready():
+    return 503, {"error": "Model belum siap", "detail": flask_app.model_load_error}
+
+
+def parse_sample(body):
+    """(x, errors, ood) of a single-sample JSON body, validated with the schema shared with app.py"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    return flask_app.schema.validate_one(data)
+
+
+def invalid_sample(errors):
+    return 400, {"error": "Input tidak valid", "fields": errors}
+
+
+async def predict(body):
+    timer = metrics.timer("predict")
+    try:
+        if flask_app.scorer is None:
+            timer.finish("not_ready")
+            return model_not_ready()
+        x, errors, ood = parse_sample(body)
+        timer.mark("json_parse")
+        if errors:
+            timer.finish("client_error")
+            return invalid_sample(errors)
+        cluster_pred, distance_to_center, model, checksum = await coalescer.submit(x)
+        timer.mark("score")
+        if flask_app.prediction_log is not None:
+            flask_app.prediction_log.log(0, x, cluster_pred, distance_to_center, checksum)
+        body = flask_app.prediction_response(x, cluster_pred, distance_to_center, model)
+        timer.mark("render")
+        timer.finish("ok")
+        return 200, flask_app.with_ood_flags(body, ood, "predict")
+    except Exception:
+        timer.finish("error")
+        raise
+
+
+async def predict_all(body):
+    timer = metrics.timer("predict_all")
+    try:
+        if flask_app.scorer is None:
+            timer.finish("not_ready")
+            return model_not_ready()
+        x, errors, ood = parse_sample(body)
+        timer.mark("json_parse")
+        if errors:
+            timer.finish("client_error")
+            return invalid_sample(errors)
+        # Di thread pool: pemanggilan pertama memuat model pickle (lazy) dan tidak boleh memblokir event loop
+        body, errors = await asyncio.get_running_loop().run_in_executor(
+            None, flask_app.build_full_prediction, x, timer)
+        timer.finish("ok" if not errors else "partial")
+        return 200, flask_app.with_ood_flags(body, ood, "predict_all")
+    except Exception:
+        timer.finish("error")
+        raise
+
+
+async def predict_batch(body, content_type):
+    timer = metrics.timer("predict_batch")
+    try:
+        if flask_app.scorer is None:
+            timer.finish("not_ready")
+            return model_not_ready()
+        # Jalur yang sama dengan Flask: log prediksi, rollup agregasi, metrik per tahap dan out-of-distribution.
+        # Di thread pool: parsing dan scoring batch besar tidak boleh menahan /predict yang sedang di-coalesce
+        status, payload, outcome = await asyncio.get_running_loop().run_in_executor(
+            None, flask_app.batch_prediction, body, content_type.split(";")[0].strip(), timer)
+        timer.finish(outcome)
+        return status, payload
+    except Exception:
+        timer.finish("error")
+        raise
+
+
+def ready():
+    if flask_app.scorer is None:
+        return 503, {"status": "not ready", "error": flask_app.model_load_error}
+    return 200, {
+        "status": "ready",
+        "n_clusters": flask_app.scorer.n_clusters,
+        "model_checksum": f"{flask_app.bundle.checksum:08x}",
+        "coalescer": {"batches": coalescer.batches, "samples": coalescer.samples,
+                      "window_ms": coalescer.window * 1000, "max_batch": coalescer.max_batch},
+    }
+
+
+async def serve_static(send, rel_path):
+    path = os.path.abspath(os.path.join(STATIC_DIR, rel_path))
+    if not path.startswith(STATIC_DIR + os.sep) or not os.path.isfile(path):
+        return await send_json(send, 404, {"error": "Not found"})
+    with open(path, "rb") as f:
+        body = f.read()
+    await send_response(send, 200, body, mimetypes.guess_type(path)[0] or "application/octet-stream")
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                flask_app.install_reload_signal()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if flask_app.prediction_log is not None:
+                    flask_app.prediction_log.close()
+                if flask_app.aggregation is not None:
+                    flask_app.aggregation.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    # Thread hot reload model bundle per process, sama seperti app.py
+    flask_app.reloader.ensure_started()
+    if flask_app.prediction_log is not None:
+        flask_app.prediction_log.ensure_started()
+
+    path = scope["path"]
+    method = scope["method"]
+
+    if method in ("GET", "HEAD"):
+        if method == "HEAD":
+            send = head_only(send)
+        if path == "/":
+            return await send_response(send, 200, render_page("index.html"), "text/html; charset=utf-8")
+        if path == "/input":
+            return await send_response(send, 200, render_page("input_data.html"), "text/html; charset=utf-8")
+        if path == "/healthz":
+            return await send_json(send, 200, {"status": "ok"})
+        if path == "/ready":
+            return await send_json(send, *ready())
+        if path == "/metrics":
+            if not metrics.METRICS_ENABLED:
+                return await send_json(send, 404, {"error": "Metrics tidak aktif, set METRICS_ENABLED=1"})
+            return await send_response(send, 200, metrics.registry.render().encode(), "text/plain; version=0.0.4")
+        if path.startswith("/static/"):
+            return await serve_static(send, path[len("/static/"):])
+    elif method == "POST" and path in ("/predict", "/predict/all", "/predict/batch"):
+        try:
+            body = await read_body(receive, flask_app.BATCH_MAX_BYTES)
+        except ValueError as e:
+            return await send_json(send, 413, {"error": str(e)})
+        if body is None:
+            return
+        if path == "/predict":
+            return await send_json(send, *await predict(body))
+        if path == "/predict/all":
+            return await send_json(send, *await predict_all(body))
+        headers = dict(scope["headers"])
+        content_type = headers.get(b"content-type", b"application/json").decode("latin-1")
+        return await send_json(send, *await predict_batch(body, content_type))
+
+    await send_json(send, 404, {"error": "Not found"})
@@ -0,0 +1,105 @@
+"""
+Benchmark recall vs latency index IVF nearest-centroid (centroid_index.py) dibanding brute force.
+
+Centroid "micro-zone" disimulasikan dari baris data_core.csv (ter-scale) ditambah jitter kecil,
+query adalah baris data_core.csv lain ditambah noise. Untuk setiap k diukur:
+  - brute force (satu matmul ke semua centroid, seperti ClusterScorer tanpa index)
+  - IVF exact (dengan verifikasi batas bawah, recall harus 1.0) untuk beberapa nprobe
+  - IVF approximate (hanya nprobe list) untuk beberapa nprobe
+
+    python benchmarks/bench_centroid_index.py --k 10 1000 50000 --queries 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from centroid_index import build_index, brute_force  # noqa: E402
+from inference import FEATURES  # noqa: E402
+
+
+def load_scaled(path):
+    X = pd.read_csv(path, usecols=FEATURES)[FEATURES].to_numpy(dtype=np.float64)
+    return (X - X.mean(axis=0)) / X.std(axis=0)
+
+
+def time_batch(fn, Z, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(Z)
+        best = min(best, time.perf_counter() - start)
+    return result, best / len(Z) * 1e6
+
+
+def time_single(fn, Z, n=300):
+    start = time.perf_counter()
+    for z in Z[:n]:
+        fn(z)
+    return (time.perf_counter() - start) / min(n, len(Z)) * 1e6
+
+
+def bench_k(Z_data, k, n_queries, nprobes, rng):
+    centers = Z_data[rng.integers(0, len(Z_data), k)] + rng.normal(0, 0.05, (k, Z_data.shape[1]))
+    Z = Z_data[rng.integers(0, len(Z_data), n_queries)] + rng.normal(0, 0.1, (n_queries, Z_data.shape[1]))
+    sq_norms = np.einsum("kf,kf->k", centers, centers)
+
+    start = time.perf_counter()
+    index = build_index(centers)
+    build_s = time.perf_counter() - start
+
+    expected, brute_batch_us = time_batch(lambda Q: brute_force(Q, centers), Z)
+    brute_single_us = time_single(lambda z: int(np.argmin(sq_norms - 2.0 * (centers @ z))), Z)
+    rows = [{"mode": "brute", "nprobe": None, "recall": 1.0,
+             "batch_us_per_query": brute_batch_us, "single_us": brute_single_us}]
+
+    for exact in (True, False):
+        for nprobe in nprobes:
+            if nprobe > index.n_lists:
+                continue
+            got, batch_us = time_batch(lambda Q: index.search(Q, nprobe, exact), Z)
+            single_us = time_single(lambda z: index.search_one(z, nprobe, exact), Z)
+            rows.append({"mode": "ivf_exact" if exact else "ivf_approx", "nprobe": nprobe,
+                         "recall": float(np.mean(got == expected)),
+                         "batch_us_per_query": batch_us, "single_us": single_us})
+    return {"k": k, "n_lists": index.n_lists, "build_s": build_s, "results": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "data_core.csv"))
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 1000, 50000])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    Z_data = load_scaled(args.data)
+    report = [bench_k(Z_data, k, args.queries, args.nprobe, rng) for k in args.k]
+
+    print("=" * 72)
+    print(f"CENTROID INDEX: recall@1 vs latency ({args.queries} query)")
+    print("=" * 72)
+    for entry in report:
+        print(f"k={entry['k']} ({entry['n_lists']} list, build {entry['build_s']:.2f} s)")
+        print(f"  {'mode':<11} {'nprobe':>6} {'recall':>8} {'batch us/q':>11} {'single us':>10}")
+        for r in entry["results"]:
+            nprobe = "-" if r["nprobe"] is None else r["nprobe"]
+            print(f"  {r['mode']:<11} {nprobe:>6} {r['recall']:>8.4f} {r['batch_us_per_query']:>11.2f} "
+                  f"{r['single_us']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark cold start app.py: waktu import dan time-to-first-prediction.
+
+Setiap run dijalankan di proses Python baru supaya tidak ada modul yang sudah ter-cache.
+Dibandingkan dengan jalur lama (pandas + joblib.load tiga pickle + sklearn) bila sklearn terpasang.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = {"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82, "ph": 6.5, "rainfall": 202}
+
+APP_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+resp = client.post("/predict", json=%r)
+t2 = time.perf_counter()
+assert resp.status_code == 200, resp.get_data(as_text=True)
+print(json.dumps({
+    "import_s": t1 - t0,
+    "model_load_s": app.model_load_seconds,
+    "first_prediction_s": t2 - t1,
+    "time_to_first_prediction_s": t2 - t0,
+    "sklearn_imported": "sklearn" in sys.modules,
+    "pandas_imported": "pandas" in sys.modules,
+}))
+""" % (SAMPLE,)
+
+LEGACY_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import pandas as pd
+import numpy as np
+import joblib
+t1 = time.perf_counter()
+model_cluster = joblib.load("model_cluster.pkl")
+scaler = joblib.load("scaler.pkl")
+cluster_info = joblib.load("cluster_info.pkl")
+features = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+df_scaled = scaler.transform(pd.DataFrame([%r], columns=features))
+cluster_pred = model_cluster.predict(df_scaled)[0]
+cluster_info.iloc[cluster_pred].to_dict()
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "time_to_first_prediction_s": t2 - t0}))
+""" % (SAMPLE,)
+
+
+def run_snippet(snippet):
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", snippet],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    keys = [k for k, v in runs[0].items() if isinstance(v, float)]
+    return {k: {"median_ms": statistics.median(r[k] for r in runs) * 1000,
+                "min_ms": min(r[k] for r in runs) * 1000} for k in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    app_runs = [run_snippet(APP_SNIPPET) for _ in range(args.runs)]
+    report = {"app": summarize(app_runs),
+              "app_imports_sklearn": app_runs[0]["sklearn_imported"],
+              "app_imports_pandas": app_runs[0]["pandas_imported"]}
+
+    try:
+        legacy_runs = [run_snippet(LEGACY_SNIPPET) for _ in range(args.runs)]
+        report["legacy_pickle"] = summarize(legacy_runs)
+    except subprocess.CalledProcessError as e:
+        print(f"[INFO] Jalur pickle lama dilewati: {e.stderr.strip().splitlines()[-1]}")
+
+    print("=" * 60)
+    print(f"STARTUP BENCHMARK ({args.runs} runs, median)")
+    print("=" * 60)
+    for name in ("app", "legacy_pickle"):
+        if name in report:
+            print(f"{name}:")
+            for key, stats in report[name].items():
+                print(f"  {key:<28} {stats['median_ms']:9.1f} ms  (min {stats['min_ms']:.1f} ms)")
+    print(f"app import sklearn: {report['app_imports_sklearn']}, pandas: {report['app_imports_pandas']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Load test /predict: latency p50/p99 dan throughput, Flask (gunicorn) vs ASGI (uvicorn + coalescing).
+
+Client memakai asyncio dengan HTTP/1.1 keep-alive (reconnect otomatis bila server menutup koneksi,
+seperti worker sync gunicorn), sehingga ribuan koneksi bisa disimulasikan dari satu process.
+
+    # jalankan kedua server otomatis lalu bandingkan
+    python benchmarks/loadtest_predict.py --spawn --concurrency 200 --requests 20000
+
+    # atau arahkan ke server yang sudah berjalan
+    python benchmarks/loadtest_predict.py --target flask=http://127.0.0.1:5000 --target asgi=http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "flask": ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "asgi": ["uvicorn", "asgi_app:app", "--log-level", "warning"],
+}
+
+
+def make_payloads(n, seed=42):
+    rng = random.Random(seed)
+    return [json.dumps({
+        "N": rng.randint(50, 150), "P": rng.randint(10, 100), "K": rng.randint(10, 100),
+        "temperature": round(rng.uniform(15, 40), 1), "humidity": round(rng.uniform(20, 100), 1),
+        "ph": round(rng.uniform(4, 8), 1), "rainfall": round(rng.uniform(100, 300), 1),
+    }).encode() for _ in range(n)]
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() == "close"
+
+
+async def client(host, port, payloads, counter, latencies, errors):
+    reader = writer = None
+    while True:
+        i = counter[0]
+        if i >= len(payloads):
+            break
+        counter[0] += 1
+        body = payloads[i]
+        request = (b"POST /predict HTTP/1.1\r\nHost: " + host.encode() +
+                   b"\r\nContent-Type: application/json\r\nContent-Length: " + str(len(body)).encode() +
+                   b"\r\n\r\n" + body)
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status, close = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            errors[0] += 1
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors[0] += 1
+        if close:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, n_requests, concurrency):
+    parts = urlsplit(url)
+    payloads = make_payloads(n_requests)
+    latencies, errors, counter = [], [0], [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(parts.hostname, parts.port, payloads, counter, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else float("nan")
+
+    return {"requests": len(latencies), "errors": errors[0], "concurrency": concurrency,
+            "throughput_rps": len(latencies) / elapsed, "p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99)}
+
+
+def wait_ready(url, timeout=30):
+    import urllib.request
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/ready", timeout=1) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server {url} tidak siap dalam {timeout} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", default=[], help="name=url, boleh diulang")
+    parser.add_argument("--spawn", action="store_true", help="Jalankan server flask (gunicorn) dan asgi (uvicorn)")
+    parser.add_argument("--workers", type=int, default=2, help="Jumlah worker tiap server pada mode --spawn")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    targets = dict(t.split("=", 1) for t in args.target)
+    procs = []
+    try:
+        if args.spawn:
+            for i, (name, cmd) in enumerate(SERVERS.items()):
+                port = 18000 + i
+                env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(args.workers))
+                extra = ["--port", str(port), "--workers", str(args.workers)] if name == "asgi" else []
+                procs.append(subprocess.Popen(cmd + extra, cwd=ROOT, env=env,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+                targets[name] = f"http://127.0.0.1:{port}"
+            for url in targets.values():
+                wait_ready(url)
+        if not targets:
+            parser.error("Gunakan --spawn atau minimal satu --target")
+
+        report = {}
+        for name, url in targets.items():
+            asyncio.run(run_load(url, min(500, args.requests), min(10, args.concurrency)))  # warmup
+            report[name] = asyncio.run(run_load(url, args.requests, args.concurrency))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    print("=" * 72)
+    print(f"LOAD TEST /predict ({args.requests} requests, concurrency {args.concurrency})")
+    print("=" * 72)
+    print(f"{'server':<10} {'rps':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, r in report.items():
+        print(f"{name:<10} {r['throughput_rps']:>10.1f} {r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['errors']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Memori per worker gunicorn: model dari pickle per worker vs shared-memory model store (shared_store.py).
+
+Untuk setiap mode dan jumlah worker, gunicorn dijalankan (gunicorn.conf.py), semua worker dipanaskan
+dengan request /predict/all (memaksa model tanaman + fertility dimuat), lalu dari /proc dibaca:
+  - RSS      : resident set size (page shared ikut dihitung penuh di setiap worker)
+  - PSS      : proportional set size (page shared dibagi rata antar process yang memakainya)
+  - private  : page yang hanya dimiliki worker tersebut
+Dengan shared store, private per worker tidak bertambah karena model, dan total PSS naik lebih landai.
+
+    python benchmarks/measure_worker_rss.py --workers 1 2 4 8
+    python benchmarks/measure_worker_rss.py --modes shared --no-preload --json rss.json
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = json.dumps({"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82, "ph": 6.5,
+                     "rainfall": 202}).encode()
+
+
+def memory_kb(pid):
+    """RSS, PSS and private memory (kB) of a process from /proc"""
+    stats = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                stats[key] = int(value.split()[0])
+    return {"rss_kb": stats.get("Rss", 0), "pss_kb": stats.get("Pss", 0),
+            "private_kb": stats.get("Private_Clean", 0) + stats.get("Private_Dirty", 0)}
+
+
+def children(pid):
+    out = subprocess.run(["ps", "--ppid", str(pid), "-o", "pid="], capture_output=True, text=True)
+    return [int(p) for p in out.stdout.split()]
+
+
+def post(url):
+    req = urllib.request.Request(url, data=SAMPLE, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def wait_ready(base, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base + "/ready", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server tidak siap")
+
+
+def run(mode, n_workers, port, preload, requests):
+    env = {**os.environ, "PORT": str(port), "WEB_CONCURRENCY": str(n_workers),
+           "GUNICORN_PRELOAD": "1" if preload else "0", "MODEL_WATCH_INTERVAL": "0"}
+    env.pop("MODEL_SHM", None)
+    env.pop("PRELOAD_MODELS", None)
+    if mode == "shared":
+        env["SHARED_MODELS"] = "1"
+    else:
+        env.pop("SHARED_MODELS", None)
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"], cwd=ROOT,
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_ready(base)
+        # Request paralel (lebih banyak dari jumlah worker) supaya setiap worker sync ikut memproses
+        with ThreadPoolExecutor(max_workers=n_workers * 4) as pool:
+            results = list(pool.map(lambda _: post(base + "/predict/all"), range(requests)))
+        assert all("crop" in r for r in results), results[0]
+        time.sleep(0.5)
+        workers = [memory_kb(pid) for pid in children(proc.pid)]
+        master = memory_kb(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+    return {"mode": mode, "workers": n_workers, "preload": preload, "master": master, "per_worker": workers,
+            "total_pss_kb": master["pss_kb"] + sum(w["pss_kb"] for w in workers)}
+
+
+def mean(rows, key):
+    return sum(r[key] for r in rows) / max(len(rows), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=["pickle", "shared"], default=["pickle", "shared"])
+    parser.add_argument("--no-preload", action="store_true", help="Jalankan gunicorn tanpa preload_app")
+    parser.add_argument("--requests", type=int, default=200, help="Request /predict/all untuk memanaskan worker")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    report = [run(mode, n, args.port, not args.no_preload, args.requests)
+              for mode in args.modes for n in args.workers]
+
+    print("=" * 78)
+    print(f"MEMORI PER WORKER (preload={'tidak' if args.no_preload else 'ya'}, rata-rata per worker, MB)")
+    print("=" * 78)
+    print(f"{'mode':<8} {'workers':>7} {'RSS':>9} {'PSS':>9} {'private':>9} {'total PSS':>11}")
+    for r in report:
+        w = r["per_worker"]
+        print(f"{r['mode']:<8} {r['workers']:>7} {mean(w, 'rss_kb') / 1024:>9.1f} {mean(w, 'pss_kb') / 1024:>9.1f} "
+              f"{mean(w, 'private_kb') / 1024:>9.1f} {r['total_pss_kb'] / 1024:>11.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Suite benchmark SoilSense: satu perintah, hasil JSON, dibandingkan dengan baseline tersimpan.
+
+Yang diukur:
+  - import_app            waktu `import app` di proses Python baru (median dari --import-runs)
+  - artifact_load         load_bundle + bundle.scorer() (mmap, verifikasi CRC, tabel profil)
+  - predict_single        satu POST /predict lewat Flask test client (cache prediksi mati)
+  - score_batch[n=...]    ClusterScorer.score_batch pada n baris (1 sampai 1M) sampel data_core.csv
+  - k_sweep[n=...]        run_k_sweep dari train_model.py pada n baris sampel data_core.csv
+
+Semua metrik adalah waktu (detik, lebih kecil lebih baik). Dengan --baseline, setiap metrik dibandingkan
+dengan baseline; rasio di atas 1 + --threshold ditandai sebagai regresi.
+
+    python benchmarks/run_suite.py --json bench.json --baseline benchmarks/baseline.json
+    python benchmarks/run_suite.py --quick --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BATCH_SIZES = [1, 10, 100, 1000, 10_000, 100_000, 1_000_000]
+SWEEP_SIZES = [1000, 5000, 20_000]
+QUICK_BATCH_SIZES = [1, 100, 10_000, 100_000]
+QUICK_SWEEP_SIZES = [1000, 5000]
+
+
+def measure(fn, min_runs=3, max_runs=2000, budget=0.5):
+    """Call fn repeatedly (at least min_runs, until budget seconds) and summarize the timings"""
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or (len(times) < max_runs and time.perf_counter() - start < budget):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return {"median": statistics.median(times), "min": times[0],
+            "p95": times[min(len(times) - 1, int(len(times) * 0.95))], "runs": len(times)}
+
+
+def load_features(path):
+    import pandas as pd
+    from inference import FEATURES
+    return pd.read_csv(path, usecols=FEATURES)[FEATURES].to_numpy(dtype=np.float64)
+
+
+def bench_import(runs):
+    snippet = "import time; t0 = time.perf_counter(); import app; print(time.perf_counter() - t0)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", snippet], cwd=ROOT, capture_output=True,
+                             text=True, check=True, env={**os.environ, "PREDICT_CACHE_SIZE": "0"})
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    times.sort()
+    return {"median": statistics.median(times), "min": times[0], "p95": times[-1], "runs": runs}
+
+
+def bench_artifact_load():
+    from model_bundle import load_bundle, BUNDLE_PATH
+
+    def load():
+        bundle = load_bundle(os.path.join(ROOT, BUNDLE_PATH))
+        scorer = bundle.scorer()
+        scorer.table
+
+    return measure(load, min_runs=5, budget=1.0)
+
+
+def bench_predict_single(X):
+    os.environ["PREDICT_CACHE_SIZE"] = "0"
+    import app
+    from inference import FEATURES
+
+    client = app.app.test_client()
+    bodies = [dict(zip(FEATURES, row)) for row in X[:1000].tolist()]
+    state = {"i": 0}
+
+    def post():
+        resp = client.post("/predict", json=bodies[state["i"] % len(bodies)])
+        state["i"] += 1
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+
+    return measure(post, min_runs=50, budget=2.0)
+
+
+def bench_score_batch(X, sizes, rng):
+    from model_bundle import load_bundle, BUNDLE_PATH
+
+    scorer = load_bundle(os.path.join(ROOT, BUNDLE_PATH)).scorer()
+    results = {}
+    for n in sizes:
+        Z = X[rng.integers(0, len(X), n)]
+        stats = measure(lambda: scorer.score_batch(Z), min_runs=3, budget=1.0)
+        stats["ns_per_row"] = stats["median"] / n * 1e9
+        results[f"score_batch[n={n}]"] = stats
+    return results
+
+
+def bench_k_sweep(X, sizes, rng, n_jobs, silhouette_sample):
+    from sklearn.preprocessing import StandardScaler
+    from train_model import run_k_sweep
+
+    results = {}
+    for n in sizes:
+        X_scaled = StandardScaler().fit_transform(X[rng.choice(len(X), size=min(n, len(X)), replace=False)])
+        _, _, seconds, used_jobs = run_k_sweep(X_scaled, n_jobs=n_jobs,
+                                               silhouette_sample=min(silhouette_sample, len(X_scaled)))
+        # Satu run per ukuran (k-sweep mahal); median = satu-satunya pengukuran
+        results[f"k_sweep[n={len(X_scaled)}]"] = {"median": seconds, "min": seconds, "p95": seconds,
+                                                  "runs": 1, "jobs": used_jobs}
+    return results
+
+
+def environment():
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "sklearn": sklearn.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+def compare(results, baseline, threshold):
+    """Ratio current / baseline of every metric present in both runs"""
+    rows = {}
+    for name, stats in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median"):
+            continue
+        ratio = stats["median"] / base["median"]
+        status = "regression" if ratio > 1 + threshold else "improvement" if ratio < 1 - threshold else "ok"
+        rows[name] = {"baseline": base["median"], "current": stats["median"], "ratio": ratio, "status": status}
+    return rows
+
+
+def format_seconds(s):
+    if s < 1e-3:
+        return f"{s * 1e6:9.1f} us"
+    if s < 1:
+        return f"{s * 1e3:9.2f} ms"
+    return f"{s:9.3f} s "
+
+
+def print_report(report):
+    print("=" * 78)
+    print(f"BENCHMARK SUITE ({report['environment']['commit'] or 'tanpa commit'}, "
+          f"{report['environment']['cpu_count']} CPU)")
+    print("=" * 78)
+    comparison = report.get("comparison", {})
+    print(f"{'metrik':<26} {'median':>12} {'p95':>12} {'baseline':>12} {'rasio':>7}  status")
+    for name, stats in report["results"].items():
+        line = f"{name:<26} {format_seconds(stats['median']):>12} {format_seconds(stats['p95']):>12}"
+        if name in comparison:
+            c = comparison[name]
+            line += f" {format_seconds(c['baseline']):>12} {c['ratio']:>6.2f}x  {c['status']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "data_core.csv"))
+    parser.add_argument("--quick", action="store_true", help="Ukuran batch dan k-sweep lebih kecil")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--sweep-sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--sweep-jobs", type=int, default=1, help="Jumlah process untuk k-sweep")
+    parser.add_argument("--silhouette-sample", type=int, default=2000)
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--skip", nargs="+", default=[],
+                        choices=["import", "artifact_load", "predict", "batch", "k_sweep"])
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    parser.add_argument("--baseline", help="File JSON hasil run sebelumnya untuk dibandingkan")
+    parser.add_argument("--save-baseline", help="Simpan hasil run ini sebagai baseline baru")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Toleransi rasio sebelum ditandai regresi (0.25 = 25%% lebih lambat)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit code 1 jika ada regresi")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    batch_sizes = args.batch_sizes or (QUICK_BATCH_SIZES if args.quick else BATCH_SIZES)
+    sweep_sizes = args.sweep_sizes or (QUICK_SWEEP_SIZES if args.quick else SWEEP_SIZES)
+    rng = np.random.default_rng(42)
+    X = load_features(args.data)
+
+    results = {}
+    if "import" not in args.skip:
+        results["import_app"] = bench_import(args.import_runs)
+    if "artifact_load" not in args.skip:
+        results["artifact_load"] = bench_artifact_load()
+    if "predict" not in args.skip:
+        results["predict_single"] = bench_predict_single(X)
+    if "batch" not in args.skip:
+        results.update(bench_score_batch(X, batch_sizes, rng))
+    if "k_sweep" not in args.skip:
+        results.update(bench_k_sweep(X, sweep_sizes, rng, args.sweep_jobs, args.silhouette_sample))
+
+    report = {"environment": environment(), "results": results}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline"] = {"path": args.baseline, "environment": baseline.get("environment")}
+        report["comparison"] = compare(results, baseline, args.threshold)
+    print_report(report)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report if path == args.json else {"environment": report["environment"],
+                                                            "results": results}, f, indent=2)
+            print(f"[INFO] Hasil disimpan: {path}")
+
+    regressions = [name for name, c in report.get("comparison", {}).items() if c["status"] == "regression"]
+    if regressions:
+        print(f"[ERROR] Regresi (> {args.threshold:.0%} lebih lambat dari baseline): {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
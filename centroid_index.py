@@ -0,0 +1,179 @@
+"""
+Index nearest-centroid (IVF) untuk model dengan sangat banyak cluster (mis. satu centroid per kecamatan).
+
+Centroid dikelompokkan oleh coarse quantizer (KMeans kecil di atas centroid itu sendiri) menjadi
+n_lists inverted list. Query hanya menghitung jarak ke centroid di `nprobe` list terdekat.
+
+Mode exact (default) memverifikasi hasil: untuk setiap list yang belum diperiksa, batas bawah jarak
+ke anggotanya adalah ||z - coarse_j|| - radius_j. List yang batas bawahnya tidak lebih besar dari
+jarak kandidat terbaik ikut diperiksa, sehingga hasil selalu sama dengan brute force.
+Mode approximate (exact=False) hanya memeriksa `nprobe` list (lebih cepat, recall < 1).
+"""
+import numpy as np
+
+# Di bawah jumlah cluster ini brute force (satu matmul kecil) lebih cepat dari index
+# (lihat benchmarks/bench_centroid_index.py: pada k=1000 brute force masih menang)
+INDEX_MIN_CLUSTERS = 10000
+
+
+class CentroidIndex:
+    """IVF index over cluster centers (in scaled space) with an exact-verification fallback"""
+
+    def __init__(self, coarse, radius, offsets, members, centers, nprobe=2, exact=True):
+        self.coarse = np.asarray(coarse, dtype=np.float64)
+        self.coarse_sq_norms = np.einsum("lf,lf->l", self.coarse, self.coarse)
+        self.radius = np.asarray(radius, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.members = np.asarray(members, dtype=np.int64)
+        # Centroid diurutkan per list supaya setiap list adalah slice contiguous
+        self.list_centers = np.ascontiguousarray(np.asarray(centers, dtype=np.float64)[self.members])
+        self.list_sq_norms = np.einsum("kf,kf->k", self.list_centers, self.list_centers)
+        self.list_sizes = np.diff(self.offsets)
+        self.n_lists = len(self.coarse)
+        self.nprobe = min(nprobe, self.n_lists)
+        self.exact = exact
+
+    def _scan(self, Z, mask, best_score, best_pos):
+        """Update the best candidate of every query from the lists selected in mask (n, n_lists)"""
+        for j in np.flatnonzero(mask.any(axis=0)):
+            q = np.flatnonzero(mask[:, j])
+            a, b = self.offsets[j], self.offsets[j + 1]
+            if a == b:
+                continue
+            score = Z[q] @ self.list_centers[a:b].T
+            score *= -2.0
+            score += self.list_sq_norms[a:b]
+            pos = np.argmin(score, axis=1)
+            cand = score[np.arange(len(q)), pos]
+            better = cand < best_score[q]
+            best_score[q[better]] = cand[better]
+            best_pos[q[better]] = a + pos[better]
+
+    def search(self, Z, nprobe=None, exact=None):
+        """Nearest center id for every row of the scaled (n, f) matrix Z"""
+        nprobe = self.nprobe if nprobe is None else min(nprobe, self.n_lists)
+        exact = self.exact if exact is None else exact
+        Z = np.atleast_2d(Z)
+        n = len(Z)
+
+        z_sq = np.einsum("nf,nf->n", Z, Z)
+        coarse_dist = Z @ self.coarse.T
+        coarse_dist *= -2.0
+        coarse_dist += self.coarse_sq_norms
+        coarse_dist += z_sq[:, None]
+        np.sqrt(np.maximum(coarse_dist, 0.0, out=coarse_dist), out=coarse_dist)
+
+        visited = np.zeros((n, self.n_lists), dtype=bool)
+        if nprobe < self.n_lists:
+            probe = np.argpartition(coarse_dist, nprobe - 1, axis=1)[:, :nprobe]
+            visited[np.arange(n)[:, None], probe] = True
+        else:
+            visited[:] = True
+
+        # score = ||c||^2 - 2 z.c (sama seperti brute force), jarak sebenarnya = sqrt(score + ||z||^2)
+        best_score = np.full(n, np.inf)
+        best_pos = np.zeros(n, dtype=np.int64)
+        self._scan(Z, visited, best_score, best_pos)
+
+        if exact and nprobe < self.n_lists:
+            best_dist = np.sqrt(np.maximum(best_score + z_sq, 0.0))
+            slack = 1e-9 * (1.0 + best_dist)
+            lower_bound = coarse_dist - self.radius
+            fallback = ~visited & (lower_bound <= (best_dist + slack)[:, None])
+            if fallback.any():
+                self._scan(Z, fallback, best_score, best_pos)
+
+        return self.members[best_pos]
+
+    def search_one(self, z, nprobe=None, exact=None):
+        """Nearest center id for a single scaled vector (one gather instead of a loop over lists)"""
+        nprobe = self.nprobe if nprobe is None else min(nprobe, self.n_lists)
+        exact = self.exact if exact is None else exact
+        z_sq = float(z @ z)
+        coarse_dist = np.sqrt(np.maximum(self.coarse_sq_norms - 2.0 * (self.coarse @ z) + z_sq, 0.0))
+
+        selected = np.zeros(self.n_lists, dtype=bool)
+        if nprobe < self.n_lists:
+            selected[np.argpartition(coarse_dist, nprobe - 1)[:nprobe]] = True
+        else:
+            selected[:] = True
+        pos = np.flatnonzero(np.repeat(selected, self.list_sizes))
+        score = self.list_sq_norms[pos] - 2.0 * (self.list_centers[pos] @ z)
+        i = int(np.argmin(score))
+        best_pos, best_score = pos[i], score[i]
+
+        if exact and nprobe < self.n_lists:
+            best_dist = np.sqrt(max(best_score + z_sq, 0.0))
+            fallback = ~selected & (coarse_dist - self.radius <= best_dist + 1e-9 * (1.0 + best_dist))
+            if fallback.any():
+                pos = np.flatnonzero(np.repeat(fallback, self.list_sizes))
+                score = self.list_sq_norms[pos] - 2.0 * (self.list_centers[pos] @ z)
+                i = int(np.argmin(score))
+                if score[i] < best_score:
+                    best_pos = pos[i]
+        return int(self.members[best_pos])
+
+    def with_centers(self, centers):
+        """Index with the same inverted lists over moved centers (coarse centers and radii recomputed)"""
+        centers = np.asarray(centers, dtype=np.float64)
+        coarse = self.coarse.copy()
+        radius = np.zeros(self.n_lists)
+        for j in range(self.n_lists):
+            members = self.members[self.offsets[j]:self.offsets[j + 1]]
+            if len(members):
+                coarse[j] = centers[members].mean(axis=0)
+                radius[j] = np.linalg.norm(centers[members] - coarse[j], axis=1).max()
+        # Radius dihitung ulang, jadi mode exact tetap identik dengan brute force
+        return CentroidIndex(coarse, radius, self.offsets, self.members, centers, nprobe=self.nprobe,
+                             exact=self.exact)
+
+    def arrays(self):
+        """Arrays stored in the model bundle"""
+        return {
+            "index_coarse": self.coarse,
+            "index_radius": self.radius,
+            "index_offsets": self.offsets,
+            "index_members": self.members,
+        }
+
+
+def build_index(centers, n_lists=None, nprobe=2, exact=True, random_state=42):
+    """Build an IVF index over the (scaled) cluster centers with a small KMeans coarse quantizer"""
+    from sklearn.cluster import KMeans
+
+    centers = np.asarray(centers, dtype=np.float64)
+    k = len(centers)
+    n_lists = n_lists or max(1, int(round(np.sqrt(k))))
+    coarse_model = KMeans(n_clusters=n_lists, n_init=1, random_state=random_state).fit(centers)
+    assignment = coarse_model.labels_
+    coarse = coarse_model.cluster_centers_
+
+    members = np.argsort(assignment, kind="stable")
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+    radius = np.zeros(n_lists)
+    member_dist = np.linalg.norm(centers - coarse[assignment], axis=1)
+    np.maximum.at(radius, assignment, member_dist)
+    return CentroidIndex(coarse, radius, offsets, members, centers, nprobe=nprobe, exact=exact)
+
+
+def brute_force(Z, centers):
+    """Reference nearest-center assignment (same formula as ClusterScorer / KMeans.predict)"""
+    centers = np.asarray(centers, dtype=np.float64)
+    sq_dist = np.atleast_2d(Z) @ centers.T
+    sq_dist *= -2.0
+    sq_dist += np.einsum("kf,kf->k", centers, centers)
+    return np.argmin(sq_dist, axis=1)
+
+
+def verify_index(index, centers, n_queries=20000, noise=0.25, random_state=0):
+    """Agreement rate of the index with brute force on points sampled around the centers"""
+    rng = np.random.default_rng(random_state)
+    centers = np.asarray(centers, dtype=np.float64)
+    Z = centers[rng.integers(0, len(centers), n_queries)] + rng.normal(0, noise, (n_queries, centers.shape[1]))
+    expected = brute_force(Z, centers)
+    got = index.search(Z)
+    # Tie (jarak sama persis) boleh memilih centroid lain
+    d_got = np.linalg.norm(Z - centers[got], axis=1)
+    d_exp = np.linalg.norm(Z - centers[expected], axis=1)
+    return float(np.mean((got == expected) | np.isclose(d_got, d_exp, rtol=0, atol=1e-12)))
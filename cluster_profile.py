@@ -0,0 +1,90 @@
+"""
+Tabel profil cluster yang dihitung sekali saat training.
+
+Karakteristik, deskripsi dan potongan JSON response untuk setiap cluster hanya bergantung pada
+cluster id, jadi dibuat oleh train_model.py dan disimpan di header model bundle. app.py, asgi_app.py
+dan streamlit_app.py tinggal mengambil entry tabel, tanpa membangun dict/string per request.
+"""
+import json
+
+from inference import FEATURES
+
+
+def generate_cluster_description(cluster_id, characteristics):
+    """Generate description based on cluster characteristics"""
+    desc_parts = []
+
+    # Analisis berdasarkan nilai fitur
+    if characteristics['N'] > 100:
+        desc_parts.append("tinggi nitrogen")
+    elif characteristics['N'] < 70:
+        desc_parts.append("rendah nitrogen")
+    else:
+        desc_parts.append("sedang nitrogen")
+
+    if characteristics['P'] > 60:
+        desc_parts.append("tinggi fosfor")
+    elif characteristics['P'] < 40:
+        desc_parts.append("rendah fosfor")
+
+    if characteristics['K'] > 60:
+        desc_parts.append("tinggi kalium")
+    elif characteristics['K'] < 40:
+        desc_parts.append("rendah kalium")
+
+    if characteristics['temperature'] > 30:
+        desc_parts.append("suhu tinggi")
+    elif characteristics['temperature'] < 20:
+        desc_parts.append("suhu rendah")
+
+    if characteristics['rainfall'] > 200:
+        desc_parts.append("curah hujan tinggi")
+    elif characteristics['rainfall'] < 150:
+        desc_parts.append("curah hujan rendah")
+
+    description = f"Cluster {cluster_id} memiliki karakteristik tanah dengan kandungan " + ", ".join(desc_parts) + "."
+    return description
+
+
+class ClusterProfile:
+    """Everything about one cluster that does not depend on the request"""
+
+    __slots__ = ("cluster", "name", "characteristics", "description", "fragment")
+
+    def __init__(self, cluster, characteristics, description):
+        self.cluster = cluster
+        self.name = f"Cluster {cluster}"
+        self.characteristics = characteristics
+        self.description = description
+        # Bagian konstan dari body /predict (tanpa kurung kurawal), siap digabung dengan nilai per request
+        self.fragment = json.dumps({
+            "cluster": cluster,
+            "cluster_name": self.name,
+            "cluster_characteristics": characteristics,
+            "cluster_description": description,
+        }, separators=(",", ":"))[1:-1].encode("utf-8")
+
+    def response_body(self, distance_to_center, fertility_score):
+        """Full /predict JSON body: the precomputed fragment plus the per-request numbers"""
+        return b"".join((
+            b"{", self.fragment,
+            b',"distance_to_center":', repr(float(distance_to_center)).encode(),
+            b',"fertility_score":', repr(float(fertility_score)).encode(), b"}",
+        ))
+
+    def to_dict(self):
+        return {"characteristics": self.characteristics, "description": self.description}
+
+
+def build_cluster_table(profile_rows, features=FEATURES):
+    """Precompute the profile table from the cluster characteristics (k rows in feature order)"""
+    table = []
+    for cluster, row in enumerate(profile_rows):
+        characteristics = {f: float(v) for f, v in zip(features, row)}
+        table.append(ClusterProfile(cluster, characteristics, generate_cluster_description(cluster, characteristics)))
+    return table
+
+
+def table_from_records(records):
+    """Rebuild the table from the records stored in the model bundle header"""
+    return [ClusterProfile(i, r["characteristics"], r["description"]) for i, r in enumerate(records)]
@@ -0,0 +1,237 @@
+"""
+Cache kolumnar bertipe untuk data training (data_core.csv dan arsip yang lebih besar).
+
+CSV dikonversi sekali menjadi satu file .npy per kolom dengan dtype ringkas:
+    N, P, K      -> int16
+    fitur lain   -> float32
+    label        -> categorical (kode int16 + daftar kategori di meta)
+Cache dibangun ulang hanya jika hash SHA-256 file sumber berubah (size + mtime dipakai sebagai
+pengecekan cepat sebelum hashing). train_model.py dan diagnostics.py membuka kolom dengan mmap,
+jadi tidak ada parsing CSV pada run berikutnya.
+
+    python data_cache.py data_core.csv          # bangun / cek cache
+    python data_cache.py data_core.csv --force  # paksa bangun ulang
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURES
+
+CACHE_DIR = "data_cache"
+INT16_COLUMNS = ("N", "P", "K")
+CATEGORICAL_COLUMNS = ("label",)
+_HASH_BLOCK = 8 * 1024 * 1024
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def hash_and_count(path):
+    """SHA-256 of the file and its number of data rows, in one streaming pass"""
+    digest = hashlib.sha256()
+    newlines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+            newlines += block.count(b"\n")
+            last = block[-1:]
+    lines = newlines + (last != b"\n")
+    return digest.hexdigest(), max(lines - 1, 0)
+
+
+def _pointer_path(csv_path, cache_dir):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def _column_dtype(name, series):
+    if name in CATEGORICAL_COLUMNS or series.dtype == object:
+        return "category"
+    if name in INT16_COLUMNS:
+        return "int16"
+    return "float32"
+
+
+def _downcast(name, values, dtype):
+    if dtype == "int16":
+        if not np.isfinite(values).all() or (values != np.round(values)).any():
+            raise ValueError(f"Kolom {name} berisi nilai kosong / pecahan, tidak bisa disimpan sebagai int16")
+        if values.min() < np.iinfo(np.int16).min or values.max() > np.iinfo(np.int16).max:
+            raise ValueError(f"Kolom {name} di luar rentang int16")
+    return values.astype(dtype)
+
+
+def build_cache(csv_path, cache_dir=CACHE_DIR, chunk_size=1_000_000, digest=None, n_rows=None):
+    """Convert csv_path into typed .npy columns; returns the new meta dict"""
+    start = time.perf_counter()
+    if digest is None or n_rows is None:
+        digest, n_rows = hash_and_count(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    out_dir = os.path.join(cache_dir, f"{name}-{digest[:16]}")
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns, arrays, categories = {}, {}, {}
+    offset = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        if not arrays:
+            for col in chunk.columns:
+                dtype = _column_dtype(col, chunk[col])
+                file_dtype = "int16" if dtype == "category" else dtype
+                columns[col] = {"dtype": dtype, "file": f"{col}.npy"}
+                arrays[col] = np.lib.format.open_memmap(
+                    os.path.join(tmp_dir, f"{col}.npy"), mode="w+", dtype=file_dtype, shape=(n_rows,))
+                if dtype == "category":
+                    categories[col] = {}
+        n = len(chunk)
+        for col, info in columns.items():
+            if info["dtype"] == "category":
+                lookup = categories[col]
+                values = chunk[col].astype(str).to_numpy()
+                for v in pd.unique(values):
+                    lookup.setdefault(v, len(lookup))
+                arrays[col][offset:offset + n] = np.array([lookup[v] for v in values], dtype=np.int16)
+            else:
+                arrays[col][offset:offset + n] = _downcast(col, chunk[col].to_numpy(dtype=np.float64), info["dtype"])
+        offset += n
+
+    if offset != n_rows:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise ValueError(f"Jumlah baris {csv_path} berubah saat konversi ({offset} vs {n_rows})")
+    for arr in arrays.values():
+        arr.flush()
+    for col, lookup in categories.items():
+        columns[col]["categories"] = list(lookup)
+
+    meta = {"source": os.path.abspath(csv_path), "sha256": digest, "n_rows": n_rows,
+            "columns": columns, "dir": os.path.basename(out_dir), **source_stamp(csv_path)}
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+    # Pointer ditulis terakhir (atomik), cache lama dibuang setelahnya
+    pointer = _pointer_path(csv_path, cache_dir)
+    old_dir = None
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            old_dir = json.load(f).get("dir")
+    with open(pointer + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(pointer + ".tmp", pointer)
+    if old_dir and old_dir != meta["dir"]:
+        shutil.rmtree(os.path.join(cache_dir, old_dir), ignore_errors=True)
+
+    print(f"[INFO] Cache data dibuat: {out_dir} ({n_rows} baris, {time.perf_counter() - start:.2f} s)")
+    return meta
+
+
+def ensure_cache(csv_path, cache_dir=CACHE_DIR, force=False):
+    """Meta of an up-to-date cache for csv_path, rebuilding it only when the source hash changed"""
+    pointer = _pointer_path(csv_path, cache_dir)
+    meta = None
+    if not force and os.path.exists(pointer):
+        with open(pointer) as f:
+            meta = json.load(f)
+        if not os.path.exists(os.path.join(cache_dir, meta["dir"], "meta.json")):
+            meta = None
+    if meta is not None:
+        stamp = source_stamp(csv_path)
+        if stamp["size"] == meta["size"] and stamp["mtime_ns"] == meta["mtime_ns"]:
+            return meta
+        # File disentuh tapi mungkin isinya sama: bandingkan hash sebelum membangun ulang
+        digest, n_rows = hash_and_count(csv_path)
+        if digest == meta["sha256"]:
+            meta.update(stamp)
+            with open(pointer + ".tmp", "w") as f:
+                json.dump(meta, f, indent=2)
+            os.replace(pointer + ".tmp", pointer)
+            return meta
+        return build_cache(csv_path, cache_dir, digest=digest, n_rows=n_rows)
+    return build_cache(csv_path, cache_dir)
+
+
+class DataCache:
+    """Memory-mapped typed columns of a cached CSV"""
+
+    def __init__(self, meta, cache_dir=CACHE_DIR):
+        self.meta = meta
+        self.n_rows = meta["n_rows"]
+        base = os.path.join(cache_dir, meta["dir"])
+        self.columns = {col: np.load(os.path.join(base, info["file"]), mmap_mode="r")
+                        for col, info in meta["columns"].items()}
+
+    def __len__(self):
+        return self.n_rows
+
+    def feature_matrix(self, start=0, stop=None, features=FEATURES, dtype=np.float64):
+        """(n, f) matrix of the feature columns for rows [start, stop)"""
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        X = np.empty((max(stop - start, 0), len(features)), dtype=dtype)
+        for j, f in enumerate(features):
+            X[:, j] = self.columns[f][start:stop]
+        return X
+
+    def iter_chunks(self, chunk_size, features=FEATURES):
+        for start in range(0, self.n_rows, chunk_size):
+            yield self.feature_matrix(start, start + chunk_size, features)
+
+    def to_frame(self):
+        """DataFrame with the downcast dtypes (categorical columns decoded)"""
+        data = {}
+        for col, info in self.meta["columns"].items():
+            if info["dtype"] == "category":
+                data[col] = pd.Categorical.from_codes(np.asarray(self.columns[col]), info["categories"])
+            else:
+                data[col] = np.asarray(self.columns[col])
+        return pd.DataFrame(data)
+
+
+def open_cache(csv_path, cache_dir=CACHE_DIR, force=False):
+    """Build (if needed) and memory-map the cache of csv_path"""
+    return DataCache(ensure_cache(csv_path, cache_dir, force), cache_dir)
+
+
+def load_frame(csv_path, use_cache=True, cache_dir=CACHE_DIR):
+    """DataFrame of csv_path from the typed cache, falling back to pandas.read_csv if it cannot be cached"""
+    if use_cache:
+        try:
+            return open_cache(csv_path, cache_dir).to_frame()
+        except (ValueError, OSError) as e:
+            print(f"[INFO] Cache data tidak dipakai ({e}), membaca CSV langsung")
+    return pd.read_csv(csv_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="?", default="data_core.csv")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Bangun ulang walaupun hash sama")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache = open_cache(args.csv, args.cache_dir, args.force)
+    size = sum(arr.nbytes for arr in cache.columns.values())
+    print(f"[INFO] {args.csv}: {cache.n_rows} baris, sha256 {cache.meta['sha256'][:16]}..., "
+          f"{size / 1e6:.2f} MB kolumnar vs {cache.meta['size'] / 1e6:.2f} MB CSV ({time.perf_counter() - start:.2f} s)")
+    for col, info in cache.meta["columns"].items():
+        print(f"  {col:<12} {info['dtype']}")
+
+
+if __name__ == "__main__":
+    main()
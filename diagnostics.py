@@ -0,0 +1,260 @@
+"""
+Tahap diagnostik: membuat semua plot training dari artefak yang sudah disimpan.
+
+Dipisah dari train_model.py supaya retrain tidak harus membayar biaya matplotlib/seaborn.
+Setiap plot dirender di process terpisah, dan input scatter/pairplot di-downsample.
+
+    python diagnostics.py --jobs 4 --max-points 5000
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURES
+from model_bundle import load_bundle, BUNDLE_PATH
+from data_cache import load_frame
+
+features = FEATURES
+folder_plots = "hasil_train_plots"
+SWEEP_PATH = "k_sweep.csv"
+
+# Konteks bersama untuk worker process (diisi sekali lewat initializer)
+_ctx = None
+
+
+def _init_worker(ctx):
+    global _ctx
+    _ctx = ctx
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _plt():
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def plot_histogram_distribusi(out_dir):
+    plt, sns = _plt()
+    df = _ctx["df"]
+    plt.figure(figsize=(15, 10))
+    for i, feature in enumerate(features):
+        plt.subplot(3, 3, i+1)
+        sns.histplot(df[feature], kde=True)
+        plt.title(f'Distribusi {feature}')
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "plot_histogram_distribusi.png"))
+    plt.close()
+
+
+def plot_korelasi_heatmap(out_dir):
+    plt, sns = _plt()
+    corr = _ctx["df"][features].corr()
+    plt.figure(figsize=(8,6))
+    sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f")
+    plt.title('Matriks Korelasi Fitur Numerik')
+    plt.savefig(os.path.join(out_dir, "plot_korelasi_heatmap.png"))
+    plt.close()
+
+
+def plot_pairplot(out_dir):
+    # Pairplot (tanpa label karena unsupervised), dari data yang sudah di-downsample
+    plt, sns = _plt()
+    sns.pairplot(_ctx["df_sample"][features], plot_kws={"s": 5, "alpha": 0.5})
+    plt.savefig(os.path.join(out_dir, "plot_pairplot.png"))
+    plt.close()
+
+
+def plot_boxplot_all_features(out_dir):
+    plt, sns = _plt()
+    df = _ctx["df"]
+    plt.figure(figsize=(15,10))
+    for i, feature in enumerate(features):
+        plt.subplot(3, 3, i+1)
+        sns.boxplot(y=df[feature])
+        plt.title(f'Boxplot {feature}')
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "plot_boxplot_all_features.png"))
+    plt.close()
+
+
+def plot_optimal_clusters(out_dir):
+    plt, _ = _plt()
+    sweep = _ctx["sweep"]
+    if sweep is None:
+        return
+
+    # Plot Elbow Method
+    plt.figure(figsize=(10, 5))
+    plt.subplot(1, 2, 1)
+    plt.plot(sweep.index, sweep["inertia"], 'bo-')
+    plt.xlabel('Number of Clusters (k)')
+    plt.ylabel('Inertia')
+    plt.title('Elbow Method')
+    plt.grid(True)
+
+    # Plot Silhouette Score (dengan interval kepercayaan bila silhouette berasal dari sample)
+    plt.subplot(1, 2, 2)
+    plt.plot(sweep.index, sweep["silhouette"], 'ro-')
+    if "silhouette_ci_low" in sweep:
+        plt.fill_between(sweep.index, sweep["silhouette_ci_low"], sweep["silhouette_ci_high"],
+                         color='r', alpha=0.15)
+    plt.xlabel('Number of Clusters (k)')
+    plt.ylabel('Silhouette Score')
+    plt.title('Silhouette Score')
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "plot_optimal_clusters.png"))
+    plt.close()
+
+
+def plot_distribusi_cluster(out_dir):
+    plt, _ = _plt()
+    counts = np.bincount(_ctx["labels"], minlength=len(_ctx["cluster_info"]))
+    plt.figure(figsize=(8, 6))
+    plt.bar(np.arange(len(counts)), counts)
+    plt.xticks(np.arange(len(counts)))
+    plt.title('Distribusi Data per Cluster')
+    plt.xlabel('Cluster')
+    plt.ylabel('Jumlah Data')
+    plt.savefig(os.path.join(out_dir, "plot_distribusi_cluster.png"))
+    plt.close()
+
+
+def plot_clustering_pca(out_dir):
+    # Visualisasi cluster dengan PCA (2D projection): PCA di-fit pada seluruh data,
+    # yang di-scatter hanya sample
+    plt, _ = _plt()
+    from sklearn.decomposition import PCA
+    pca = PCA(n_components=2, random_state=42)
+    pca.fit(_ctx["X_scaled"])
+    sample_idx = _ctx["sample_idx"]
+    X_pca = pca.transform(_ctx["X_scaled"][sample_idx])
+    centers_pca = pca.transform(_ctx["centers"])
+
+    plt.figure(figsize=(10, 8))
+    scatter = plt.scatter(X_pca[:, 0], X_pca[:, 1], c=_ctx["labels"][sample_idx], cmap='viridis', alpha=0.6)
+    plt.scatter(centers_pca[:, 0], centers_pca[:, 1],
+                c='red', marker='x', s=200, linewidths=3, label='Centroids')
+    plt.xlabel(f'PC1 ({pca.explained_variance_ratio_[0]:.2%} variance)')
+    plt.ylabel(f'PC2 ({pca.explained_variance_ratio_[1]:.2%} variance)')
+    plt.title('K-Means Clustering (PCA Visualization)')
+    plt.colorbar(scatter, label='Cluster')
+    plt.legend()
+    plt.savefig(os.path.join(out_dir, "plot_clustering_pca.png"))
+    plt.close()
+
+
+def plot_karakteristik_cluster(out_dir):
+    plt, _ = _plt()
+    cluster_info = _ctx["cluster_info"]
+    plt.figure(figsize=(12, 8))
+    cluster_info.T.plot(kind='bar', figsize=(12, 8))
+    plt.title('Karakteristik Rata-rata Fitur per Cluster')
+    plt.xlabel('Fitur')
+    plt.ylabel('Nilai')
+    plt.legend(title='Cluster', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "plot_karakteristik_cluster.png"))
+    plt.close()
+
+
+def plot_heatmap_cluster(out_dir):
+    plt, sns = _plt()
+    plt.figure(figsize=(10, 6))
+    sns.heatmap(_ctx["cluster_info"], annot=True, fmt='.2f', cmap='YlOrRd', cbar_kws={'label': 'Nilai Rata-rata'})
+    plt.title('Heatmap Karakteristik Cluster')
+    plt.ylabel('Cluster')
+    plt.xlabel('Fitur')
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "plot_heatmap_cluster.png"))
+    plt.close()
+
+
+PLOTS = [
+    plot_pairplot,
+    plot_clustering_pca,
+    plot_histogram_distribusi,
+    plot_boxplot_all_features,
+    plot_korelasi_heatmap,
+    plot_optimal_clusters,
+    plot_distribusi_cluster,
+    plot_karakteristik_cluster,
+    plot_heatmap_cluster,
+]
+
+
+def _run_plot(plot, out_dir):
+    start = time.perf_counter()
+    plot(out_dir)
+    return plot.__name__, time.perf_counter() - start
+
+
+def run_diagnostics(df, bundle, sweep=None, out_dir=folder_plots, max_points=5000, n_jobs=None, random_state=42):
+    """Render every diagnostic plot in parallel from the data, model bundle and k-sweep results"""
+    os.makedirs(out_dir, exist_ok=True)
+    scorer = bundle.scorer()
+    X = df[features].to_numpy(dtype=np.float64)
+    labels, _ = scorer.score_batch(X)
+
+    rng = np.random.default_rng(random_state)
+    sample_idx = np.sort(rng.choice(len(df), size=min(max_points, len(df)), replace=False))
+
+    ctx = {
+        "df": df,
+        "df_sample": df.iloc[sample_idx],
+        "sample_idx": sample_idx,
+        "X_scaled": (X - scorer.mean) / scorer.scale,
+        "centers": np.asarray(scorer.centers),
+        "labels": labels,
+        "cluster_info": pd.DataFrame(bundle.profile, columns=features,
+                                     index=[f'Cluster {i}' for i in range(bundle.n_clusters)]),
+        "sweep": sweep,
+    }
+
+    start = time.perf_counter()
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(PLOTS))
+    if n_jobs == 1:
+        _init_worker(ctx)
+        timings = [_run_plot(plot, out_dir) for plot in PLOTS]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(ctx,)) as pool:
+            futures = [pool.submit(_run_plot, plot, out_dir) for plot in PLOTS]
+            timings = [f.result() for f in futures]
+
+    print(f"\n[INFO] Plot diagnostik disimpan di {out_dir}/ ({time.perf_counter() - start:.2f} s, {n_jobs} process)")
+    for name, seconds in timings:
+        print(f"  {name:<28} {seconds:6.2f} s")
+
+
+def load_sweep(path=SWEEP_PATH):
+    """k-sweep results written by train_model.py, or None if it has not been run"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, index_col="k")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render plot diagnostik dari artefak training")
+    parser.add_argument("--data", default="data_core.csv", help="Path CSV data training")
+    parser.add_argument("--bundle", default=BUNDLE_PATH, help="Path model bundle")
+    parser.add_argument("--sweep", default=SWEEP_PATH, help="Path hasil k-sweep (CSV)")
+    parser.add_argument("--out", default=folder_plots, help="Folder output plot")
+    parser.add_argument("--max-points", type=int, default=5000,
+                        help="Jumlah titik maksimum untuk scatter PCA dan pairplot")
+    parser.add_argument("--jobs", type=int, default=None, help="Jumlah process (default: jumlah core)")
+    parser.add_argument("--no-data-cache", action="store_true", help="Baca CSV langsung tanpa cache kolumnar")
+    args = parser.parse_args()
+
+    df = load_frame(args.data, use_cache=not args.no_data_cache)
+    run_diagnostics(df, load_bundle(args.bundle), load_sweep(args.sweep), args.out, args.max_points, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
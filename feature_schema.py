@@ -0,0 +1,263 @@
+"""
+Skema validasi 7 fitur input (inference.FEATURES), dipakai bersama oleh app.py, asgi_app.py, score_bulk.py
+dan streamlit_app.py.
+
+Dua jenis rentang per fitur:
+  - VALID_RANGES   : batas nilai yang masih masuk akal secara fisik; di luar ini input ditolak
+  - rentang training: min / max data training (feature_ranges.json, ditulis train_model.py); di luar ini
+                     input tetap di-score tetapi ditandai out-of-distribution (prediksi kurang bisa dipercaya)
+
+Batch divalidasi dengan operasi array (satu konversi untuk seluruh batch, tanpa try/except per baris) dan
+menghasilkan kode error per sel; laporan per baris hanya dibangun untuk baris yang bermasalah.
+
+    python feature_schema.py --data data_core.csv      # tulis ulang feature_ranges.json
+"""
+import argparse
+import json
+import math
+import numbers
+import os
+import re
+from itertools import chain
+
+import numpy as np
+
+from inference import FEATURES
+
+FEATURE_RANGES_PATH = "feature_ranges.json"
+
+# Batas fisik (inklusif) per fitur
+VALID_RANGES = {
+    "N": (0.0, 500.0),
+    "P": (0.0, 500.0),
+    "K": (0.0, 500.0),
+    "temperature": (-30.0, 70.0),
+    "humidity": (0.0, 100.0),
+    "ph": (0.0, 14.0),
+    "rainfall": (0.0, 5000.0),
+}
+# Dipakai jika feature_ranges.json belum ada (rentang data_core.csv)
+DEFAULT_TRAINING_RANGES = {
+    "N": (50.0, 150.0),
+    "P": (10.0, 100.0),
+    "K": (10.0, 100.0),
+    "temperature": (15.0, 40.0),
+    "humidity": (30.0, 90.0),
+    "ph": (4.5, 8.5),
+    "rainfall": (100.0, 300.0),
+}
+
+# Kode error per sel (0 = valid)
+OK, MISSING, NOT_A_NUMBER, NOT_FINITE, OUT_OF_RANGE = range(5)
+ERROR_MESSAGES = {
+    MISSING: "wajib diisi",
+    NOT_A_NUMBER: "harus berupa angka",
+    NOT_FINITE: "harus berupa angka finite",
+    OUT_OF_RANGE: "di luar rentang valid",
+}
+# Angka dalam bentuk string ("90", "6.5") tetap diterima, seperti float() sebelumnya
+_NUMBER_RE = re.compile(r"\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$")
+_NUMERIC_TYPES = frozenset((float, int))
+
+
+class InvalidInput(ValueError):
+    """Raised when samples fail validation; errors holds the per-row report"""
+
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
+
+
+def _classify(value):
+    """(float value, error code) of one raw JSON value, without raising"""
+    kind = type(value)
+    if kind is float:
+        return value, OK
+    if value is None:
+        return math.nan, MISSING
+    if kind is str and _NUMBER_RE.match(value):
+        return float(value), OK
+    if kind is int or isinstance(value, numbers.Real) and not isinstance(value, (bool, np.bool_)):
+        # Termasuk skalar NumPy (np.float64, np.int64, ...) dari pemanggil Python
+        try:
+            return float(value), OK
+        except OverflowError:
+            # Integer JSON yang terlalu besar untuk float (mis. 10**400) pasti di luar rentang valid
+            return math.nan, OUT_OF_RANGE
+    return math.nan, NOT_A_NUMBER
+
+
+class ValidationResult:
+    """Outcome of validating a batch: matrix, per-cell error codes and out-of-distribution flags"""
+
+    def __init__(self, schema, X, codes):
+        self.schema = schema
+        self.X = X
+        self.codes = codes
+        self.valid = ~codes.any(axis=1)
+        self.ood = ((X < schema.train_min) | (X > schema.train_max)) & (codes == OK)
+
+    def __len__(self):
+        return len(self.X)
+
+    @property
+    def all_valid(self):
+        return bool(self.valid.all())
+
+    @property
+    def n_invalid(self):
+        return int(len(self.valid) - self.valid.sum())
+
+    def ood_rows(self):
+        return np.flatnonzero(self.ood.any(axis=1) & self.valid)
+
+    def errors(self, limit=100):
+        """Report of the first invalid rows: [{"row": i, "fields": {feature: message}}]"""
+        report = []
+        for row in np.flatnonzero(~self.valid)[:limit].tolist():
+            report.append({"row": row, "fields": {
+                f: ERROR_MESSAGES[code] + self.schema.range_hint(f, code)
+                for f, code in zip(self.schema.features, self.codes[row].tolist()) if code}})
+        return report
+
+
+class FeatureSchema:
+    """Valid and training ranges of the input features; validates single samples and batches"""
+
+    def __init__(self, valid_ranges=None, training_ranges=None, features=FEATURES):
+        self.features = list(features)
+        valid_ranges = valid_ranges or VALID_RANGES
+        training_ranges = training_ranges or DEFAULT_TRAINING_RANGES
+        self.valid_ranges = {f: tuple(valid_ranges[f]) for f in self.features}
+        self.training_ranges = {f: tuple(training_ranges[f]) for f in self.features}
+        self.valid_min = np.array([self.valid_ranges[f][0] for f in self.features])
+        self.valid_max = np.array([self.valid_ranges[f][1] for f in self.features])
+        self.train_min = np.array([self.training_ranges[f][0] for f in self.features])
+        self.train_max = np.array([self.training_ranges[f][1] for f in self.features])
+        # Tuple (nama, min valid, max valid, min training, max training) untuk jalur satu sampel
+        self._single = list(zip(self.features, self.valid_min.tolist(), self.valid_max.tolist(),
+                                self.train_min.tolist(), self.train_max.tolist()))
+
+    @classmethod
+    def load(cls, path=FEATURE_RANGES_PATH):
+        """Schema with the training ranges from path (the defaults if the file does not exist)"""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                ranges = json.load(f)
+            return cls(training_ranges={k: (v["min"], v["max"]) for k, v in ranges["features"].items()})
+        return cls()
+
+    def range_hint(self, feature, code):
+        if code != OUT_OF_RANGE:
+            return ""
+        low, high = self.valid_ranges[feature]
+        return f" ({low:g} - {high:g})"
+
+    def validate_one(self, data):
+        """(x, errors, ood) for one sample dict: 7 floats, {feature: message}, out-of-distribution features"""
+        if not isinstance(data, dict):
+            return None, {"_": "sampel harus berupa objek JSON"}, []
+        x, errors, ood = [], None, []
+        for name, low, high, train_low, train_high in self._single:
+            value = data.get(name)
+            if type(value) is not float:
+                value, code = _classify(value)
+                if code:
+                    errors = errors or {}
+                    errors[name] = ERROR_MESSAGES[code] + self.range_hint(name, code)
+                    continue
+            if not low <= value <= high:
+                # NaN / inf juga gagal di perbandingan ini
+                errors = errors or {}
+                code = OUT_OF_RANGE if math.isfinite(value) else NOT_FINITE
+                errors[name] = ERROR_MESSAGES[code] + self.range_hint(name, code)
+                continue
+            if value < train_low or value > train_high:
+                ood.append(name)
+            x.append(value)
+        return x, errors, ood
+
+    def validate_batch(self, rows):
+        """Validate a list of samples (objects or 7-element arrays) in one pass"""
+        width, features = len(self.features), self.features
+        # Baris yang bukan objek atau array 7 elemen: ketujuh nilainya dianggap bukan angka
+        invalid = [""] * width
+        values = [[row.get(f) for f in features] if type(row) is dict
+                  else row if type(row) in (list, tuple) and len(row) == width else invalid
+                  for row in rows]
+        bad, raw = [], []
+        if not _NUMERIC_TYPES.issuperset(map(type, chain.from_iterable(values))):
+            # Hanya baris yang berisi nilai non-numerik (None, string, bool, ...) diperiksa per nilai
+            bad = [i for i, row in enumerate(values) if not _NUMERIC_TYPES.issuperset(map(type, row))]
+            raw = [values[i] for i in bad]
+            zeros = [0.0] * width
+            for i in bad:
+                values[i] = zeros
+        # Satu konversi untuk seluruh batch
+        try:
+            X = np.array(values, dtype=np.float64).reshape(len(values), width)
+        except OverflowError:
+            # Ada integer yang terlalu besar untuk float: semua baris numerik ikut diperiksa per nilai
+            checked = set(bad)
+            numeric = [i for i in range(len(values)) if i not in checked]
+            bad += numeric
+            raw += [values[i] for i in numeric]
+            X = np.zeros((len(values), width))
+        codes = np.zeros(X.shape, dtype=np.uint8)
+        for i, row in zip(bad, raw):
+            cells = [_classify(v) for v in row]
+            X[i] = [c[0] for c in cells]
+            codes[i] = [c[1] for c in cells]
+        return self._check(X, codes)
+
+    def validate_matrix(self, X):
+        """Validate an already numeric (n, 7) matrix (e.g. a CSV chunk)"""
+        X = np.asarray(X, dtype=np.float64)
+        return self._check(X, np.zeros(X.shape, dtype=np.uint8))
+
+    def _check(self, X, codes):
+        ok = codes == OK
+        finite = np.isfinite(X)
+        codes[ok & ~finite] = NOT_FINITE
+        with np.errstate(invalid="ignore"):
+            outside = (X < self.valid_min) | (X > self.valid_max)
+        codes[ok & finite & outside] = OUT_OF_RANGE
+        return ValidationResult(self, X, codes)
+
+    def to_matrix(self, rows):
+        """(n, 7) matrix of the samples, or InvalidInput with the per-row report"""
+        result = self.validate_batch(rows)
+        if not result.all_valid:
+            raise InvalidInput(f"{result.n_invalid} dari {len(result)} sampel tidak valid", result.errors())
+        return result
+
+
+def training_ranges(X, features=FEATURES):
+    X = np.asarray(X, dtype=np.float64)
+    return {f: (float(lo), float(hi)) for f, lo, hi in zip(features, np.nanmin(X, axis=0), np.nanmax(X, axis=0))}
+
+
+def save_training_ranges(ranges, n_samples, path=FEATURE_RANGES_PATH):
+    """Write feature_ranges.json (min / max per feature of the training data)"""
+    with open(path, "w") as f:
+        json.dump({"n_samples": int(n_samples),
+                   "features": {name: {"min": lo, "max": hi} for name, (lo, hi) in ranges.items()}}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data_core.csv", help="CSV data training")
+    parser.add_argument("--out", default=FEATURE_RANGES_PATH)
+    args = parser.parse_args()
+
+    from data_cache import load_frame
+    X = load_frame(args.data)[FEATURES].to_numpy(dtype=np.float64)
+    ranges = training_ranges(X)
+    save_training_ranges(ranges, len(X), args.out)
+    for name, (lo, hi) in ranges.items():
+        print(f"  {name:<12} {lo:g} - {hi:g}")
+    print(f"[INFO] Rentang training {len(X)} baris disimpan ke {args.out}")
+
+
+if __name__ == "__main__":
+    main()
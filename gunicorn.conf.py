@@ -0,0 +1,60 @@
+# Konfigurasi gunicorn: mode startup cepat dengan preload-and-fork.
+#
+# Dengan preload_app, app.py (termasuk numpy/flask dan model_bundle.bin yang di-mmap)
+# di-import sekali di proses master. Worker dibuat dengan fork sehingga tidak perlu
+# import ulang, dan page model dibagi copy-on-write antar worker.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+# Shared-memory model store (opsional, SHARED_MODELS=1): master membuat satu segment berisi semua
+# array model, worker attach read-only lewat env MODEL_SHM (lihat shared_store.py). File ini dieksekusi
+# di master sebelum app di-import, dan dibaca ulang saat SIGHUP (segment yang sudah ada dipakai lagi).
+if os.environ.get("SHARED_MODELS") == "1" and not os.environ.get("MODEL_SHM"):
+    from shared_store import SharedModelStore
+
+    _store = SharedModelStore.create(f"soilsense-{os.getpid()}")
+    os.environ["MODEL_SHM"] = _store.name
+    os.environ["MODEL_SHM_OWNER"] = str(os.getpid())
+
+
+def on_exit(server):
+    if os.environ.get("MODEL_SHM_OWNER") == str(os.getpid()):
+        from shared_store import SharedModelStore
+
+        SharedModelStore.attach(os.environ["MODEL_SHM"]).unlink()
+        server.log.info("Shared memory model store %s dihapus", os.environ["MODEL_SHM"])
+
+
+def post_worker_init(worker):
+    # Worker gunicorn me-reset signal handler saat start, jadi SIGHUP untuk reload model dipasang di sini
+    # (kirim ke worker: pkill -HUP -P <pid master>; SIGHUP ke master tetap berarti restart worker)
+    import app
+
+    app.install_reload_signal()
+
+
+def worker_exit(server, worker):
+    # Sisa antrian log prediksi ditulis dan segment aktif ditutup sebelum worker berhenti
+    import app
+
+    if app.prediction_log is not None:
+        app.prediction_log.close()
+    # Snapshot rollup worker ini ditulis ke direktori AGGREGATION_SNAPSHOT (digabung worker lain saat query)
+    if app.aggregation is not None:
+        app.aggregation.close()
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    import app
+
+    if app.scorer is None:
+        server.log.error("Model belum termuat, /ready akan mengembalikan 503: %s", app.model_load_error)
+    else:
+        server.log.info("Model termuat dalam %.1f ms", app.model_load_seconds * 1000)
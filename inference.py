@@ -0,0 +1,137 @@
+import numpy as np
+
+FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+class ClusterScorer:
+    """Pure-NumPy scorer: scaling, nearest-centroid search and distance in one step"""
+
+    def __init__(self, params, profiles=None, table=None, index=None, dtype=np.float64):
+        # params: satu array contiguous (k + 2, f), baris 0 = mean, baris 1 = scale,
+        # sisanya = cluster centers. Bisa berupa view read-only dari model bundle (mmap)
+        self.params = params
+        self.mean = params[0]
+        self.scale = params[1]
+        self.centers = params[2:]
+        # ||c||^2 dipakai untuk assignment, sama seperti KMeans.predict di sklearn
+        self.center_sq_norms = np.einsum("kf,kf->k", self.centers, self.centers)
+
+        # Mode float32 (opsional): scaling dan matmul dihitung dalam float32 (setengah bandwidth memori).
+        # Assignment bisa berbeda dari float64 hanya untuk titik tepat di batas cluster (precision_check.py)
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError(f"dtype scoring tidak didukung: {self.dtype}")
+        if self.dtype == np.float32:
+            self._mean = self.mean.astype(np.float32)
+            self._scale = self.scale.astype(np.float32)
+            self._centers = self.centers.astype(np.float32)
+            self._center_sq_norms = self.center_sq_norms.astype(np.float32)
+        else:
+            self._mean, self._scale = self.mean, self.scale
+            self._centers, self._center_sq_norms = self.centers, self.center_sq_norms
+
+        self.n_clusters = self.centers.shape[0]
+        self.profiles = profiles if profiles is not None else [
+            dict(zip(FEATURES, row)) for row in (self.centers * self.scale + self.mean).tolist()
+        ]
+        # Tabel profil cluster (karakteristik, deskripsi, potongan JSON) yang sudah dihitung saat training
+        self._table = table
+        # CentroidIndex opsional (model dengan ribuan cluster), None = brute force
+        self.index = index
+
+    @property
+    def table(self):
+        if self._table is None:
+            from cluster_profile import build_cluster_table
+            self._table = build_cluster_table([[p[f] for f in FEATURES] for p in self.profiles])
+        return self._table
+
+    @staticmethod
+    def pack(mean, scale, centers):
+        """Fold scaler mean/scale and cluster centers into one contiguous float64 array"""
+        centers = np.asarray(centers, dtype=np.float64)
+        params = np.empty((centers.shape[0] + 2, centers.shape[1]), dtype=np.float64)
+        params[0] = mean
+        params[1] = scale
+        params[2:] = centers
+        return params
+
+    @classmethod
+    def from_sklearn(cls, scaler, model_cluster, cluster_info=None):
+        """Build a scorer from the fitted StandardScaler, KMeans and cluster_info table"""
+        profiles = None
+        if cluster_info is not None:
+            profiles = [
+                {f: float(v) for f, v in row.items()}
+                for row in cluster_info[FEATURES].to_dict("records")
+            ]
+        return cls(cls.pack(scaler.mean_, scaler.scale_, model_cluster.cluster_centers_), profiles)
+
+    def with_dtype(self, dtype):
+        """Same model (shared params, table and index) scoring in another float dtype"""
+        return ClusterScorer(self.params, self.profiles, self._table, self.index, dtype)
+
+    def transform(self, X):
+        """Scaled features (the StandardScaler transform shared by every model trained on scaler.pkl)"""
+        Z = np.asarray(X, dtype=self.dtype) - self._mean
+        Z /= self._scale
+        return Z
+
+    def score_one(self, x):
+        """Score a single 7-feature vector, returns (cluster, distance_to_center)"""
+        return self.score_scaled_one(self.transform(x))
+
+    def score_scaled_one(self, z):
+        """score_one for an already scaled vector"""
+        if self.index is not None:
+            # Index IVF disimpan dalam float64
+            cluster = self.index.search_one(z.astype(np.float64, copy=False))
+        else:
+            cluster = int(np.argmin(self._center_sq_norms - 2.0 * (z @ self._centers.T)))
+        diff = z - self._centers[cluster]
+        return cluster, float(np.sqrt(diff @ diff))
+
+    def distance_one(self, x, cluster):
+        """distance_to_center of a single 7-feature vector to a given cluster"""
+        diff = self.transform(x) - self._centers[cluster]
+        return float(np.sqrt(diff @ diff))
+
+    def score_batch(self, X):
+        """Score an (n, 7) matrix, returns (clusters, distances) arrays"""
+        return self.score_scaled_batch(self.transform(X))
+
+    def score_scaled_batch(self, Z):
+        """score_batch for an already scaled matrix"""
+        if self.index is not None:
+            clusters = self.index.search(Z.astype(np.float64, copy=False))
+        else:
+            sq_dist = Z @ self._centers.T
+            sq_dist *= -2.0
+            sq_dist += self._center_sq_norms
+            clusters = np.argmin(sq_dist, axis=1)
+        diff = Z - self._centers[clusters]
+        distances = np.sqrt(np.einsum("nf,nf->n", diff, diff))
+        # Jarak selalu dikembalikan sebagai float64 supaya serialisasi JSON sama di kedua mode
+        return clusters, distances.astype(np.float64, copy=False)
+
+
+def fertility_score(X):
+    """Vectorized fertility score: N x 0.4 + P x 0.3 + K x 0.3"""
+    X = np.asarray(X, dtype=np.float64)
+    return np.round(X[..., 0] * 0.4 + X[..., 1] * 0.3 + X[..., 2] * 0.3, 2)
+
+
+def score_grid(scorer, base, x_feature, x_values, y_feature, y_values):
+    """Score every (x, y) pair of two features with the other features fixed at base, in one batch call.
+    Returns (clusters, distances, fertility) arrays shaped (len(y_values), len(x_values))"""
+    if x_feature == y_feature:
+        raise ValueError("Fitur sumbu x dan y harus berbeda")
+    x_values = np.asarray(x_values, dtype=np.float64)
+    y_values = np.asarray(y_values, dtype=np.float64)
+    shape = (len(y_values), len(x_values))
+    X = np.empty((shape[0] * shape[1], len(FEATURES)))
+    X[:] = np.asarray(base, dtype=np.float64)
+    X[:, FEATURES.index(x_feature)] = np.tile(x_values, shape[0])
+    X[:, FEATURES.index(y_feature)] = np.repeat(y_values, shape[1])
+    clusters, distances = scorer.score_batch(X)
+    return clusters.reshape(shape), distances.reshape(shape), fertility_score(X).reshape(shape)
@@ -0,0 +1,160 @@
+"""
+Instrumentasi latency ringan untuk jalur prediksi, diekspos dalam format teks Prometheus.
+
+Aktif jika METRICS_ENABLED=1. Saat mati, timer() mengembalikan objek no-op bersama
+sehingga biayanya hanya satu pemanggilan method kosong per stage.
+
+Catatan: metrik disimpan per process. Dengan beberapa worker gunicorn, setiap scrape
+/metrics dilayani oleh salah satu worker saja.
+"""
+import bisect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+
+# Bucket latency (detik): dari mikrodetik (tahap scoring) sampai detik (batch besar)
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, getter):
+        self.name = name
+        self.help = help_text
+        self.getter = getter
+
+    def render(self):
+        value = self.getter()
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    names = self.label_names + ("le",)
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+requests_total = registry.add(Counter(
+    "soilsense_requests_total", "Jumlah request prediksi per route dan outcome", ("route", "outcome")))
+request_seconds = registry.add(Histogram(
+    "soilsense_request_duration_seconds", "Durasi total handler prediksi", ("route",)))
+out_of_distribution_total = registry.add(Counter(
+    "soilsense_out_of_distribution_total", "Sampel di luar rentang data training per route dan fitur",
+    ("route", "feature")))
+stage_seconds = registry.add(Histogram(
+    "soilsense_stage_duration_seconds", "Durasi per tahap di dalam handler prediksi", ("route", "stage")))
+
+
+class StageTimer:
+    """Records the time between consecutive mark() calls as per-stage histogram samples"""
+
+    __slots__ = ("route", "start", "last")
+
+    def __init__(self, route):
+        self.route = route
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        stage_seconds.observe(now - self.last, self.route, stage)
+        self.last = now
+
+    def finish(self, outcome):
+        request_seconds.observe(time.perf_counter() - self.start, self.route)
+        requests_total.inc(self.route, outcome)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, stage):
+        pass
+
+    def finish(self, outcome):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def timer(route):
+    """Start timing one request on `route` (no-op when metrics are disabled)"""
+    if METRICS_ENABLED:
+        return StageTimer(route)
+    return NULL_TIMER
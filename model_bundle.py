@@ -0,0 +1,273 @@
+"""
+Format artefak model yang ringkas dan bisa di-mmap (model_bundle.bin).
+
+Layout file (little-endian):
+    [0:8]    magic b"SOILBNDL"
+    [8:10]   versi format (uint16)
+    [10:12]  reserved (uint16)
+    [12:16]  panjang header JSON (uint32)
+    [16:20]  CRC32 seluruh file kecuali 4 byte ini (prefix, header dan payload)
+    [20:..]  header JSON (utf-8), di-pad sampai kelipatan 64 byte
+    [...]    payload: blok params (mean, scale, centers) lalu tabel profil cluster (float64),
+             opsional diikuti array centroid index IVF (lihat centroid_index.py)
+
+Header menyimpan urutan fitur, bentuk array, offset tiap section dan tabel profil cluster
+(karakteristik + deskripsi, lihat cluster_profile.py). CRC32 juga menjadi identitas versi model (checksum).
+Bundle versi 1 (tanpa field CRC di prefix, CRC32 payload di header) masih bisa dibaca.
+Loader hanya butuh NumPy, tidak perlu sklearn/pandas/joblib.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from centroid_index import CentroidIndex
+from cluster_profile import build_cluster_table, table_from_records
+from inference import ClusterScorer, FEATURES
+
+BUNDLE_PATH = "model_bundle.bin"
+BUNDLE_MAGIC = b"SOILBNDL"
+BUNDLE_VERSION = 2
+
+_PREFIX = struct.Struct("<8sHHII")
+_PREFIX_V1 = struct.Struct("<8sHHI")
+_ALIGN = 64
+
+
+class BundleError(ValueError):
+    """Raised when a model bundle is missing, corrupt or incompatible"""
+
+
+def _pad(n):
+    return (-n) % _ALIGN
+
+
+def _file_checksum(data):
+    """CRC32 of a version 2 bundle (bytes or buffer), skipping the CRC field in the prefix"""
+    view = memoryview(data)
+    try:
+        return zlib.crc32(view[_PREFIX.size:], zlib.crc32(view[:_PREFIX_V1.size]))
+    finally:
+        view.release()
+
+
+def write_bundle(path, mean, scale, centers, profile, features=FEATURES, metadata=None, cluster_table=None,
+                 index=None):
+    """Write scaler vectors, centroids, cluster profile table and the optional centroid index"""
+    # Hanya dipakai saat menulis, tidak perlu di-import di jalur serving
+    from datetime import datetime, timezone
+
+    params = ClusterScorer.pack(mean, scale, centers)
+    profile = np.ascontiguousarray(profile, dtype="<f8")
+    if profile.shape != params[2:].shape:
+        raise BundleError(f"Bentuk tabel profil {profile.shape} tidak cocok dengan centers {params[2:].shape}")
+    if cluster_table is None:
+        cluster_table = build_cluster_table(profile.tolist(), features)
+
+    arrays = [("params", params.astype("<f8", copy=False)), ("profile", profile)]
+    if index is not None:
+        arrays += [(name, arr.astype(arr.dtype.newbyteorder("<"), copy=False))
+                   for name, arr in index.arrays().items()]
+
+    sections = {}
+    payload = bytearray()
+    for name, arr in arrays:
+        payload += b"\0" * _pad(len(payload))
+        sections[name] = {"offset": len(payload), "shape": list(arr.shape), "dtype": arr.dtype.str}
+        payload += arr.tobytes()
+
+    header = {
+        "features": list(features),
+        "n_clusters": int(params.shape[0] - 2),
+        "n_features": int(params.shape[1]),
+        "dtype": "<f8",
+        "sections": sections,
+        "payload_size": len(payload),
+        "cluster_table": [entry.to_dict() for entry in cluster_table],
+        "index": {"type": "ivf", "n_lists": index.n_lists, "nprobe": index.nprobe, "exact": index.exact}
+                 if index is not None else None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "metadata": metadata or {},
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * _pad(_PREFIX.size + len(header_bytes))
+
+    head = _PREFIX_V1.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(header_bytes))
+    checksum = zlib.crc32(payload, zlib.crc32(header_bytes, zlib.crc32(head)))
+
+    # Tulis ke file sementara lalu rename, supaya pembaca tidak pernah melihat file setengah jadi
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(head + struct.pack("<I", checksum))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class ModelBundle:
+    """Read-only, memory-mapped view of a model bundle"""
+
+    def __init__(self, path, header, mm, arrays, checksum):
+        self.path = path
+        self.header = header
+        self.features = header["features"]
+        self.n_clusters = header["n_clusters"]
+        self.checksum = checksum
+        self._mm = mm
+        self.arrays = arrays
+        self.params = arrays["params"]
+        self.profile = arrays["profile"]
+
+    @property
+    def mean(self):
+        return self.params[0]
+
+    @property
+    def scale(self):
+        return self.params[1]
+
+    @property
+    def centers(self):
+        return self.params[2:]
+
+    def profiles(self):
+        """Cluster characteristics as a list of {feature: value} dicts"""
+        return [dict(zip(self.features, row)) for row in self.profile.tolist()]
+
+    def cluster_table(self):
+        """Precomputed ClusterProfile entries (rebuilt from the profile for bundles written without one)"""
+        if "cluster_table" in self.header:
+            return table_from_records(self.header["cluster_table"])
+        return build_cluster_table(self.profile.tolist(), self.features)
+
+    def centroid_index(self):
+        """CentroidIndex written by train_model.py, or None when the bundle has no index"""
+        config = self.header.get("index")
+        if not config:
+            return None
+        a = self.arrays
+        return CentroidIndex(a["index_coarse"], a["index_radius"], a["index_offsets"], a["index_members"],
+                             self.centers, nprobe=config["nprobe"], exact=config["exact"])
+
+    def scorer(self, dtype=np.float64):
+        """ClusterScorer that reads the parameters straight from the mapped pages"""
+        table = self.cluster_table()
+        return ClusterScorer(self.params, [entry.characteristics for entry in table], table,
+                             self.centroid_index(), dtype)
+
+
+def _prefix(data, path):
+    """(version, header_len, prefix size, stored checksum or None for version 1) from the first bytes"""
+    if len(data) < _PREFIX_V1.size:
+        raise BundleError(f"{path} terlalu kecil untuk model bundle")
+    magic, version, _, header_len = _PREFIX_V1.unpack_from(data, 0)
+    if magic != BUNDLE_MAGIC:
+        raise BundleError(f"{path} bukan model bundle (magic {magic!r})")
+    if version == 1:
+        return version, header_len, _PREFIX_V1.size, None
+    if version != BUNDLE_VERSION:
+        raise BundleError(f"Versi bundle {version} tidak didukung (butuh {BUNDLE_VERSION})")
+    if len(data) < _PREFIX.size:
+        raise BundleError(f"{path} terlalu kecil untuk model bundle")
+    return version, header_len, _PREFIX.size, _PREFIX.unpack_from(data, 0)[4]
+
+
+def _parse_header(raw):
+    try:
+        header = json.loads(raw)
+    except ValueError as e:
+        raise BundleError(f"Header bundle rusak: {e}")
+    if not isinstance(header, dict):
+        raise BundleError("Header bundle rusak: bukan objek JSON")
+    return header
+
+
+def read_header(path):
+    """(header, checksum) of a bundle without mapping or verifying the payload (cheap enough to poll)"""
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            _, header_len, prefix_size, checksum = _prefix(prefix, path)
+            f.seek(prefix_size)
+            header = _parse_header(f.read(header_len))
+    except OSError as e:
+        raise BundleError(f"Tidak bisa membuka {path}: {e}")
+    if checksum is None:
+        checksum = header.get("checksum")
+    return header, checksum
+
+
+def load_bundle(path=BUNDLE_PATH, features=FEATURES, verify=True):
+    """Memory-map a bundle, checking magic, version, feature order and checksum"""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"Tidak bisa membuka {path}: {e}")
+
+    _, header_len, prefix_size, checksum = _prefix(mm, path)
+    # Versi 2: CRC mencakup header, jadi header yang rusak terdeteksi sebelum di-parse
+    if verify and checksum is not None and _file_checksum(mm) != checksum:
+        raise BundleError(f"Checksum {path} tidak cocok, file kemungkinan rusak")
+    header = _parse_header(mm[prefix_size:prefix_size + header_len])
+
+    # Field header yang hilang / bertipe salah dilaporkan sebagai BundleError, bukan KeyError
+    try:
+        if header["features"] != list(features):
+            raise BundleError(f"Urutan fitur bundle {header['features']} berbeda dengan {list(features)}")
+
+        payload_start = prefix_size + header_len
+        payload = memoryview(mm)[payload_start:payload_start + header["payload_size"]]
+        if len(payload) != header["payload_size"]:
+            raise BundleError(f"{path} terpotong: payload {len(payload)} dari {header['payload_size']} bytes")
+        if checksum is None:
+            checksum = header["checksum"]
+            if verify and zlib.crc32(payload) != checksum:
+                raise BundleError(f"Checksum {path} tidak cocok, file kemungkinan rusak")
+        payload.release()
+
+        arrays = {}
+        for name, section in header["sections"].items():
+            shape = tuple(section["shape"])
+            arrays[name] = np.frombuffer(
+                mm, dtype=section.get("dtype", header["dtype"]), count=int(np.prod(shape)),
+                offset=payload_start + section["offset"]
+            ).reshape(shape)
+        return ModelBundle(path, header, mm, arrays, checksum)
+    except BundleError:
+        raise
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise BundleError(f"Header bundle {path} tidak lengkap atau tidak valid: {e!r}")
+
+
+def export_from_sklearn(path, scaler, model_cluster, cluster_info, metadata=None, cluster_table=None, index=None):
+    """Write a bundle from the fitted StandardScaler, KMeans and cluster_info DataFrame"""
+    write_bundle(
+        path,
+        scaler.mean_,
+        scaler.scale_,
+        model_cluster.cluster_centers_,
+        cluster_info[FEATURES].to_numpy(dtype=np.float64),
+        metadata=metadata,
+        cluster_table=cluster_table,
+        index=index,
+    )
+
+
+if __name__ == "__main__":
+    # Konversi pickle lama (model_cluster.pkl, scaler.pkl, cluster_info.pkl) menjadi bundle
+    import joblib
+
+    export_from_sklearn(
+        BUNDLE_PATH,
+        joblib.load("scaler.pkl"),
+        joblib.load("model_cluster.pkl"),
+        joblib.load("cluster_info.pkl"),
+        metadata={"source": "pickle"},
+    )
+    bundle = load_bundle(BUNDLE_PATH)
+    print(f"[INFO] Bundle disimpan: {BUNDLE_PATH} ({os.path.getsize(BUNDLE_PATH)} bytes, "
+          f"{bundle.n_clusters} clusters, crc32={bundle.checksum:08x})")
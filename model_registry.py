@@ -0,0 +1,250 @@
+"""
+Registry model tambahan yang dilayani bersama model clustering.
+
+Model di bawah ini dilatih pada fitur yang di-scale dengan StandardScaler scaler.pkl versi awal:
+  - "crop"      : DecisionTreeClassifier (model_classifier.pkl) + LabelEncoder (label_encoder.pkl)
+  - "fertility" : LinearRegression (model_regressor.pkl), prediksi fertility score
+Mean / scale scaler tersebut disimpan per model di model_scalers.json, karena scaler di model bundle ikut
+berubah setiap retrain, hot reload atau online update. Vektor ter-scale dari ClusterScorer hanya dipakai
+ulang jika parameternya persis sama; jika tidak, input di-scale dengan parameter model itu sendiri.
+
+Model dimuat saat pertama kali dipakai (lazy, sekali per process) lalu diubah menjadi array NumPy
+(node tree, koefisien), sehingga prediksi per request tidak melewati validasi sklearn.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+CLASSIFIER_PATH = "model_classifier.pkl"
+REGRESSOR_PATH = "model_regressor.pkl"
+LABEL_ENCODER_PATH = "label_encoder.pkl"
+SCALERS_PATH = "model_scalers.json"
+
+# Gambar tanaman yang ada di static/assets/images (nama file tidak seragam)
+CROP_IMAGES = {
+    "Barley": "Barley.webp", "Cotton": "Cotton.jpg", "Groundnut": "GroundNuts.jpeg", "Maize": "Maize.png",
+    "Millet": "Millet.jpg", "Rice": "Rice.jpg", "Soybean": "Soybean.jpg", "Sugarcane": "Sugarcane.png",
+    "Sunflower": "SunFlower.jpeg", "Wheat": "Wheat.jpg",
+}
+
+
+class ModelUnavailable(RuntimeError):
+    """Raised when a registered model cannot be loaded"""
+
+
+class FeatureScaler:
+    """StandardScaler mean / scale a registry model was trained with"""
+
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        # (params scorer terakhir, sama atau tidak): perbandingan array tidak diulang setiap request
+        self._last_match = (None, False)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.mean_, scaler.scale_)
+
+    def params(self):
+        return np.array([self.mean, self.scale])
+
+    def to_dict(self):
+        return {"mean": self.mean.tolist(), "scale": self.scale.tolist()}
+
+    def matches(self, scorer):
+        """Whether the cluster scorer scales with exactly these parameters"""
+        params, same = self._last_match
+        if params is not scorer.params:
+            same = bool(np.array_equal(self.mean, scorer.mean) and np.array_equal(self.scale, scorer.scale))
+            self._last_match = (scorer.params, same)
+        return same
+
+    def input_for(self, x, scorer, z):
+        """Scaled input of one sample: the scorer's z if it used the same scaler, else x scaled here"""
+        if self.matches(scorer):
+            return z
+        return (np.asarray(x, dtype=np.float64) - self.mean) / self.scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+
+def load_scaler(name, path=SCALERS_PATH):
+    """Training scaler of a registry model from model_scalers.json"""
+    with open(path) as f:
+        scalers = json.load(f)
+    if name not in scalers:
+        raise KeyError(f"Parameter scaler model {name} tidak ada di {path}")
+    return FeatureScaler(scalers[name]["mean"], scalers[name]["scale"])
+
+
+def save_scalers(scalers, path=SCALERS_PATH):
+    """Write {model name: FeatureScaler} to model_scalers.json (after retraining a registry model)"""
+    with open(path, "w") as f:
+        json.dump({name: scaler.to_dict() for name, scaler in scalers.items()}, f, indent=2)
+
+
+class TreeKernel:
+    """Flattened decision tree (node arrays of a fitted sklearn tree) evaluated with NumPy"""
+
+    def __init__(self, children_left, children_right, feature, threshold, value):
+        self.children_left = np.asarray(children_left, dtype=np.int64)
+        self.children_right = np.asarray(children_right, dtype=np.int64)
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        # value: (n_nodes, n_classes) jumlah / fraksi sampel per kelas di setiap node
+        self.value = np.asarray(value, dtype=np.float64)
+        self.n_nodes = len(self.children_left)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        tree = model.tree_
+        return cls(tree.children_left, tree.children_right, tree.feature, tree.threshold, tree.value[:, 0, :])
+
+    def arrays(self):
+        return {"children_left": self.children_left, "children_right": self.children_right,
+                "feature": self.feature, "threshold": self.threshold, "value": self.value}
+
+    def apply_one(self, z):
+        """Leaf id for one scaled vector"""
+        # sklearn membandingkan input float32 dengan threshold float64; dibuat sama persis
+        z = np.asarray(z, dtype=np.float32)
+        left, right, feature, threshold = self.children_left, self.children_right, self.feature, self.threshold
+        node = 0
+        while left[node] != -1:
+            node = left[node] if z[feature[node]] <= threshold[node] else right[node]
+        return int(node)
+
+    def apply(self, Z):
+        """Leaf id for every row of a scaled (n, f) matrix (all rows descend one level per step)"""
+        Z = np.asarray(Z, dtype=np.float32)
+        rows = np.arange(len(Z))
+        node = np.zeros(len(Z), dtype=np.int64)
+        active = self.children_left[node] != -1
+        while active.any():
+            idx = rows[active]
+            n = node[idx]
+            go_left = Z[idx, self.feature[n]] <= self.threshold[n]
+            node[idx] = np.where(go_left, self.children_left[n], self.children_right[n])
+            active[idx] = self.children_left[node[idx]] != -1
+        return node
+
+
+class CropModel:
+    """Crop recommendation: decision tree leaves mapped to crop names, with the leaf class share as confidence"""
+
+    def __init__(self, tree, labels, leaf_class=None, leaf_confidence=None, scaler=None):
+        self.tree = tree
+        self.labels = list(labels)
+        # Scaler saat training (FeatureScaler), lihat docstring modul
+        self.scaler = scaler
+        # Kelas dan confidence per node bisa diberikan dari luar (mis. view shared memory, shared_store.py)
+        if leaf_class is None or leaf_confidence is None:
+            value = tree.value
+            leaf_class = np.argmax(value, axis=1)
+            totals = value.sum(axis=1)
+            leaf_confidence = value[np.arange(tree.n_nodes), leaf_class] / np.where(totals > 0, totals, 1.0)
+        self.leaf_class = leaf_class
+        self.leaf_confidence = leaf_confidence
+        # Potongan JSON per kelas disiapkan sekali, seperti tabel profil cluster
+        self.fragments = []
+        for label in self.labels:
+            image = f"/static/assets/images/{CROP_IMAGES[label]}" if label in CROP_IMAGES else None
+            self.fragments.append(json.dumps({"crop": label, "crop_image": image},
+                                             separators=(",", ":"))[1:-1].encode("utf-8"))
+
+    @classmethod
+    def from_sklearn(cls, classifier, label_encoder=None, scaler=None):
+        classes = classifier.classes_
+        if label_encoder is not None:
+            classes = label_encoder.inverse_transform(classes)
+        return cls(TreeKernel.from_sklearn(classifier), [str(c) for c in classes], scaler=scaler)
+
+    def predict_one(self, z):
+        """(class index, confidence) for one scaled vector"""
+        leaf = self.tree.apply_one(z)
+        return int(self.leaf_class[leaf]), float(self.leaf_confidence[leaf])
+
+    def predict(self, Z):
+        leaves = self.tree.apply(Z)
+        return self.leaf_class[leaves], self.leaf_confidence[leaves]
+
+
+class LinearKernel:
+    """Linear model prediction z . coef + intercept"""
+
+    def __init__(self, coef, intercept, scaler=None):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(np.ravel(intercept)[0])
+        self.scaler = scaler
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        return cls(model.coef_, model.intercept_, scaler)
+
+    def predict_one(self, z):
+        return float(np.asarray(z, dtype=np.float64) @ self.coef + self.intercept)
+
+    def predict(self, Z):
+        return np.asarray(Z, dtype=np.float64) @ self.coef + self.intercept
+
+
+def load_crop_model(classifier_path=CLASSIFIER_PATH, encoder_path=LABEL_ENCODER_PATH, scalers_path=SCALERS_PATH):
+    import joblib
+    scaler = load_scaler("crop", scalers_path)
+    classifier = joblib.load(classifier_path)
+    encoder = joblib.load(encoder_path) if encoder_path and os.path.exists(encoder_path) else None
+    return CropModel.from_sklearn(classifier, encoder, scaler)
+
+
+def load_fertility_model(regressor_path=REGRESSOR_PATH, scalers_path=SCALERS_PATH):
+    import joblib
+    return LinearKernel.from_sklearn(joblib.load(regressor_path), load_scaler("fertility", scalers_path))
+
+
+class ModelRegistry:
+    """Named models loaded on first use (once per process); failures are remembered and reported"""
+
+    def __init__(self, loaders):
+        self.loaders = dict(loaders)
+        self._models = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+            if name in self._errors:
+                raise ModelUnavailable(self._errors[name])
+            try:
+                model = self.loaders[name]()
+            except Exception as e:
+                self._errors[name] = f"{type(e).__name__}: {e}"
+                print(f"[ERROR] Gagal memuat model {name}: {e}")
+                raise ModelUnavailable(self._errors[name]) from e
+            self._models[name] = model
+            return model
+
+    def status(self):
+        status = {}
+        for name in self.loaders:
+            if name in self._models:
+                status[name] = "loaded"
+            elif name in self._errors:
+                status[name] = "error: " + self._errors[name]
+            else:
+                status[name] = "not loaded"
+        return status
+
+
+def default_registry(shared_store=None):
+    """Registry of the crop and fertility models, from the shared-memory store if one is attached"""
+    if shared_store is not None:
+        return ModelRegistry({"crop": shared_store.crop_model, "fertility": shared_store.fertility_model})
+    return ModelRegistry({"crop": load_crop_model, "fertility": load_fertility_model})
@@ -0,0 +1,164 @@
+"""
+Hot reload model bundle tanpa restart worker.
+
+Setiap worker menjalankan satu thread background (ModelReloader) yang:
+  - mengecek file model bundle dan file trigger (`<bundle>.reload`) setiap `interval` detik,
+    atau langsung saat dibangunkan oleh signal (SIGHUP) / endpoint admin,
+  - memuat bundle baru di background, lalu memvalidasinya terhadap canary set dari data_core.csv,
+  - menukar model secara atomik lewat callback. Request yang sedang berjalan sudah memegang
+    referensi model lama dan menyelesaikan prediksinya dengan model tersebut.
+
+Bundle yang gagal dimuat atau gagal validasi canary ditolak; model lama tetap dipakai.
+"""
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import FEATURES
+from model_bundle import load_bundle
+
+
+class CanaryError(ValueError):
+    """Raised when a candidate model fails validation on the canary set"""
+
+
+def file_stamp(path):
+    """(inode, mtime, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def load_canary(path="data_core.csv", size=256):
+    """Evenly spaced rows of the training CSV (feature columns only), without pandas"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        cols = [header.index(feat) for feat in FEATURES]
+        rows = [[row[c] for c in cols] for row in reader if row]
+    if not rows:
+        return None
+    step = max(1, len(rows) // size)
+    X = np.array(rows[::step][:size], dtype=np.float64)
+    return X[np.isfinite(X).all(axis=1)]
+
+
+def validate_model(candidate, canary, current=None, max_distance_ratio=2.0):
+    """Score the canary set with a candidate scorer; raise CanaryError if it looks broken"""
+    if len(candidate.table) != candidate.n_clusters:
+        raise CanaryError(f"Tabel profil berisi {len(candidate.table)} cluster, model {candidate.n_clusters}")
+    report = {"canary_size": 0 if canary is None else len(canary)}
+    if canary is None or len(canary) == 0:
+        return report
+
+    clusters, distances = candidate.score_batch(canary)
+    if not np.isfinite(distances).all():
+        raise CanaryError("Jarak ke cluster center tidak finite pada canary set")
+    if clusters.min() < 0 or clusters.max() >= candidate.n_clusters:
+        raise CanaryError("Cluster id di luar rentang pada canary set")
+    # Jalur single-sample harus konsisten dengan jalur batch
+    for x, c in zip(canary[:16], clusters[:16]):
+        if candidate.score_one(x)[0] != c:
+            raise CanaryError("score_one dan score_batch tidak konsisten pada canary set")
+
+    report["mean_distance"] = float(distances.mean())
+    report["clusters_used"] = int(len(np.unique(clusters)))
+    if current is not None:
+        current_clusters, current_distances = current.score_batch(canary)
+        ratio = float(distances.mean() / max(current_distances.mean(), 1e-12))
+        report["distance_ratio"] = ratio
+        if current.n_clusters == candidate.n_clusters:
+            report["assignment_agreement"] = float(np.mean(current_clusters == clusters))
+        if ratio > max_distance_ratio:
+            raise CanaryError(f"Rata-rata jarak canary naik {ratio:.2f}x (batas {max_distance_ratio}x)")
+    return report
+
+
+class ModelReloader:
+    """Per-process background thread that loads, validates and swaps in new model bundles"""
+
+    def __init__(self, bundle_path, current, install, interval=5.0, canary_path="data_core.csv",
+                 canary_size=256, max_distance_ratio=2.0, make_scorer=None):
+        # bundle_path(): path aktif, current(): scorer aktif, install(bundle, scorer, stamp, report): swap,
+        # make_scorer(bundle): scorer untuk bundle baru (default bundle.scorer())
+        self.bundle_path = bundle_path
+        self.current = current
+        self.install = install
+        self.interval = interval
+        self.canary_path = canary_path
+        self.canary_size = canary_size
+        self.max_distance_ratio = max_distance_ratio
+        self.make_scorer = make_scorer
+        self.stamp = None
+        self.last_result = None
+        self._canary = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._forced = False
+        self._pid = None
+
+    def trigger_path(self):
+        return self.bundle_path() + ".reload"
+
+    def current_stamp(self):
+        path = self.bundle_path()
+        return file_stamp(path), file_stamp(path + ".reload")
+
+    def canary(self):
+        if self._canary is None:
+            self._canary = load_canary(self.canary_path, self.canary_size)
+        return self._canary
+
+    def check(self, force=False):
+        """Reload if the bundle or trigger file changed (or force); returns a result dict or None"""
+        with self._lock:
+            stamp = self.current_stamp()
+            if not force and (stamp == self.stamp or stamp[0] is None):
+                return None
+            start = time.perf_counter()
+            result = {"time": time.time(), "path": self.bundle_path(), "forced": force}
+            try:
+                new_bundle = load_bundle(result["path"])
+                new_scorer = self.make_scorer(new_bundle) if self.make_scorer else new_bundle.scorer()
+                result["canary"] = validate_model(new_scorer, self.canary(), self.current(), self.max_distance_ratio)
+                result["checksum"] = f"{new_bundle.checksum:08x}"
+                self.install(new_bundle, new_scorer, stamp, result)
+                result["status"] = "swapped"
+            except Exception as e:
+                result["status"] = "rejected"
+                result["error"] = str(e)
+                print(f"[ERROR] Model baru ditolak, model lama tetap dipakai: {e}")
+            # Stamp dicatat juga saat gagal, supaya file yang sama tidak dicoba terus-menerus
+            self.stamp = stamp
+            result["seconds"] = time.perf_counter() - start
+            self.last_result = result
+            return result
+
+    def request(self):
+        """Ask the background thread to reload now (safe to call from a signal handler)"""
+        self._forced = True
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            self._wake.clear()
+            forced, self._forced = self._forced, False
+            try:
+                self.check(force=forced)
+            except Exception as e:
+                print(f"[ERROR] Pengecekan model gagal: {e}")
+
+    def ensure_started(self):
+        """Start the watcher thread in this process (threads do not survive a gunicorn fork)"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="model-reloader", daemon=True).start()
@@ -0,0 +1,292 @@
+"""
+Online learning: model clustering di-update secara incremental dari sampel terkonfirmasi.
+
+Alur:
+  1. Worker app.py (ONLINE_LEARNING=1) menerima sampel terkonfirmasi di POST /feedback dan
+     menambahkannya ke spool NDJSON (FeedbackSpool, satu baris per sampel).
+  2. Process ini (satu instance) mengambil isi spool secara berkala, meng-update statistik scaler
+     (running mean/variance, rumus gabungan seperti StandardScaler.partial_fit) dan centroid
+     (update mini-batch: rata-rata berbobot jumlah sampel per cluster, seperti MiniBatchKMeans).
+  3. Setiap interval, model baru ditulis atomik ke model_bundle.online.bin (model_bundle.bin hasil training
+     offline tidak pernah ditimpa). Worker dengan ONLINE_LEARNING=1 memakai bundle online selama bundle itu
+     dibangun di atas model_bundle.bin yang sekarang (metadata base_checksum), lewat hot reload tanpa restart.
+  4. Sebelum publish, learner mengecek checksum model_bundle.bin. Jika sudah diganti retrain offline, learner
+     mulai ulang dari bundle baru dan memutar ulang sampel sejak publish terakhir.
+  5. Metrik drift (pergeseran scaler dan centroid, perubahan assignment) dicatat setiap versi baru.
+
+    python online_update.py --interval 60 --min-samples 500
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from inference import FEATURES
+from model_bundle import load_bundle, read_header, write_bundle, BundleError, BUNDLE_PATH
+
+SPOOL_PATH = os.path.join("online_updates", "feedback.ndjson")
+DRIFT_LOG_PATH = os.path.join("online_updates", "drift.jsonl")
+# Kunci metadata yang ditulis learner (tidak ikut diwariskan dari bundle dasar)
+ONLINE_METADATA = ("mode", "online_version", "n_samples", "base_checksum")
+
+
+def online_bundle_path(base_path=BUNDLE_PATH):
+    """Where the learner publishes: model_bundle.bin -> model_bundle.online.bin"""
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.online{ext}"
+
+
+def promoted_bundle(base_path=BUNDLE_PATH, online_path=None):
+    """The online bundle if it was learned on top of the current base bundle, otherwise the base bundle"""
+    online_path = online_path or online_bundle_path(base_path)
+    try:
+        online, _ = read_header(online_path)
+        _, base_checksum = read_header(base_path)
+    except BundleError:
+        return base_path
+    if online.get("metadata", {}).get("base_checksum") == base_checksum:
+        return online_path
+    return base_path
+
+
+class FeedbackSpool:
+    """Append-only NDJSON spool shared by all workers (one O_APPEND write per request)"""
+
+    def __init__(self, path=SPOOL_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def append(self, X):
+        """Append confirmed samples ((n, 7) matrix in FEATURES order)"""
+        data = "".join(json.dumps(row) + "\n" for row in np.asarray(X, dtype=np.float64).tolist()).encode()
+        # File dibuka per request supaya rotasi oleh learner langsung terlihat oleh semua worker
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def drain(self, grace=0.5):
+        """Take everything written so far: rotate the spool, wait for in-flight writes, read it"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return np.empty((0, len(FEATURES)))
+        taken = f"{self.path}.{os.getpid()}.processing"
+        os.replace(self.path, taken)
+        time.sleep(grace)
+        rows = []
+        with open(taken, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(row, list) and len(row) == len(FEATURES):
+                    rows.append(row)
+        os.remove(taken)
+        X = np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+        return X[np.isfinite(X).all(axis=1)]
+
+
+class OnlineModel:
+    """Running scaler statistics and centroids (kept in original units) updated from mini-batches"""
+
+    def __init__(self, mean, var, n_samples, centers_orig, counts, max_count=None, profile_offset=None, index=None,
+                 base_checksum=None, base_metadata=None):
+        self.mean = np.array(mean, dtype=np.float64)
+        self.var = np.array(var, dtype=np.float64)
+        self.n_samples = float(n_samples)
+        self.centers_orig = np.array(centers_orig, dtype=np.float64)
+        self.counts = np.array(counts, dtype=np.float64)
+        # Batas bobot per centroid supaya model tetap bisa mengikuti perubahan (None = rata-rata murni)
+        self.max_count = max_count
+        # Selisih tabel profil training terhadap centroid, supaya profil ikut bergeser bersama centroid
+        self.profile_offset = np.zeros_like(self.centers_orig) if profile_offset is None else profile_offset
+        # Index IVF bundle dasar: inverted list yang sama dipakai ulang dengan centroid baru
+        self.index = index
+        # Checksum dan metadata model_bundle.bin tempat model ini dimulai
+        self.base_checksum = base_checksum
+        self.base_metadata = dict(base_metadata or {})
+
+    @classmethod
+    def from_bundle(cls, bundle, reference=None, prior_weight=None, max_count=None):
+        """Start from the deployed bundle; cluster weights come from assigning the reference data"""
+        scorer = bundle.scorer()
+        k = bundle.n_clusters
+        if reference is not None and len(reference):
+            counts = np.bincount(scorer.score_batch(reference)[0], minlength=k).astype(np.float64)
+            n_samples = float(len(reference))
+        else:
+            n_samples = float(prior_weight or bundle.header.get("metadata", {}).get("n_samples", 10000))
+            counts = np.full(k, n_samples / k)
+        if prior_weight:
+            counts *= prior_weight / counts.sum()
+            n_samples = float(prior_weight)
+        centers_orig = scorer.centers * scorer.scale + scorer.mean
+        metadata = bundle.header.get("metadata", {})
+        # Bundle online yang sudah ada: lanjutkan dari sana, tetap dengan bundle dasar yang sama
+        base_checksum = metadata.get("base_checksum", bundle.checksum)
+        base_metadata = {key: value for key, value in metadata.items() if key not in ONLINE_METADATA}
+        return cls(scorer.mean, scorer.scale ** 2, n_samples, centers_orig, counts, max_count,
+                   np.asarray(bundle.profile) - centers_orig, bundle.centroid_index(), base_checksum, base_metadata)
+
+    @property
+    def scale(self):
+        scale = np.sqrt(self.var)
+        # Sama seperti StandardScaler: fitur dengan variance 0 tidak di-scale
+        scale[scale == 0.0] = 1.0
+        return scale
+
+    def scaled_centers(self):
+        return (self.centers_orig - self.mean) / self.scale
+
+    def assign(self, X):
+        Z = (X - self.mean) / self.scale
+        centers = self.scaled_centers()
+        sq_dist = Z @ centers.T
+        sq_dist *= -2.0
+        sq_dist += np.einsum("kf,kf->k", centers, centers)
+        return np.argmin(sq_dist, axis=1)
+
+    def partial_fit(self, X):
+        """Update scaler statistics (Chan et al. merge) and centroids with one mini-batch"""
+        if len(X) == 0:
+            return
+        # Assignment memakai model sebelum update, seperti MiniBatchKMeans.partial_fit
+        labels = self.assign(X)
+
+        n_b = float(len(X))
+        mean_b = X.mean(axis=0)
+        var_b = X.var(axis=0)
+        n = self.n_samples + n_b
+        delta = mean_b - self.mean
+        self.var = (self.var * self.n_samples + var_b * n_b + delta ** 2 * self.n_samples * n_b / n) / n
+        self.mean = self.mean + delta * n_b / n
+        self.n_samples = n
+
+        k = len(self.counts)
+        batch_counts = np.bincount(labels, minlength=k).astype(np.float64)
+        batch_sums = np.zeros_like(self.centers_orig)
+        np.add.at(batch_sums, labels, X)
+        touched = batch_counts > 0
+        new_counts = self.counts + batch_counts
+        self.centers_orig[touched] = ((self.centers_orig[touched] * self.counts[touched, None] + batch_sums[touched])
+                                      / new_counts[touched, None])
+        if self.max_count is not None:
+            new_counts = np.minimum(new_counts, self.max_count)
+        self.counts = new_counts
+
+    def write(self, path, metadata=None):
+        """Publish the model as a bundle, keeping the base bundle's metadata, profile table and index"""
+        centers = self.scaled_centers()
+        index = self.index.with_centers(centers) if self.index is not None else None
+        metadata = {**self.base_metadata, **(metadata or {}), "base_checksum": self.base_checksum}
+        write_bundle(path, self.mean, self.scale, centers, self.centers_orig + self.profile_offset,
+                     metadata=metadata, index=index)
+
+
+def model_drift(old_scorer, new_scorer, X=None):
+    """Drift between two model versions: scaler / centroid shift and (optionally) assignment changes on X"""
+    if old_scorer.n_clusters != new_scorer.n_clusters:
+        return {"n_clusters_changed": [old_scorer.n_clusters, new_scorer.n_clusters]}
+    # Pergeseran diukur dalam satuan std model lama supaya semua fitur sebanding
+    old_centers = old_scorer.centers * old_scorer.scale + old_scorer.mean
+    new_centers = new_scorer.centers * new_scorer.scale + new_scorer.mean
+    centroid_shift = np.linalg.norm((new_centers - old_centers) / old_scorer.scale, axis=1)
+    drift = {
+        "mean_shift_std": float(np.abs((new_scorer.mean - old_scorer.mean) / old_scorer.scale).max()),
+        "log_scale_ratio_max": float(np.abs(np.log(new_scorer.scale / old_scorer.scale)).max()),
+        "centroid_shift_max": float(centroid_shift.max()),
+        "centroid_shift_mean": float(centroid_shift.mean()),
+    }
+    if X is not None and len(X):
+        old_labels, old_dist = old_scorer.score_batch(X)
+        new_labels, new_dist = new_scorer.score_batch(X)
+        drift["n_samples"] = int(len(X))
+        drift["assignment_changed"] = float(np.mean(old_labels != new_labels))
+        drift["mean_distance_old"] = float(old_dist.mean())
+        drift["mean_distance_new"] = float(new_dist.mean())
+    return drift
+
+
+def log_drift(entry, path=DRIFT_LOG_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def run(bundle_path=BUNDLE_PATH, spool_path=SPOOL_PATH, interval=60.0, min_samples=100, reference=None,
+        prior_weight=None, max_count=None, once=False, publish_path=None, drift_path=DRIFT_LOG_PATH):
+    """Learner loop: drain the spool, update the model, publish a new online bundle every interval"""
+    publish_path = publish_path or online_bundle_path(bundle_path)
+    bundle = load_bundle(promoted_bundle(bundle_path, publish_path))
+    model = OnlineModel.from_bundle(bundle, reference, prior_weight, max_count)
+    version = int(bundle.header.get("metadata", {}).get("online_version", 0))
+    spool = FeedbackSpool(spool_path)
+    window = []
+    print(f"[INFO] Online learner aktif: {bundle.n_clusters} cluster, bobot awal {model.n_samples:.0f} sampel, "
+          f"spool {spool_path}, publish ke {publish_path}")
+
+    while True:
+        started = time.monotonic()
+        X = spool.drain()
+        if len(X):
+            model.partial_fit(X)
+            window.append(X)
+
+        n_window = sum(len(x) for x in window)
+        if n_window >= min_samples or (once and n_window):
+            X_window = np.concatenate(window)
+            base = load_bundle(bundle_path)
+            if base.checksum != model.base_checksum:
+                # Retrain offline menggantikan model_bundle.bin: mulai dari model baru, sampel window diputar ulang
+                print(f"[INFO] {bundle_path} berubah (crc32={base.checksum:08x}), learner mulai ulang dari bundle baru")
+                model = OnlineModel.from_bundle(base, reference, prior_weight, max_count)
+                for X_batch in window:
+                    model.partial_fit(X_batch)
+                version = 0
+            old_scorer = load_bundle(promoted_bundle(bundle_path, publish_path)).scorer()
+            version += 1
+            model.write(publish_path, metadata={"mode": "online", "online_version": version,
+                                                "n_samples": model.n_samples})
+            drift = model_drift(old_scorer, load_bundle(publish_path).scorer(), X_window)
+            entry = {"time": time.time(), "version": version, "window_samples": n_window, **drift}
+            log_drift(entry, drift_path)
+            print(f"[INFO] Model online v{version} ditulis ({n_window} sampel baru): "
+                  f"centroid shift maks {drift.get('centroid_shift_max', float('nan')):.4f} std, "
+                  f"assignment berubah {drift.get('assignment_changed', 0.0):.2%}")
+            window = []
+
+        if once:
+            return model
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundle", default=BUNDLE_PATH, help="Model bundle hasil training (hanya dibaca)")
+    parser.add_argument("--publish", default=None,
+                        help="Bundle online yang ditulis learner (default: <bundle>.online.bin)")
+    parser.add_argument("--spool", default=SPOOL_PATH, help="Spool NDJSON yang ditulis oleh POST /feedback")
+    parser.add_argument("--interval", type=float, default=60.0, help="Detik antar pengecekan / publikasi")
+    parser.add_argument("--min-samples", type=int, default=100, help="Sampel baru minimum per versi model")
+    parser.add_argument("--reference", default="data_core.csv",
+                        help="Data training untuk bobot awal scaler/centroid ('' = pakai --prior-weight)")
+    parser.add_argument("--prior-weight", type=float, default=None,
+                        help="Bobot model awal dalam jumlah sampel (default: jumlah baris --reference)")
+    parser.add_argument("--max-count", type=float, default=None,
+                        help="Batas bobot per centroid agar model tetap adaptif terhadap data baru")
+    parser.add_argument("--once", action="store_true", help="Proses spool sekali lalu keluar")
+    args = parser.parse_args()
+
+    reference = None
+    if args.reference and os.path.exists(args.reference):
+        import pandas as pd
+        reference = pd.read_csv(args.reference, usecols=FEATURES)[FEATURES].to_numpy(dtype=np.float64)
+    run(args.bundle, args.spool, args.interval, args.min_samples, reference, args.prior_weight, args.max_count,
+        args.once, args.publish)
+
+
+if __name__ == "__main__":
+    main()
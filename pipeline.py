@@ -0,0 +1,194 @@
+"""
+Pipeline training bertahap dengan cache per tahap di disk (dipakai train_model.py).
+
+Setiap tahap punya key SHA-256 dari: nama tahap, parameter yang mempengaruhi hasil, source code fungsi
+tahap (inspect.getsource), versi Python / library, dan key tahap-tahap inputnya. Hasil tahap disimpan di
+<cache_dir>/<tahap>-<key>.joblib. Saat training dijalankan ulang:
+  - hit  : key sama dan hasil ada di cache -> dibaca dari disk
+  - skip : key sama dan tidak ada tahap yang membutuhkan hasilnya -> tidak dibaca sama sekali
+  - run  : key berubah (data, parameter atau kode berubah) -> dihitung ulang, begitu juga tahap sesudahnya
+Key dihitung tanpa menjalankan tahap, jadi retrain tanpa perubahan hanya membaca fingerprint data.
+Tahap yang menulis file (outputs) juga dihitung ulang jika file tersebut hilang atau sudah ditimpa.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import platform
+import time
+
+import joblib
+
+STAGE_CACHE_DIR = "train_cache"
+REPORT_PATH = "train_report.json"
+
+
+def fingerprint(*parts):
+    """SHA-256 of JSON-serializable parts (dict keys sorted)"""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def code_fingerprint(*objects):
+    """SHA-256 of the source code of functions / modules (functools.partial is unwrapped)"""
+    digest = hashlib.sha256()
+    for obj in objects:
+        while isinstance(obj, functools.partial):
+            obj = obj.func
+        digest.update(inspect.getsource(obj).encode("utf-8"))
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def library_versions():
+    import numpy
+    import pandas
+    import sklearn
+    return {"python": platform.python_version(), "numpy": numpy.__version__, "pandas": pandas.__version__,
+            "sklearn": sklearn.__version__}
+
+
+def file_stamps(paths):
+    """{path: [size, mtime_ns]} of existing files (None for missing ones)"""
+    stamps = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamps[path] = None
+        else:
+            stamps[path] = [st.st_size, st.st_mtime_ns]
+    return stamps
+
+
+class Stage:
+    """One pipeline step: fn(*dependency values, **params)"""
+
+    def __init__(self, name, fn, deps=(), params=None, code=(), outputs=(), store=True, salt=None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.params = dict(params or {})
+        # Fungsi / modul lain yang source code-nya ikut menentukan hasil tahap
+        self.code = tuple(code)
+        # File yang ditulis tahap ini (dicek saat hit)
+        self.outputs = tuple(outputs)
+        # False: hasil tidak disimpan (mis. load, data sudah di-cache oleh data_cache.py)
+        self.store = store
+        # Bagian key yang bukan argumen fn (mis. hash isi file data)
+        self.salt = salt
+
+
+class Pipeline:
+    """Stages evaluated on demand, with results memoized on disk by content key"""
+
+    def __init__(self, cache_dir=STAGE_CACHE_DIR, enabled=True, rerun=(), keep=3):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.rerun = set(rerun)
+        self.keep = keep
+        self.stages = {}
+        self._keys = {}
+        self._values = {}
+        self.report = {}
+
+    def add(self, name, fn, deps=(), **options):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Tahap {name!r} bergantung pada tahap {dep!r} yang belum didefinisikan")
+        self.stages[name] = Stage(name, fn, deps, **options)
+
+    def key(self, name):
+        if name not in self._keys:
+            stage = self.stages[name]
+            self._keys[name] = fingerprint(name, stage.params, stage.salt, library_versions(),
+                                           code_fingerprint(stage.fn, *stage.code),
+                                           [self.key(dep) for dep in stage.deps])
+        return self._keys[name]
+
+    def forced(self, name):
+        """Whether a stage is rerun on request (--rerun on itself or on one of its inputs)"""
+        return name in self.rerun or any(self.forced(dep) for dep in self.stages[name].deps)
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, f"{name}-{self.key(name)[:20]}.joblib")
+
+    def _cached(self, stage):
+        """(True, value) if the stage result can be taken from the cache"""
+        if not (self.enabled and stage.store) or self.forced(stage.name):
+            return False, None
+        path = self.path(stage.name)
+        if not os.path.exists(path):
+            return False, None
+        try:
+            entry = joblib.load(path)
+        except Exception as e:
+            print(f"[INFO] Cache tahap {stage.name} tidak bisa dibaca ({e}), dihitung ulang")
+            return False, None
+        if entry["outputs"] != file_stamps(stage.outputs):
+            return False, None
+        return True, entry["value"]
+
+    def get(self, name):
+        """Result of a stage: from memory, from the cache, or computed (inputs first)"""
+        if name in self._values:
+            return self._values[name]
+        stage = self.stages[name]
+        start = time.perf_counter()
+        hit, value = self._cached(stage)
+        if hit:
+            self.report[name] = {"status": "hit", "seconds": time.perf_counter() - start}
+        else:
+            inputs = [self.get(dep) for dep in stage.deps]
+            print(f"\n[INFO] Tahap {name}...")
+            start = time.perf_counter()
+            value = stage.fn(*inputs, **stage.params)
+            seconds = time.perf_counter() - start
+            if self.enabled and stage.store:
+                self._save(stage, value)
+            self.report[name] = {"status": "run", "seconds": seconds}
+        self._values[name] = value
+        return value
+
+    def _save(self, stage, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(stage.name)
+        joblib.dump({"key": self.key(stage.name), "value": value, "outputs": file_stamps(stage.outputs)},
+                    path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._prune(stage.name)
+
+    def _prune(self, name):
+        """Keep only the most recent cache entries of a stage"""
+        prefix = f"{name}-"
+        entries = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir)
+                   if f.startswith(prefix) and f.endswith(".joblib") and f[len(prefix):-len(".joblib")].isalnum()]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.keep:]:
+            os.remove(path)
+
+    def run(self, *targets):
+        start = time.perf_counter()
+        for target in targets:
+            self.get(target)
+        for name in self.stages:
+            self.report.setdefault(name, {"status": "skip", "seconds": 0.0})
+        self.total_seconds = time.perf_counter() - start
+        return [self._values[target] for target in targets]
+
+    def print_report(self):
+        print(f"\n[INFO] Laporan pipeline training (cache: {self.cache_dir if self.enabled else 'tidak aktif'}):")
+        print(f"  {'tahap':<10} {'status':<6} {'waktu':>9}  key")
+        for name in self.stages:
+            row = self.report.get(name, {"status": "-", "seconds": 0.0})
+            print(f"  {name:<10} {row['status']:<6} {row['seconds']:>7.2f} s  {self.key(name)[:12]}")
+        print(f"[INFO] Total: {self.total_seconds:.2f} s")
+
+    def save_report(self, path=REPORT_PATH, **extra):
+        report = {"created": time.time(), "total_seconds": self.total_seconds, "cache_dir": self.cache_dir,
+                  "cache_enabled": self.enabled, "versions": library_versions(), **extra,
+                  "stages": [{"name": name, "key": self.key(name), **self.report.get(name, {})}
+                             for name in self.stages]}
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
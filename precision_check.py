@@ -0,0 +1,114 @@
+"""
+Validasi mode scoring float32 terhadap float64.
+
+Seluruh baris data (default data_core.csv) di-score dengan kedua mode. Untuk setiap baris dihitung
+margin batas cluster dalam float64: selisih jarak ke centroid terdekat kedua dan terdekat (ruang ter-scale).
+Perbedaan assignment dengan margin <= --boundary-tol dianggap wajar (titik tepat di batas cluster, hasil
+pembulatan float32); perbedaan dengan margin lebih besar berarti mode float32 tidak aman untuk model ini.
+
+    python precision_check.py                      # data_core.csv + model_bundle.bin
+    python precision_check.py --data arsip.csv --json precision.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from model_bundle import load_bundle, BUNDLE_PATH
+
+# Margin (jarak ter-scale) di bawah ini dianggap "di batas cluster" untuk float32 (eps ~1.2e-7)
+BOUNDARY_TOL = 1e-3
+
+
+def boundary_margin(scorer, X, chunk_size=100_000):
+    """float64 gap between the distances to the nearest and second-nearest centers of every row"""
+    margins = np.empty(len(X))
+    for start in range(0, len(X), chunk_size):
+        Z = (np.asarray(X[start:start + chunk_size], dtype=np.float64) - scorer.mean) / scorer.scale
+        sq_dist = Z @ scorer.centers.T
+        sq_dist *= -2.0
+        sq_dist += scorer.center_sq_norms
+        sq_dist += np.einsum("nf,nf->n", Z, Z)[:, None]
+        if sq_dist.shape[1] < 2:
+            margins[start:start + len(Z)] = np.inf
+            continue
+        two = np.sqrt(np.maximum(np.partition(sq_dist, 1, axis=1)[:, :2], 0.0))
+        margins[start:start + len(Z)] = two[:, 1] - two[:, 0]
+    return margins
+
+
+def compare_precision(scorer, X, dtype=np.float32, boundary_tol=BOUNDARY_TOL):
+    """Score X in float64 and in dtype; report assignment disagreements and how close they are to a boundary"""
+    reference = scorer.with_dtype(np.float64)
+    reduced = scorer.with_dtype(dtype)
+    X = np.asarray(X, dtype=np.float64)
+
+    start = time.perf_counter()
+    clusters64, distances64 = reference.score_batch(X)
+    seconds64 = time.perf_counter() - start
+    start = time.perf_counter()
+    clusters32, distances32 = reduced.score_batch(X)
+    seconds32 = time.perf_counter() - start
+
+    all_margins = boundary_margin(reference, X)
+    disagree = np.flatnonzero(clusters64 != clusters32)
+    margins = all_margins[disagree]
+    far = disagree[margins > boundary_tol]
+    same = clusters64 == clusters32
+    return {
+        "dtype": np.dtype(dtype).name,
+        "n_rows": int(len(X)),
+        "rows_near_boundary": int(np.sum(all_margins <= boundary_tol)),
+        "min_margin": float(all_margins.min()) if len(X) else None,
+        "disagreements": int(len(disagree)),
+        "disagreement_rate": float(len(disagree) / max(len(X), 1)),
+        "near_boundary": int(len(disagree) - len(far)),
+        "far_from_boundary": int(len(far)),
+        "boundary_tol": boundary_tol,
+        "max_disagreement_margin": float(margins.max()) if len(margins) else None,
+        "max_distance_abs_error": float(np.abs(distances64[same] - distances32[same]).max()) if same.any() else None,
+        "examples": [{"row": int(i), "float64": int(clusters64[i]), "reduced": int(clusters32[i]),
+                      "margin": float(m)} for i, m in zip(disagree[:10], margins[:10])],
+        "seconds_float64": seconds64,
+        "seconds_reduced": seconds32,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data_core.csv", help="CSV yang di-score dengan kedua mode")
+    parser.add_argument("--bundle", default=BUNDLE_PATH, help="Path model bundle")
+    parser.add_argument("--boundary-tol", type=float, default=BOUNDARY_TOL,
+                        help="Margin maksimum (jarak ter-scale) agar perbedaan dianggap di batas cluster")
+    parser.add_argument("--json", help="Simpan laporan ke file JSON")
+    args = parser.parse_args()
+
+    from data_cache import open_cache
+    X = open_cache(args.data).feature_matrix()
+    scorer = load_bundle(args.bundle).scorer()
+    report = compare_precision(scorer, X, np.float32, args.boundary_tol)
+
+    print(f"[INFO] {report['n_rows']} baris, {scorer.n_clusters} cluster: float64 {report['seconds_float64']:.3f} s, "
+          f"float32 {report['seconds_reduced']:.3f} s")
+    print(f"[INFO] Assignment berbeda: {report['disagreements']} ({report['disagreement_rate']:.6%}), "
+          f"{report['near_boundary']} di antaranya di batas cluster")
+    print(f"[INFO] Baris di batas cluster (margin <= {args.boundary_tol:g}): {report['rows_near_boundary']}, "
+          f"margin minimum {report['min_margin']:.2e}")
+    if report["max_distance_abs_error"] is not None:
+        print(f"[INFO] Error absolut maksimum distance_to_center: {report['max_distance_abs_error']:.2e}")
+    for ex in report["examples"]:
+        print(f"  baris {ex['row']}: float64 -> cluster {ex['float64']}, float32 -> cluster {ex['reduced']}, "
+              f"margin {ex['margin']:.2e}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["far_from_boundary"]:
+        print(f"[ERROR] {report['far_from_boundary']} baris berbeda jauh dari batas cluster, "
+              "jangan aktifkan SCORING_DTYPE=float32 untuk model ini")
+        raise SystemExit(1)
+    print("[INFO] Mode float32 aman untuk model ini")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from inference import FEATURES
+
+# Resolusi default per fitur: NPK integer, sisanya 0.1 (sesuai resolusi sensor)
+DEFAULT_QUANTUM = {"N": 1, "P": 1, "K": 1, "temperature": 0.1, "humidity": 0.1, "ph": 0.1, "rainfall": 0.1}
+
+
+def parse_quantum(spec, defaults=DEFAULT_QUANTUM):
+    """Parse "N=1,ph=0.1,..." into a per-feature quantum dict (missing features keep the default)"""
+    quantum = dict(defaults)
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, value = part.partition("=")
+        if name not in quantum:
+            raise ValueError(f"Fitur '{name}' tidak dikenal, pilihan: {FEATURES}")
+        quantum[name] = float(value)
+        if quantum[name] <= 0:
+            raise ValueError(f"Quantum untuk '{name}' harus > 0")
+    return quantum
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with TTL, keyed on quantized sensor readings
+
+    The value stored under a key is the exact result of the first sample seen in that bucket, so a hit
+    returns a result computed from an input that differs by less than one quantum per feature (see tolerance).
+    """
+
+    def __init__(self, max_size=10000, ttl=300.0, quantum=None, features=FEATURES):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.features = list(features)
+        quantum = quantum or DEFAULT_QUANTUM
+        self.steps = [float(quantum[f]) for f in self.features]
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, x):
+        """Cache key of one sample (7 floats in FEATURES order)"""
+        return tuple(int(round(float(v) / step)) for v, step in zip(x, self.steps))
+
+    def tolerance(self, scale):
+        """Largest difference of a cache hit from the exact result, given the model's scaler scale
+
+        Inputs with the same key differ by less than one quantum per feature, so for the same cluster
+        distance_to_center differs by at most ||quantum / scale|| (triangle inequality) and fertility_score
+        by the score of one quantum (plus response rounding). The cluster itself can only differ for samples
+        within one quantum of a cluster boundary.
+        """
+        steps = np.asarray(self.steps)
+        return {
+            "distance_to_center": float(np.linalg.norm(steps / np.asarray(scale))) + 1e-4,
+            "fertility_score": float(steps[:3] @ [0.4, 0.3, 0.3]) + 0.01,
+        }
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            # Hasil dari model yang sudah diganti tidak boleh masuk cache lagi
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, generation):
+        """Drop every entry when a new model artifact (generation) is loaded"""
+        with self._lock:
+            if generation == self.generation:
+                return
+            self.generation = generation
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "quantum": dict(zip(self.features, self.steps)),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "model_generation": self.generation,
+            }
@@ -0,0 +1,312 @@
+"""
+Log prediksi append-only: setiap input dan output /predict (juga /predict/all dan /predict/batch) dicatat
+untuk audit dan retraining tanpa menambah latency request.
+
+Request hanya menaruh tuple ke antrian terbatas (deque, beberapa ratus nanodetik). Thread writer
+mengambil isi antrian per batch, mengubahnya ke record biner berukuran tetap (RECORD_DTYPE), mengompresi
+per blok (zlib) lalu menulis ke segment `<dir>/predictions-<waktu>-<pid>.plog`. Segment aktif berakhiran
+`.open` dan di-rename saat rotasi (ukuran / umur) atau saat process berhenti. Batas antrian dihitung dalam
+baris (satu batch = len(X) baris). Jika disk lambat dan antrian penuh, prediksi / batch baru dibuang utuh
+dan dihitung (`dropped`, dalam baris), request tidak pernah menunggu disk.
+
+    python prediction_log.py stats prediction_log
+    python prediction_log.py export prediction_log --out logged.csv
+    python train_model.py --streaming --replay-log prediction_log   # ikut dipakai sebagai data training
+"""
+import argparse
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+from inference import FEATURES, fertility_score
+
+LOG_DIR = "prediction_log"
+MAGIC = b"SOILLOG1"
+BLOCK_MAGIC = b"BLK1"
+_PREFIX = struct.Struct("<8sI")
+# magic, jumlah record, panjang payload terkompresi, crc32 payload
+_BLOCK = struct.Struct("<4sIII")
+
+ENDPOINTS = ("predict", "predict_all", "predict_batch")
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("features", "<f8", (len(FEATURES),)),
+    ("cluster", "<i4"),
+    ("distance_to_center", "<f8"),
+    ("fertility_score", "<f8"),
+    ("model_checksum", "<u4"),
+    ("endpoint", "u1"),
+])
+
+
+class PredictionLog:
+    """Non-blocking logger: bounded in-memory queue drained by a background writer thread"""
+
+    def __init__(self, log_dir=LOG_DIR, max_pending=100_000, batch_size=4096, flush_interval=0.5,
+                 segment_bytes=64 * 1024 * 1024, segment_seconds=3600.0, compress_level=1):
+        self.log_dir = log_dir
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.compress_level = compress_level
+        self._queue = deque()
+        # Jumlah baris di antrian; bersama counter di bawah hanya diubah sambil memegang _lock
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._path = None
+        self._segment_started = 0.0
+        self.logged = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.segments = 0
+        self.write_errors = 0
+
+    def ensure_started(self):
+        """Start the writer thread in this process (after a fork the parent's thread does not exist)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            # Antrian hasil fork milik process induk (ditulis oleh writer induk); lock bisa saja sedang
+            # dipegang thread induk saat fork, jadi dibuat baru
+            self._lock = threading.Lock()
+            self._queue.clear()
+            self._pending_rows = 0
+            self._file = None
+        # Di process yang sama antrian tetap utuh: record yang masuk sebelum writer (re)start ikut ditulis
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def log(self, endpoint, x, cluster, distance, model_checksum=0):
+        """Queue one prediction (x: 7 floats in FEATURES order); never blocks"""
+        with self._lock:
+            if self._pending_rows >= self.max_pending:
+                self.dropped += 1
+                return
+            self._queue.append((time.time(), endpoint, model_checksum, x, cluster, distance))
+            self._pending_rows += 1
+            full = self._pending_rows == self.batch_size
+        if full:
+            self._wake.set()
+
+    def log_batch(self, endpoint, X, clusters, distances, model_checksum=0):
+        """Queue a scored batch as a whole, or drop it as a whole when it does not fit (never blocks)"""
+        n = len(X)
+        with self._lock:
+            if self._pending_rows + n > self.max_pending:
+                self.dropped += n
+                return
+            self._queue.append((time.time(), endpoint, model_checksum, X, clusters, distances))
+            self._pending_rows += n
+        self._wake.set()
+
+    def _drain(self):
+        with self._lock:
+            items = list(self._queue)
+            self._queue.clear()
+            self._pending_rows = 0
+        return items
+
+    def _records(self, items):
+        """Structured array of the queued items (single predictions and batches)"""
+        singles = [item for item in items if np.ndim(item[3]) == 1]
+        batches = [item for item in items if np.ndim(item[3]) == 2]
+        n = len(singles) + sum(len(item[3]) for item in batches)
+        records = np.empty(n, dtype=RECORD_DTYPE)
+        if singles:
+            t, endpoint, checksum, x, cluster, distance = zip(*singles)
+            m = len(singles)
+            records["time"][:m] = t
+            records["endpoint"][:m] = endpoint
+            records["model_checksum"][:m] = checksum
+            records["features"][:m] = x
+            records["cluster"][:m] = cluster
+            records["distance_to_center"][:m] = distance
+        start = len(singles)
+        for t, endpoint, checksum, X, clusters, distances in batches:
+            stop = start + len(X)
+            records["time"][start:stop] = t
+            records["endpoint"][start:stop] = endpoint
+            records["model_checksum"][start:stop] = checksum
+            records["features"][start:stop] = X
+            records["cluster"][start:stop] = clusters
+            records["distance_to_center"][start:stop] = distances
+            start = stop
+        # Fertility score deterministik dari input, dihitung di sini (bukan di jalur request)
+        records["fertility_score"] = fertility_score(records["features"])
+        return records
+
+    def _open_segment(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        self._path = os.path.join(self.log_dir, f"predictions-{stamp}-{os.getpid()}-{self.segments}.plog.open")
+        header = json.dumps({"version": 1, "features": FEATURES, "endpoints": list(ENDPOINTS),
+                             "dtype": RECORD_DTYPE.descr, "pid": os.getpid(), "created": time.time()}).encode()
+        self._file = open(self._path, "wb")
+        self._file.write(_PREFIX.pack(MAGIC, len(header)) + header)
+        self._segment_started = time.time()
+        self.segments += 1
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path, self._path[:-len(".open")])
+        self._file = None
+
+    def _write(self, records):
+        if self._file is None:
+            self._open_segment()
+        payload = zlib.compress(records.tobytes(), self.compress_level)
+        self._file.write(_BLOCK.pack(BLOCK_MAGIC, len(records), len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        with self._lock:
+            self.bytes_written += _BLOCK.size + len(payload)
+            self.logged += len(records)
+        if (self._file.tell() >= self.segment_bytes
+                or time.time() - self._segment_started >= self.segment_seconds):
+            self._close_segment()
+
+    def _flush(self):
+        items = self._drain()
+        if not items:
+            return
+        try:
+            self._write(self._records(items))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self.write_errors += 1
+                self.dropped += sum(len(item[3]) if np.ndim(item[3]) == 2 else 1 for item in items)
+            print(f"[ERROR] Gagal menulis log prediksi: {e}")
+            # Segment berikutnya dibuka ulang; reader melewati blok terakhir yang tidak lengkap
+            try:
+                self._file.close()
+            except (AttributeError, OSError):
+                pass
+            self._file = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush()
+        self._flush()
+        self._close_segment()
+
+    def close(self, timeout=5.0):
+        """Flush the queue and finalize the active segment"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"logged": self.logged, "pending": self._pending_rows, "dropped": self.dropped,
+                    "bytes_written": self.bytes_written, "segments": self.segments,
+                    "write_errors": self.write_errors}
+
+
+def segment_paths(log_dir=LOG_DIR, include_open=False):
+    """Segment files in write order (by name: time, pid, sequence)"""
+    paths = glob.glob(os.path.join(log_dir, "*.plog"))
+    if include_open:
+        paths += glob.glob(os.path.join(log_dir, "*.plog.open"))
+    return sorted(paths)
+
+
+def iter_blocks(log_dir=LOG_DIR, include_open=False):
+    """Yield every logged block as a RECORD_DTYPE array (a truncated last block is skipped)"""
+    for path in segment_paths(log_dir, include_open):
+        with open(path, "rb") as f:
+            magic, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} bukan segment log prediksi")
+            header = json.loads(f.read(header_len))
+            dtype = np.dtype([tuple(field) if len(field) == 2 else (field[0], field[1], tuple(field[2]))
+                              for field in header["dtype"]])
+            while True:
+                raw = f.read(_BLOCK.size)
+                if len(raw) < _BLOCK.size:
+                    break
+                magic, n, length, crc = _BLOCK.unpack(raw)
+                payload = f.read(length)
+                if magic != BLOCK_MAGIC or len(payload) < length or zlib.crc32(payload) != crc:
+                    # Blok terakhir segment yang masih ditulis / process mati saat menulis
+                    print(f"[INFO] Blok tidak lengkap di {path} dilewati")
+                    break
+                yield np.frombuffer(zlib.decompress(payload), dtype=dtype, count=n)
+
+
+def iter_features(log_dir=LOG_DIR, chunk_size=100_000, include_open=False):
+    """Yield logged inputs as float64 (n, 7) arrays of about chunk_size rows (for train_model.py)"""
+    pending, size = [], 0
+    for block in iter_blocks(log_dir, include_open):
+        pending.append(block["features"])
+        size += len(block)
+        if size >= chunk_size:
+            yield np.concatenate(pending)
+            pending, size = [], 0
+    if pending:
+        yield np.concatenate(pending)
+
+
+def read_log(log_dir=LOG_DIR, include_open=False):
+    blocks = list(iter_blocks(log_dir, include_open))
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["stats", "export"])
+    parser.add_argument("log_dir", nargs="?", default=LOG_DIR)
+    parser.add_argument("--out", help="CSV tujuan untuk export")
+    parser.add_argument("--include-open", action="store_true", help="Ikut baca segment yang masih ditulis")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = read_log(args.log_dir, args.include_open)
+    seconds = time.perf_counter() - start
+    if args.action == "stats":
+        size = sum(os.path.getsize(p) for p in segment_paths(args.log_dir, args.include_open))
+        print(f"[INFO] {len(records)} record dari {len(segment_paths(args.log_dir, args.include_open))} segment "
+              f"({size / 1e6:.2f} MB di disk, dibaca dalam {seconds:.3f} s)")
+        if len(records):
+            print(f"[INFO] Rentang waktu: {time.ctime(records['time'].min())} - {time.ctime(records['time'].max())}")
+            for code, name in enumerate(ENDPOINTS):
+                print(f"  {name:<14} {int(np.sum(records['endpoint'] == code))}")
+            for checksum in np.unique(records["model_checksum"]):
+                print(f"  model {checksum:08x}: {int(np.sum(records['model_checksum'] == checksum))} record")
+    else:
+        import pandas as pd
+        if not args.out:
+            parser.error("--out wajib untuk export")
+        df = pd.DataFrame(records["features"], columns=FEATURES)
+        df["time"] = records["time"]
+        df["endpoint"] = np.array(ENDPOINTS)[records["endpoint"]]
+        df["cluster"] = records["cluster"]
+        df["distance_to_center"] = records["distance_to_center"]
+        df["fertility_score"] = records["fertility_score"]
+        df["model_checksum"] = [f"{c:08x}" for c in records["model_checksum"]]
+        df.to_csv(args.out, index=False)
+        print(f"[INFO] {len(df)} record diekspor ke {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Bulk scoring offline: file CSV/Parquet berbentuk data_core.csv -> cluster, distance_to_center, fertility_score.
+
+File input dipotong menjadi blok (rentang byte untuk CSV, row group untuk Parquet). Setiap blok di-parse,
+di-scale, di-assign ke centroid terdekat dan di-serialize oleh worker process, lalu process utama
+menulis hasilnya berurutan. Jumlah blok yang sedang diproses dibatasi, sehingga memori tetap datar
+berapapun ukuran file (file tidak pernah dibaca utuh).
+
+    python score_bulk.py data_core.csv hasil_scoring.csv --jobs 4
+    python score_bulk.py arsip.parquet hasil.parquet --chunk-size 500000
+    python score_bulk.py arsip.csv hasil.csv --dtype float32   # scoring float32 (dicek dulu vs float64)
+
+Parquet membutuhkan pyarrow. Split CSV per byte mengasumsikan tidak ada newline di dalam field
+(berlaku untuk data sensor numerik seperti data_core.csv).
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURES, fertility_score
+from model_bundle import load_bundle, BUNDLE_PATH
+from precision_check import compare_precision
+from feature_schema import FeatureSchema
+
+OUTPUT_COLUMNS = ["cluster", "distance_to_center", "fertility_score"]
+SCHEMA = FeatureSchema()
+
+# Scorer per worker process (diisi sekali lewat initializer)
+_scorer = None
+
+
+def _init_worker(bundle_path, dtype="float64"):
+    global _scorer
+    _scorer = load_bundle(bundle_path).scorer(dtype)
+
+
+def check_precision(bundle_path, dtype, reference="data_core.csv"):
+    """Refuse a reduced-precision run if it disagrees with float64 away from cluster boundaries"""
+    if not reference or not os.path.exists(reference):
+        print(f"[INFO] Data referensi {reference!r} tidak ada, validasi {dtype} dilewati", file=sys.stderr)
+        return None
+    X = pd.read_csv(reference, usecols=FEATURES)[FEATURES].to_numpy(dtype=np.float64)
+    report = compare_precision(load_bundle(bundle_path).scorer(), X[np.isfinite(X).all(axis=1)], dtype)
+    print(f"[INFO] Validasi {dtype} pada {reference}: {report['disagreements']} assignment berbeda "
+          f"({report['near_boundary']} di batas cluster)", file=sys.stderr)
+    if report["far_from_boundary"]:
+        raise ValueError(f"Scoring {dtype} berbeda dari float64 pada {report['far_from_boundary']} baris "
+                         f"{reference} yang jauh dari batas cluster")
+    return report
+
+
+def is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def feature_matrix(df):
+    """(n, 7) float64 matrix of the feature columns; non-numeric cells become NaN instead of raising"""
+    X = np.empty((len(df), len(FEATURES)), dtype=np.float64)
+    for j, feature in enumerate(FEATURES):
+        column = df[feature]
+        # Kolom numerik (kasus umum) tanpa konversi; kolom object berisi teks dikonversi per sel
+        X[:, j] = column if pd.api.types.is_numeric_dtype(column) else pd.to_numeric(column, errors="coerce")
+    return X
+
+
+def score_frame(scorer, df, float_features=False):
+    """Append cluster, distance_to_center and fertility_score to a chunk (invalid rows get cluster -1)
+
+    float_features=True also replaces the feature columns by their float64 values (non-numeric cells -> NaN),
+    so every block has the same column types (needed for the Parquet schema)
+    """
+    X = feature_matrix(df)
+    # Baris dengan nilai kosong / bukan angka / di luar rentang valid (feature_schema.VALID_RANGES) tidak di-score
+    valid = SCHEMA.validate_matrix(X).valid
+    clusters = np.full(len(X), -1, dtype=np.int64)
+    distances = np.full(len(X), np.nan)
+    if valid.all():
+        clusters, distances = scorer.score_batch(X)
+    elif valid.any():
+        clusters[valid], distances[valid] = scorer.score_batch(X[valid])
+
+    out = df.copy()
+    if float_features:
+        out[FEATURES] = X
+    out["cluster"] = clusters
+    out["distance_to_center"] = np.round(distances, 4)
+    out["fertility_score"] = fertility_score(X)
+    return out, int((~valid).sum())
+
+
+def csv_blocks(path, chunk_size):
+    """Yield (start, end) byte ranges of roughly chunk_size rows each, aligned to line boundaries"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+        sample = f.read(1 << 16)
+        lines = max(sample.count(b"\n"), 1)
+        block_bytes = max(1 << 16, int(len(sample) / lines * chunk_size))
+        while start < size:
+            f.seek(min(start + block_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+def _score_csv_block(path, columns, start, end, out_parquet):
+    with open(path, "rb") as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    # Tipe kolom tidak boleh bergantung pada isi blok (inferensi read_csv per blok bisa memberi int, float
+    # atau object untuk kolom yang sama): kolom selain fitur dibaca sebagai teks apa adanya
+    df = pd.read_csv(io.BytesIO(raw), header=None, names=columns,
+                     dtype={c: str for c in columns if c not in FEATURES})
+    out, invalid = score_frame(_scorer, df, float_features=out_parquet)
+    if out_parquet:
+        return out, len(out), invalid
+    return out.to_csv(index=False, header=False).encode("utf-8"), len(out), invalid
+
+
+def _score_parquet_group(path, row_group, out_parquet):
+    import pyarrow.parquet as pq
+    df = pq.ParquetFile(path).read_row_group(row_group).to_pandas()
+    out, invalid = score_frame(_scorer, df, float_features=out_parquet)
+    if out_parquet:
+        return out, len(out), invalid
+    return out.to_csv(index=False, header=False).encode("utf-8"), len(out), invalid
+
+
+class OutputWriter:
+    """Ordered writer for CSV (pre-encoded bytes from workers) or Parquet (DataFrames)"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.parquet = is_parquet(path)
+        self._writer = None
+        if not self.parquet:
+            self._file = open(self.tmp_path, "wb")
+            header = io.StringIO()
+            csv.writer(header, lineterminator="\n").writerow(columns)
+            self._file.write(header.getvalue().encode("utf-8"))
+
+    def write(self, chunk):
+        if not self.parquet:
+            self._file.write(chunk)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+        elif not table.schema.equals(self._writer.schema):
+            # Mis. kolom yang seluruhnya kosong di satu blok (tipe null): ikuti schema blok pertama
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self, commit=True):
+        if self.parquet:
+            if self._writer is not None:
+                self._writer.close()
+        else:
+            self._file.close()
+        if not os.path.exists(self.tmp_path):
+            return
+        if commit:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+
+
+def plan_tasks(input_path, chunk_size, out_parquet):
+    """Return (output columns, iterator of (fn, args)) for the input file"""
+    if is_parquet(input_path):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(input_path)
+        missing = [f for f in FEATURES if f not in pf.schema_arrow.names]
+        if missing:
+            raise ValueError(f"Kolom tidak ditemukan di {input_path}: {missing}")
+        columns = pf.schema_arrow.names + OUTPUT_COLUMNS
+        return columns, ((_score_parquet_group, (input_path, i, out_parquet))
+                         for i in range(pf.num_row_groups))
+
+    # Header di-split dengan aturan CSV yang sama dengan pembaca blok (quote, spasi di dalam nama kolom)
+    with open(input_path, "r", encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), [])
+    missing = [f for f in FEATURES if f not in header]
+    if missing:
+        raise ValueError(f"Kolom tidak ditemukan di {input_path}: {missing}")
+    return header + OUTPUT_COLUMNS, ((_score_csv_block, (input_path, header, start, end, out_parquet))
+                                     for start, end in csv_blocks(input_path, chunk_size))
+
+
+def report_progress(rows, start, final=False):
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    end = "\n" if final else "\r"
+    print(f"[INFO] {rows:,} baris di-score, {rate:,.0f} baris/s, {elapsed:.1f} s", end=end, file=sys.stderr, flush=True)
+
+
+def score_file(input_path, output_path, bundle_path=BUNDLE_PATH, chunk_size=200000, n_jobs=None,
+               max_in_flight=None, progress_every=2.0, dtype="float64", precision_reference="data_core.csv"):
+    """Score input_path block by block in a process pool and write the results to output_path"""
+    if np.dtype(dtype) != np.float64:
+        check_precision(bundle_path, dtype, precision_reference)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * n_jobs
+    out_parquet = is_parquet(output_path)
+    columns, tasks = plan_tasks(input_path, chunk_size, out_parquet)
+
+    writer = OutputWriter(output_path, columns)
+    rows = invalid = 0
+    start = last_report = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(bundle_path, dtype)) as pool:
+            pending = deque()
+            for fn, args in tasks:
+                pending.append(pool.submit(fn, *args))
+                # Batasi blok yang sedang diproses supaya memori tetap datar
+                while len(pending) >= max_in_flight:
+                    chunk, n, bad = pending.popleft().result()
+                    writer.write(chunk)
+                    rows, invalid = rows + n, invalid + bad
+                if time.perf_counter() - last_report >= progress_every:
+                    report_progress(rows, start)
+                    last_report = time.perf_counter()
+            while pending:
+                chunk, n, bad = pending.popleft().result()
+                writer.write(chunk)
+                rows, invalid = rows + n, invalid + bad
+    except BaseException:
+        # Output parsial tidak pernah menimpa file tujuan
+        writer.close(commit=False)
+        raise
+    writer.close()
+
+    report_progress(rows, start, final=True)
+    if invalid:
+        print(f"[INFO] {invalid:,} baris memiliki nilai kosong/tidak valid (cluster = -1)", file=sys.stderr)
+    return rows, invalid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="File input CSV atau Parquet dengan kolom fitur data_core.csv")
+    parser.add_argument("output", help="File output (.csv atau .parquet)")
+    parser.add_argument("--bundle", default=BUNDLE_PATH, help="Path model bundle")
+    parser.add_argument("--chunk-size", type=int, default=200000, help="Perkiraan jumlah baris per blok CSV")
+    parser.add_argument("--jobs", type=int, default=None, help="Jumlah worker process (default: jumlah core)")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64",
+                        help="Presisi scoring (float32 divalidasi dulu terhadap float64 pada --precision-reference)")
+    parser.add_argument("--precision-reference", default="data_core.csv",
+                        help="CSV untuk validasi mode float32")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.input) == os.path.abspath(args.output):
+        parser.error("File output tidak boleh sama dengan input")
+    score_file(args.input, args.output, args.bundle, args.chunk_size, args.jobs, dtype=args.dtype,
+               precision_reference=args.precision_reference)
+
+
+if __name__ == "__main__":
+    main()
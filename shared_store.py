@@ -0,0 +1,215 @@
+"""
+Shared-memory model store: array model dimuat sekali ke satu segment shared memory, worker attach read-only.
+
+Isi segment (layout mirip model_bundle.bin: magic, header JSON, array rata 64 byte):
+  - cluster_params     : mean, scale scaler dan cluster centers (dari model_bundle.bin)
+  - crop_*             : array node DecisionTreeClassifier + kelas/confidence per leaf
+  - fertility_coef     : koefisien LinearRegression (intercept di header)
+  - crop_scaler, fertility_scaler : mean / scale scaler training tiap model (model_scalers.json)
+
+Process loader (master gunicorn lewat gunicorn.conf.py dengan SHARED_MODELS=1, atau
+`python shared_store.py publish`) membuat segment dan menaruh namanya di env MODEL_SHM.
+Worker hanya attach: tidak ada unpickle, tidak ada import sklearn, dan page model dipakai bersama
+sehingga memori per worker tetap datar saat jumlah worker bertambah
+(ukur dengan benchmarks/measure_worker_rss.py).
+
+    python shared_store.py publish --name soilsense-models   # segment tetap ada sampai di-unlink
+    MODEL_SHM=soilsense-models uvicorn asgi_app:app --workers 4
+    python shared_store.py unlink --name soilsense-models
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from model_bundle import load_bundle, BUNDLE_PATH
+from model_registry import (CropModel, FeatureScaler, LinearKernel, TreeKernel, CLASSIFIER_PATH,
+                            LABEL_ENCODER_PATH, REGRESSOR_PATH)
+from inference import ClusterScorer
+
+SHM_ENV = "MODEL_SHM"
+MAGIC = b"SOILSHM1"
+_PREFIX = struct.Struct("<8sI")
+ALIGN = 64
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def collect_arrays(bundle_path=BUNDLE_PATH, classifier_path=CLASSIFIER_PATH, encoder_path=LABEL_ENCODER_PATH,
+                   regressor_path=REGRESSOR_PATH):
+    """Arrays and metadata of every model that goes into the segment (missing pickles are skipped)"""
+    arrays, meta = {}, {}
+    if bundle_path and os.path.exists(bundle_path):
+        bundle = load_bundle(bundle_path)
+        arrays["cluster_params"] = np.array(bundle.params)
+        meta["bundle_checksum"] = bundle.checksum
+    if classifier_path and os.path.exists(classifier_path):
+        from model_registry import load_crop_model
+        crop = load_crop_model(classifier_path, encoder_path)
+        arrays.update({f"crop_{k}": v for k, v in crop.tree.arrays().items()})
+        arrays["crop_leaf_class"] = crop.leaf_class
+        arrays["crop_leaf_confidence"] = crop.leaf_confidence
+        arrays["crop_scaler"] = crop.scaler.params()
+        meta["crop_labels"] = crop.labels
+    if regressor_path and os.path.exists(regressor_path):
+        from model_registry import load_fertility_model
+        fertility = load_fertility_model(regressor_path)
+        arrays["fertility_coef"] = fertility.coef
+        arrays["fertility_scaler"] = fertility.scaler.params()
+        meta["fertility_intercept"] = fertility.intercept
+    return arrays, meta
+
+
+def _open(name, create=False, size=0):
+    """SharedMemory whose lifetime is managed explicitly (unlink), not by the resource tracker"""
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        # Tanpa ini resource tracker meng-unlink segment saat process (worker / loader) berhenti
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedModelStore:
+    """Model arrays in one shared-memory segment (read-only numpy views for attached processes)"""
+
+    def __init__(self, shm, header, owner=False):
+        self.shm = shm
+        self.name = shm.name
+        self.header = header
+        self.meta = header["meta"]
+        self.owner = owner
+        self.arrays = {}
+        for key, section in header["sections"].items():
+            arr = np.ndarray(section["shape"], dtype=section["dtype"], buffer=shm.buf, offset=section["offset"])
+            arr.flags.writeable = False
+            self.arrays[key] = arr
+
+    @classmethod
+    def create(cls, name=None, arrays=None, meta=None, **paths):
+        """Build the segment from the model artifacts (or the given arrays/meta)"""
+        if arrays is None:
+            arrays, meta = collect_arrays(**paths)
+        sections, offset = {}, 0
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            sections[key] = {"offset": offset, "shape": list(arr.shape), "dtype": arr.dtype.str}
+            offset = _align(offset + arr.nbytes)
+        header = {"sections": sections, "meta": meta or {}}
+        # Offset di header relatif terhadap awal payload; payload dimulai setelah prefix + header
+        header_bytes = json.dumps(header).encode("utf-8")
+        base = _align(_PREFIX.size + len(header_bytes) + 256)
+        for section in sections.values():
+            section["offset"] += base
+        header_bytes = json.dumps(header).encode("utf-8")
+        if _PREFIX.size + len(header_bytes) > base:
+            raise ValueError(f"Header model store ({len(header_bytes)} bytes) melebihi ruang yang disediakan "
+                             f"({base - _PREFIX.size} bytes)")
+
+        shm = _open(name, create=True, size=max(base + offset, 1))
+        _PREFIX.pack_into(shm.buf, 0, MAGIC, len(header_bytes))
+        shm.buf[_PREFIX.size:_PREFIX.size + len(header_bytes)] = header_bytes
+        for key, arr in arrays.items():
+            section = sections[key]
+            view = np.ndarray(section["shape"], dtype=section["dtype"], buffer=shm.buf, offset=section["offset"])
+            view[...] = arr
+            del view
+        return cls(shm, header, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = _open(name)
+        magic, header_len = _PREFIX.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Segment {name} bukan model store SoilSense")
+        header = json.loads(bytes(shm.buf[_PREFIX.size:_PREFIX.size + header_len]))
+        return cls(shm, header)
+
+    @property
+    def size(self):
+        return self.shm.size
+
+    def _scaler(self, name):
+        params = self.arrays.get(f"{name}_scaler")
+        if params is None:
+            raise FileNotFoundError(f"Parameter scaler model {name} tidak ada di shared memory, publish ulang")
+        return FeatureScaler(params[0], params[1])
+
+    def crop_model(self):
+        if "crop_labels" not in self.meta:
+            raise FileNotFoundError("Model tanaman tidak ada di shared memory")
+        a = self.arrays
+        tree = TreeKernel(a["crop_children_left"], a["crop_children_right"], a["crop_feature"],
+                          a["crop_threshold"], a["crop_value"])
+        return CropModel(tree, self.meta["crop_labels"], a["crop_leaf_class"], a["crop_leaf_confidence"],
+                         self._scaler("crop"))
+
+    def fertility_model(self):
+        if "fertility_coef" not in self.arrays:
+            raise FileNotFoundError("Model fertility tidak ada di shared memory")
+        return LinearKernel(self.arrays["fertility_coef"], self.meta["fertility_intercept"], self._scaler("fertility"))
+
+    def cluster_scorer(self, bundle, dtype=np.float64):
+        """Scorer for bundle backed by the shared params, or None if the segment holds another model version"""
+        if self.meta.get("bundle_checksum") != bundle.checksum:
+            return None
+        table = bundle.cluster_table()
+        return ClusterScorer(self.arrays["cluster_params"], [entry.characteristics for entry in table], table,
+                             bundle.centroid_index(), dtype)
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        if sys.version_info < (3, 13):
+            # SharedMemory.unlink() selalu memanggil unregister di Python < 3.13
+            resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+
+def attach_from_env():
+    """Store named by MODEL_SHM, or None when it is not set / cannot be attached"""
+    name = os.environ.get(SHM_ENV)
+    if not name:
+        return None
+    try:
+        return SharedModelStore.attach(name)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Gagal attach shared memory {name}: {e}, model dimuat dari file")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["publish", "unlink", "info"])
+    parser.add_argument("--name", default="soilsense-models", help="Nama segment shared memory")
+    parser.add_argument("--bundle", default=BUNDLE_PATH)
+    args = parser.parse_args()
+
+    if args.action == "publish":
+        # Segment tetap hidup setelah process ini selesai (dihapus dengan `unlink`)
+        store = SharedModelStore.create(args.name, bundle_path=args.bundle)
+        print(f"[INFO] Model store {store.name} dibuat ({store.size / 1e6:.2f} MB), "
+              f"jalankan worker dengan {SHM_ENV}={store.name}")
+    elif args.action == "unlink":
+        SharedModelStore.attach(args.name).unlink()
+        print(f"[INFO] Model store {args.name} dihapus")
+    else:
+        store = SharedModelStore.attach(args.name)
+        print(f"[INFO] Model store {store.name}: {store.size / 1e6:.2f} MB")
+        for key, arr in store.arrays.items():
+            print(f"  {key:<22} {arr.dtype} {arr.shape}")
+
+
+if __name__ == "__main__":
+    main()
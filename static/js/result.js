@@ -84,7 +84,8 @@ async function handleFormSubmit(e) {
   }
 
   try {
-    const response = await fetch("/predict", {
+    // Satu request untuk cluster, rekomendasi tanaman dan fertility
+    const response = await fetch("/predict/all", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(data),
@@ -112,6 +113,14 @@ function updateUIWithResults(result) {
   predictedLabelElement.textContent = result.cluster_name;
   cropDescriptionElement.textContent = result.cluster_description || "Cluster information not available.";
   cropImage.src = "/static/assets/icons/soil.png";
+  if (result.crop) {
+    const confidence = Math.round(result.crop_confidence * 100);
+    cropDescriptionElement.textContent += ` Recommended crop: ${result.crop} (${confidence}% confidence).`;
+    if (result.crop_image) {
+      cropImage.src = result.crop_image;
+      cropImage.alt = result.crop;
+    }
+  }
 
   // Update fertility score
   fertilityScoreElement.textContent = result.fertility_score;
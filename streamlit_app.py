@@ -1,7 +1,15 @@
-import streamlit as st
-import pandas as pd
-import joblib
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
 import numpy as np
+import streamlit as st
+from matplotlib.colors import BoundaryNorm, ListedColormap
+from inference import FEATURES, score_grid
+from feature_schema import FeatureSchema
+from model_bundle import load_bundle, BUNDLE_PATH
+from model_reload import file_stamp
 
 # Page configuration
 st.set_page_config(
@@ -55,55 +63,42 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Load models
+# Load models (stamp file bundle ikut jadi key cache, jadi bundle baru hasil training langsung dimuat)
 @st.cache_resource
-def load_models():
+def load_models(bundle_stamp):
     try:
-        model_cluster = joblib.load("model_cluster.pkl")
-        scaler = joblib.load("scaler.pkl")
-        cluster_info = joblib.load("cluster_info.pkl")
-        return model_cluster, scaler, cluster_info
+        bundle = load_bundle()
+        return bundle.scorer(), f"{bundle.checksum:08x}"
     except Exception as e:
         st.error(f"❌ Error loading model files: {e}")
         st.info("💡 Make sure you have run `train_model.py` first to generate the model files.")
         st.stop()
 
-model_cluster, scaler, cluster_info = load_models()
+scorer, model_version = load_models(file_stamp(BUNDLE_PATH))
 
-def generate_cluster_description(cluster_id, characteristics):
-    """Generate description based on cluster characteristics"""
-    desc_parts = []
-    
-    # Analisis berdasarkan nilai fitur
-    if characteristics['N'] > 100:
-        desc_parts.append("tinggi nitrogen")
-    elif characteristics['N'] < 70:
-        desc_parts.append("rendah nitrogen")
-    else:
-        desc_parts.append("sedang nitrogen")
-    
-    if characteristics['P'] > 60:
-        desc_parts.append("tinggi fosfor")
-    elif characteristics['P'] < 40:
-        desc_parts.append("rendah fosfor")
-    
-    if characteristics['K'] > 60:
-        desc_parts.append("tinggi kalium")
-    elif characteristics['K'] < 40:
-        desc_parts.append("rendah kalium")
-    
-    if characteristics['temperature'] > 30:
-        desc_parts.append("suhu tinggi")
-    elif characteristics['temperature'] < 20:
-        desc_parts.append("suhu rendah")
-    
-    if characteristics['rainfall'] > 200:
-        desc_parts.append("curah hujan tinggi")
-    elif characteristics['rainfall'] < 150:
-        desc_parts.append("curah hujan rendah")
-    
-    description = f"Cluster {cluster_id} memiliki karakteristik tanah dengan kandungan " + ", ".join(desc_parts) + "."
-    return description
+# Rentang data training (feature_ranges.json), dipakai juga oleh app.py untuk flag out_of_distribution
+schema = FeatureSchema.load()
+# Rentang sumbu default panel what-if (sama dengan rentang di sidebar)
+FEATURE_RANGES = schema.training_ranges
+# Batas slider rentang (sama dengan batas number input)
+FEATURE_LIMITS = {
+    "N": (0.0, 200.0), "P": (0.0, 150.0), "K": (0.0, 150.0), "temperature": (0.0, 60.0),
+    "humidity": (0.0, 100.0), "ph": (0.0, 14.0), "rainfall": (0.0, 500.0),
+}
+FEATURE_LABELS = {
+    "N": "Nitrogen (N)", "P": "Phosphorus (P)", "K": "Potassium (K)", "temperature": "Temperature (°C)",
+    "humidity": "Humidity (%)", "ph": "pH", "rainfall": "Rainfall (mm)",
+}
+FEATURE_UNITS = {"temperature": "°C", "humidity": "%", "rainfall": "mm"}
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def what_if_grid(model_version, fixed_inputs, x_feature, x_range, y_feature, y_range, resolution):
+    """Cluster, distance and fertility over a resolution x resolution grid of two features (one batch call)"""
+    # model_version ikut di-hash sehingga hasil model lama tidak dipakai lagi setelah bundle berganti
+    x_values = np.linspace(*x_range, resolution)
+    y_values = np.linspace(*y_range, resolution)
+    clusters, distances, fertility = score_grid(scorer, fixed_inputs, x_feature, x_values, y_feature, y_values)
+    return {"x": x_values, "y": y_values, "cluster": clusters, "distance": distances, "fertility": fertility}
 
 def get_fertility_category(score):
     """Categorize fertility score"""
@@ -131,15 +126,9 @@ with st.sidebar:
     """)
     
     st.header("📊 Parameter Input")
-    st.info("""
-    **Nitrogen (N):** 50-150  
-    **Phosphorus (P):** 10-100  
-    **Potassium (K):** 10-100  
-    **Temperature:** 15-48°C  
-    **Humidity:** 20-100%  
-    **pH:** 4-8  
-    **Rainfall:** 100-300mm
-    """)
+    st.info("  \n".join(
+        f"**{FEATURE_LABELS[f]}:** {low:g}-{high:g}{FEATURE_UNITS.get(f, '')}"
+        for f, (low, high) in FEATURE_RANGES.items()))
     
     st.header("🎯 Cara Kerja")
     st.write("""
@@ -232,31 +221,31 @@ if st.button("🔍 Get Prediction", type="primary", use_container_width=True):
         'rainfall': rainfall
     }
     
-    features = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
-    df_input = pd.DataFrame([input_data], columns=features)
-    
-    # Scale input
-    df_scaled = scaler.transform(df_input)
-    
-    # Predict cluster
-    cluster_pred = model_cluster.predict(df_scaled)[0]
-    
-    # Calculate distance to cluster center
-    cluster_center = model_cluster.cluster_centers_[cluster_pred]
-    distance_to_center = np.linalg.norm(df_scaled[0] - cluster_center)
+    # Validasi dengan skema yang sama seperti API (batas fisik + rentang data training)
+    x, errors, ood = schema.validate_one({f: float(v) for f, v in input_data.items()})
+    if errors:
+        st.error("❌ Input tidak valid: " + ", ".join(f"{f} {msg}" for f, msg in errors.items()))
+        st.stop()
+
+    # Scale input, predict cluster and calculate distance to cluster center
+    cluster_pred, distance_to_center = scorer.score_one(x)
     
-    # Get cluster characteristics
-    cluster_characteristics = cluster_info.iloc[cluster_pred].to_dict()
+    # Get cluster characteristics and description (precomputed at training time)
+    cluster_profile = scorer.table[cluster_pred]
+    cluster_characteristics = cluster_profile.characteristics
     
     # Calculate fertility score
     fertility_score = nitrogen * 0.4 + phosphorus * 0.3 + potassium * 0.3
     fertility_category, fertility_icon = get_fertility_category(fertility_score)
     
-    # Generate description
-    cluster_desc = generate_cluster_description(cluster_pred, cluster_characteristics)
+    cluster_desc = cluster_profile.description
     
     # Display results
     st.success("✅ Prediksi berhasil!")
+    if ood:
+        st.warning("⚠️ Di luar rentang data training: " + ", ".join(
+            f"{FEATURE_LABELS[f]} ({FEATURE_RANGES[f][0]:g}-{FEATURE_RANGES[f][1]:g})" for f in ood)
+            + ". Hasil cluster kurang bisa dipercaya.")
     
     st.header("📊 Hasil Prediksi")
     
@@ -328,6 +317,70 @@ if st.button("🔍 Get Prediction", type="primary", use_container_width=True):
         - Menunjukkan profil umum kondisi tanah dalam kelompok ini
         """)
 
+# What-if / sensitivity panel
+st.markdown("---")
+st.header("🧪 What-if: Sensitivitas Cluster & Fertility")
+st.write("Dua fitur divariasikan di seluruh rentangnya, fitur lain tetap sesuai input di atas.")
+
+fixed_inputs = (float(nitrogen), float(phosphorus), float(potassium), float(temperature),
+                float(humidity), float(ph), float(rainfall))
+
+axis_col1, axis_col2, axis_col3 = st.columns(3)
+with axis_col1:
+    x_feature = st.selectbox("Sumbu X", FEATURES, index=FEATURES.index("N"), format_func=FEATURE_LABELS.get)
+    x_range = st.slider("Rentang X", *FEATURE_LIMITS[x_feature], value=FEATURE_RANGES[x_feature],
+                        key=f"what_if_x_{x_feature}")
+with axis_col2:
+    y_options = [f for f in FEATURES if f != x_feature]
+    y_feature = st.selectbox("Sumbu Y", y_options, index=y_options.index("ph" if x_feature != "ph" else "rainfall"),
+                             format_func=FEATURE_LABELS.get)
+    y_range = st.slider("Rentang Y", *FEATURE_LIMITS[y_feature], value=FEATURE_RANGES[y_feature],
+                        key=f"what_if_y_{y_feature}")
+with axis_col3:
+    view = st.radio("Tampilkan", ["Cluster", "Distance to Center", "Fertility Score"])
+    resolution = st.select_slider("Resolusi grid", options=[25, 50, 100, 150, 200], value=100)
+
+if x_range[0] < x_range[1] and y_range[0] < y_range[1]:
+    start = time.perf_counter()
+    grid = what_if_grid(model_version, fixed_inputs, x_feature, x_range, y_feature, y_range, resolution)
+    grid_ms = (time.perf_counter() - start) * 1000
+
+    fig, ax = plt.subplots(figsize=(9, 5))
+    extent = [x_range[0], x_range[1], y_range[0], y_range[1]]
+    if view == "Cluster":
+        # Warna diskrit per cluster (tab20) selama jumlah cluster cukup kecil
+        n_clusters = len(scorer.table)
+        if n_clusters <= 20:
+            cmap = ListedColormap(plt.get_cmap("tab20").colors[:n_clusters])
+            norm = BoundaryNorm(np.arange(n_clusters + 1) - 0.5, n_clusters)
+        else:
+            cmap, norm = "viridis", None
+        image = ax.imshow(grid["cluster"], origin="lower", aspect="auto", extent=extent, cmap=cmap, norm=norm,
+                          interpolation="nearest")
+        colorbar = fig.colorbar(image, ax=ax, label="Cluster")
+        if n_clusters <= 20:
+            colorbar.set_ticks(range(n_clusters))
+    else:
+        values = grid["distance"] if view == "Distance to Center" else grid["fertility"]
+        image = ax.imshow(values, origin="lower", aspect="auto", extent=extent, cmap="YlGn",
+                          interpolation="nearest")
+        fig.colorbar(image, ax=ax, label=view)
+    # Posisi input saat ini
+    ax.plot(fixed_inputs[FEATURES.index(x_feature)], fixed_inputs[FEATURES.index(y_feature)], "k*", markersize=14)
+    ax.set_xlabel(FEATURE_LABELS[x_feature])
+    ax.set_ylabel(FEATURE_LABELS[y_feature])
+    ax.set_xlim(x_range)
+    ax.set_ylim(y_range)
+    st.pyplot(fig)
+    plt.close(fig)
+
+    if view == "Fertility Score" and not {x_feature, y_feature} & {"N", "P", "K"}:
+        st.info("ℹ️ Fertility score hanya bergantung pada N, P dan K, jadi grid ini bernilai konstan.")
+    st.caption(f"Grid {resolution}×{resolution} ({resolution * resolution:,} titik) di-score dalam "
+               f"{grid_ms:.1f} ms, model {model_version}. ★ = input saat ini.")
+else:
+    st.warning("⚠️ Rentang sumbu harus memiliki nilai minimum lebih kecil dari maksimum.")
+
 # Footer
 st.markdown("---")
 st.markdown("""
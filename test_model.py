@@ -1,11 +1,30 @@
+import json
+import os
+import shutil
+import multiprocessing
+import tempfile
 import joblib
 import pandas as pd
 import numpy as np
+from inference import ClusterScorer, score_grid, fertility_score
+from cluster_profile import generate_cluster_description
+from model_bundle import load_bundle, write_bundle, BundleError
+from centroid_index import build_index, verify_index
+from online_update import FeedbackSpool
+import online_update
+from precision_check import compare_precision
+from model_registry import load_crop_model, load_fertility_model
+from aggregation import AggregationEngine, SnapshotDirectory, ALPHA
+from feature_schema import FeatureSchema
+from prediction_log import PredictionLog, iter_blocks
+from score_bulk import score_frame
+from prediction_cache import PredictionCache
 
-# Load model
-model = joblib.load('model_cluster.pkl')
-scaler = joblib.load('scaler.pkl')
-cluster_info = joblib.load('cluster_info.pkl')
+# Load model bundle (dipakai app.py / streamlit_app.py)
+bundle = load_bundle()
+bundle_scorer = bundle.scorer()
+cluster_info = pd.DataFrame(bundle.profile, columns=bundle.features,
+                            index=[f'Cluster {i}' for i in range(bundle.n_clusters)])
 
 print("="*60)
 print("INFORMASI MODEL")
@@ -32,14 +51,14 @@ features = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
 
 for i, test in enumerate(test_cases, 1):
     desc = test.pop('desc')
-    df = pd.DataFrame([test], columns=features)
-    df_scaled = scaler.transform(df)
-    pred = model.predict(df_scaled)[0]
+    x = np.array([test[f] for f in features], dtype=np.float64)
+    pred, _ = bundle_scorer.score_one(x)
+    x_scaled = (x - bundle.mean) / bundle.scale
     
     # Hitung jarak ke setiap cluster center
     distances = []
-    for j, center in enumerate(model.cluster_centers_):
-        dist = np.linalg.norm(df_scaled[0] - center)
+    for j, center in enumerate(bundle.centers):
+        dist = np.linalg.norm(x_scaled - center)
         distances.append((j, dist))
     
     print(f"\nTest {i}: {desc}")
@@ -48,6 +67,274 @@ for i, test in enumerate(test_cases, 1):
     print(f"  Jarak ke Cluster 0: {distances[0][1]:.4f}")
     print(f"  Jarak ke Cluster 1: {distances[1][1]:.4f}")
 
+print("\n" + "="*60)
+print("PARITY KERNEL NUMPY vs SKLEARN (data_core.csv)")
+print("="*60)
+
+# Kernel NumPy (dari pickle maupun dari bundle) harus identik dengan jalur sklearn
+model = joblib.load('model_cluster.pkl')
+scaler = joblib.load('scaler.pkl')
+cluster_info_pkl = joblib.load('cluster_info.pkl')
+assert np.array_equal(bundle.params, ClusterScorer.from_sklearn(scaler, model).params), \
+    "model_bundle.bin tidak sinkron dengan pickle, jalankan ulang train_model.py"
+assert np.array_equal(bundle.profile, cluster_info_pkl[features].to_numpy()), "tabel profil bundle berbeda"
+for entry, row in zip(bundle_scorer.table, cluster_info_pkl[features].to_dict("records")):
+    assert entry.characteristics == row, "karakteristik di tabel profil cluster berbeda"
+    assert entry.description == generate_cluster_description(entry.cluster, row), "deskripsi cluster berbeda"
+
+df_core = pd.read_csv('data_core.csv')
+scorer = ClusterScorer.from_sklearn(scaler, model, cluster_info_pkl)
+X_core = df_core[features].to_numpy(dtype=np.float64)
+X_core_scaled = scaler.transform(df_core[features])
+expected_clusters = model.predict(X_core_scaled)
+expected_distances = np.linalg.norm(X_core_scaled - model.cluster_centers_[expected_clusters], axis=1)
+
+batch_clusters, batch_distances = scorer.score_batch(X_core)
+single_clusters = np.array([scorer.score_one(x)[0] for x in X_core])
+
+assert np.array_equal(batch_clusters, expected_clusters), "score_batch berbeda dengan model.predict"
+assert np.array_equal(single_clusters, expected_clusters), "score_one berbeda dengan model.predict"
+assert np.allclose(batch_distances, expected_distances, rtol=0, atol=1e-12), "distance_to_center berbeda"
+assert np.array_equal(bundle_scorer.score_batch(X_core)[0], expected_clusters), "bundle berbeda dengan model.predict"
+print(f"  {len(X_core)} sampel: cluster identik, selisih jarak maks "
+      f"{np.abs(batch_distances - expected_distances).max():.2e}")
+
+# Mode float32 (SCORING_DTYPE=float32): hanya boleh berbeda untuk titik di batas cluster
+precision = compare_precision(bundle_scorer, X_core, np.float32)
+assert precision["far_from_boundary"] == 0, "scoring float32 berbeda jauh dari batas cluster"
+print(f"  float32: {precision['disagreements']} assignment berbeda "
+      f"({precision['near_boundary']} di batas cluster), selisih jarak maks {precision['max_distance_abs_error']:.2e}")
+
+# Grid what-if (streamlit_app.py): satu batch call harus sama dengan score_one per titik
+grid_x, grid_y = np.linspace(50, 150, 40), np.linspace(4, 8, 30)
+grid_clusters, grid_distances, grid_fertility = score_grid(bundle_scorer, X_core[0], "N", grid_x, "ph", grid_y)
+assert grid_clusters.shape == (30, 40), "bentuk grid salah"
+for i, j in [(0, 0), (7, 13), (29, 39)]:
+    point = X_core[0].copy()
+    point[0], point[5] = grid_x[j], grid_y[i]
+    cluster, distance = bundle_scorer.score_one(point)
+    assert grid_clusters[i, j] == cluster and abs(grid_distances[i, j] - distance) < 1e-12, "grid berbeda"
+    assert grid_fertility[i, j] == fertility_score(point), "fertility grid berbeda"
+print("  grid what-if 40x30: identik dengan score_one")
+
+# Rollup agregasi (aggregation.py): batch inkremental harus sama dengan statistik exact per region
+region_ids = np.array([f"r{i % 7}" for i in range(len(X_core))], dtype=object)
+engine = AggregationEngine(bundle_scorer.n_clusters)
+for start in range(0, len(X_core), 5000):
+    engine.ingest(bundle_scorer, X_core[start:start + 5000], {"region": region_ids[start:start + 5000].tolist()})
+in_region = region_ids == "r3"
+rollup = engine.summary("region", "r3")
+region_fertility = fertility_score(X_core[in_region])
+exact_p90 = np.percentile(batch_distances[in_region], 90, method="lower")
+assert rollup["cluster_counts"] == np.bincount(batch_clusters[in_region], minlength=bundle_scorer.n_clusters).tolist()
+assert abs(rollup["fertility_score"]["mean"] - region_fertility.mean()) < 1e-3, "mean fertility rollup berbeda"
+assert abs(rollup["fertility_score"]["variance"] - region_fertility.var()) < 1e-3, "variance fertility rollup berbeda"
+assert abs(rollup["distance_to_center"]["p90"] / exact_p90 - 1) <= ALPHA + 1e-3, "p90 distance di luar akurasi sketch"
+print(f"  rollup region: {rollup['count']} sampel, p90 distance {rollup['distance_to_center']['p90']} "
+      f"(exact {exact_p90:.4f})")
+
+# Rollup beberapa worker (SnapshotDirectory): process anak yang sudah berhenti tidak boleh hilang sampelnya
+with tempfile.TemporaryDirectory() as snapshot_dir:
+    shared = SnapshotDirectory(snapshot_dir, bundle_scorer.n_clusters, flush_interval=0)
+    half = len(X_core) // 2
+    child = multiprocessing.get_context("fork").Process(target=lambda: (
+        shared.ingest(bundle_scorer, X_core[:half], {"region": region_ids[:half].tolist()}), shared.close()))
+    child.start()
+    child.join()
+    shared.ingest(bundle_scorer, X_core[half:], {"region": region_ids[half:].tolist()})
+    assert shared.summary("region", "r3") == rollup, "rollup gabungan worker berbeda dengan satu process"
+    assert shared.stats()["samples"] == len(X_core), "sampel worker lain hilang"
+print("  rollup 2 process lewat direktori snapshot: identik dengan satu process")
+
+# Validasi input (feature_schema.py): jalur satu sampel dan batch harus memberi keputusan yang sama
+schema = FeatureSchema.load()
+samples = [dict(zip(features, row)) for row in X_core[:200].tolist()]
+samples += [{**samples[0], "ph": 15}, {**samples[1], "N": "abc"}, {**samples[2], "K": None},
+            {**samples[3], "rainfall": float("nan")}, {**samples[4], "temperature": "21.5"},
+            {**samples[5], "humidity": 95}, list(X_core[6]), [1, 2, 3],
+            {**samples[7], "N": 10 ** 400}, [*X_core[8, :6].tolist(), -10 ** 400]]
+validated = schema.validate_batch(samples)
+for i, sample in enumerate(samples):
+    x, errors, ood = schema.validate_one(sample) if isinstance(sample, dict) else schema.validate_one(
+        dict(zip(features, sample)) if len(sample) == len(features) else None)
+    assert validated.valid[i] == (errors is None), f"validasi sampel {i} berbeda"
+    if errors is None:
+        assert np.array_equal(validated.X[i], x), f"nilai sampel {i} berbeda"
+        assert [features[j] for j in np.flatnonzero(validated.ood[i])] == ood, f"flag ood sampel {i} berbeda"
+assert validated.n_invalid == 7 and validated.ood_rows().tolist() == [205], "hasil validasi batch salah"
+print(f"  validasi {len(samples)} sampel: satu sampel dan batch identik, {validated.n_invalid} ditolak")
+
+# Model bundle rusak: header yang berubah harus ditolak oleh checksum, field header yang hilang oleh BundleError
+with open("model_bundle.bin", "rb") as f:
+    bundle_bytes = f.read()
+with tempfile.TemporaryDirectory() as corrupt_dir:
+    corrupt_path = os.path.join(corrupt_dir, "model_bundle.bin")
+    for label, data, verify in [
+        ("deskripsi cluster diubah", bundle_bytes.replace(b"Cluster 0 memiliki", b"Cluster 0 memilikx", 1), True),
+        ("field payload_size hilang", bundle_bytes.replace(b'"payload_size"', b'"payload_sizX"', 1), False),
+        ("header bukan objek", bundle_bytes.replace(b'{"features"', b'["features"', 1), False),
+    ]:
+        assert data != bundle_bytes, label
+        with open(corrupt_path, "wb") as f:
+            f.write(data)
+        try:
+            load_bundle(corrupt_path, verify=verify)
+        except BundleError:
+            pass
+        else:
+            raise AssertionError(f"bundle rusak ({label}) tidak ditolak")
+print("  bundle dengan header rusak ditolak dengan BundleError")
+
+# Bulk scoring (score_bulk.py): sel bukan angka di CSV menjadi baris invalid (cluster -1), bukan error satu chunk
+bulk = pd.DataFrame(X_core[:50], columns=features)
+bulk["N"] = bulk["N"].astype(object)
+bulk.loc[[3, 17], "N"] = ["n/a", "12,5"]
+scored, n_invalid = score_frame(bundle_scorer, bulk)
+assert n_invalid == 2 and scored["cluster"].iloc[[3, 17]].tolist() == [-1, -1], "sel bukan angka tidak ditandai"
+valid_rows = np.setdiff1d(np.arange(50), [3, 17])
+assert np.array_equal(scored["cluster"].to_numpy()[valid_rows], bundle_scorer.score_batch(X_core[valid_rows])[0])
+print("  bulk scoring: sel bukan angka menjadi baris invalid, baris lain tetap di-score")
+
+# Online learning (online_update.py): learner menulis bundle terpisah dan tidak pernah menimpa hasil training
+with tempfile.TemporaryDirectory() as online_dir:
+    base_path = os.path.join(online_dir, "model_bundle.bin")
+    shutil.copy("model_bundle.bin", base_path)
+    with open(base_path, "rb") as f:
+        base_bytes = f.read()
+    spool = FeedbackSpool(os.path.join(online_dir, "feedback.ndjson"))
+    drift_path = os.path.join(online_dir, "drift.jsonl")
+    spool.append(X_core[:300])
+    online_update.run(base_path, spool.path, min_samples=1, reference=X_core, once=True, drift_path=drift_path)
+    online_path = online_update.online_bundle_path(base_path)
+    with open(base_path, "rb") as f:
+        assert f.read() == base_bytes, "learner menimpa bundle training"
+    assert online_update.promoted_bundle(base_path) == online_path, "bundle online tidak dipromosikan"
+    assert load_bundle(online_path).header["metadata"]["source"] == bundle.header["metadata"]["source"], \
+        "metadata bundle training hilang"
+    # Retrain offline mengganti bundle dasar: bundle online lama tidak dipakai lagi, learner mulai ulang dari sana
+    write_bundle(base_path, bundle.mean, bundle.scale * 1.01, bundle.centers, bundle.profile,
+                 metadata={"source": "retrain"})
+    assert online_update.promoted_bundle(base_path) == base_path, "bundle online basi masih dipromosikan"
+    spool.append(X_core[300:600])
+    online_update.run(base_path, spool.path, min_samples=1, reference=X_core, once=True, drift_path=drift_path)
+    republished = load_bundle(online_path).header["metadata"]
+    assert republished["base_checksum"] == load_bundle(base_path).checksum and republished["source"] == "retrain"
+    assert online_update.promoted_bundle(base_path) == online_path
+print("  online learning: bundle training tidak ditimpa, learner mengikuti retrain offline")
+
+# Index IVF yang dibawa learner: inverted list yang sama dengan centroid yang bergeser tetap exact
+rng = np.random.default_rng(0)
+index_centers = rng.normal(size=(400, len(features)))
+moved_centers = index_centers + rng.normal(0, 0.05, index_centers.shape)
+assert verify_index(build_index(index_centers).with_centers(moved_centers), moved_centers) == 1.0
+print("  index IVF setelah centroid bergeser: identik dengan brute force")
+
+print("\n" + "="*60)
+print("PARITY MODEL REGISTRY vs SKLEARN (crop classifier, fertility regressor)")
+print("="*60)
+classifier = joblib.load('model_classifier.pkl')
+regressor = joblib.load('model_regressor.pkl')
+label_encoder = joblib.load('label_encoder.pkl')
+crop_model = load_crop_model()
+fertility_model = load_fertility_model()
+Z_core = bundle_scorer.transform(X_core)
+crop_classes, crop_confidence = crop_model.predict(Z_core)
+expected_crops = label_encoder.inverse_transform(classifier.predict(X_core_scaled))
+assert np.array_equal(np.array(crop_model.labels)[crop_classes], expected_crops), "rekomendasi tanaman berbeda"
+assert np.allclose(crop_confidence, classifier.predict_proba(X_core_scaled).max(axis=1)), "confidence berbeda"
+assert crop_model.predict_one(Z_core[0])[0] == crop_classes[0], "predict_one tanaman berbeda dengan batch"
+assert np.allclose(fertility_model.predict(Z_core), regressor.predict(X_core_scaled), rtol=0, atol=1e-9), \
+    "regresi fertility berbeda"
+print(f"  {len(X_core)} sampel: tanaman identik, akurasi terhadap label "
+      f"{np.mean(expected_crops == df_core['label'].to_numpy()):.2%}")
+
+# Scaler bundle berubah (retrain / hot reload / online update): tanaman dan fertility dari /predict/all tidak
+# boleh ikut berubah, karena classifier / regressor tetap memakai scaler training-nya (model_scalers.json)
+import app as flask_app
+shifted_params = np.array(bundle_scorer.params)
+shifted_params[0] += 5.0
+shifted_params[1] *= 1.3
+original_model = flask_app.active_model
+shifted_model = (ClusterScorer(shifted_params, table=bundle_scorer.table), original_model[1])
+try:
+    for i in range(0, len(X_core), 997):
+        x = X_core[i].tolist()
+        flask_app.active_model = original_model
+        expected = json.loads(flask_app.build_full_prediction(x)[0])
+        flask_app.active_model = shifted_model
+        shifted = json.loads(flask_app.build_full_prediction(x)[0])
+        assert shifted["crop"] == expected["crop"] == expected_crops[i], f"tanaman sampel {i} berubah"
+        assert shifted["fertility_predicted"] == expected["fertility_predicted"], f"fertility sampel {i} berubah"
+finally:
+    flask_app.active_model = original_model
+print("  scaler bundle diubah: tanaman dan fertility /predict/all tetap sama")
+
+# /predict/batch Flask dan ASGI memakai jalur yang sama (app.batch_prediction)
+import asyncio
+import asgi_app
+batch_body = json.dumps([dict(zip(features, row)) for row in X_core[:100].tolist()] + [{"N": "x"}]).encode()
+flask_response = flask_app.app.test_client().post("/predict/batch", data=batch_body, content_type="application/json")
+asgi_status, asgi_payload = asyncio.run(asgi_app.predict_batch(batch_body, "application/json"))
+assert (asgi_status, asgi_payload) == (flask_response.status_code, flask_response.get_json())
+valid_body = batch_body.replace(b', {"N": "x"}', b"")
+flask_response = flask_app.app.test_client().post("/predict/batch", data=valid_body, content_type="application/json")
+assert asyncio.run(asgi_app.predict_batch(valid_body, "application/json")) == (200, flask_response.get_json())
+print("  /predict/batch Flask dan ASGI: response identik")
+
+# Cache /predict: miss di-score dari input asli, hit berbeda dari hasil exact paling banyak sebesar tolerance
+original_cache, original_log = flask_app.prediction_cache, flask_app.prediction_log
+flask_app.prediction_cache = PredictionCache(max_size=1000)
+flask_app.prediction_cache.invalidate(flask_app.model_generation)
+cache_log_dir = tempfile.mkdtemp()
+flask_app.prediction_log = PredictionLog(cache_log_dir)
+try:
+    client = flask_app.app.test_client()
+    tolerance = flask_app.prediction_cache.tolerance(bundle_scorer.scale)
+    steps = np.array(flask_app.prediction_cache.steps)
+    boundary_hits = 0
+    for i in range(0, len(X_core), 337):
+        bucket = np.round(X_core[i] / steps) * steps
+        first, second = (bucket + rng.uniform(-0.49, 0.49, (2, len(features))) * steps).tolist()
+        # Flag out_of_distribution dihitung per request (tidak di-cache), jadi tidak ikut dibandingkan
+        miss = client.post("/predict", json=dict(zip(features, first))).get_json()
+        miss.pop("out_of_distribution", None)
+        assert miss == json.loads(flask_app.build_prediction(first)), f"miss sampel {i} tidak exact"
+        hit = client.post("/predict", json=dict(zip(features, second))).get_json()
+        hit.pop("out_of_distribution", None)
+        exact = json.loads(flask_app.build_prediction(second))
+        assert hit == miss, f"sampel {i} tidak diambil dari cache"
+        if hit["cluster"] != exact["cluster"]:
+            boundary_hits += 1
+            continue
+        assert abs(hit["distance_to_center"] - exact["distance_to_center"]) <= tolerance["distance_to_center"]
+        assert abs(hit["fertility_score"] - exact["fertility_score"]) <= tolerance["fertility_score"]
+    # Log prediksi cache hit: input yang dikirim dengan jarak input itu sendiri ke cluster yang dikembalikan
+    flask_app.prediction_log.ensure_started()
+    flask_app.prediction_log.close()
+    logged = np.concatenate(list(iter_blocks(cache_log_dir)))
+    expected = [bundle_scorer.distance_one(x, c) for x, c in zip(logged["features"], logged["cluster"])]
+    assert np.allclose(logged["distance_to_center"], expected), "log cache hit memakai jarak sampel lain"
+finally:
+    flask_app.prediction_cache, flask_app.prediction_log = original_cache, original_log
+    shutil.rmtree(cache_log_dir, ignore_errors=True)
+print(f"  cache /predict: miss exact, hit dalam tolerance (distance {tolerance['distance_to_center']:.4f}, "
+      f"fertility {tolerance['fertility_score']:.2f}), {boundary_hits} hit di batas cluster")
+
+# Log prediksi (prediction_log.py): antrian dibatasi per baris, batch dibuang utuh, restart writer tidak
+# membuang record yang sudah antri
+with tempfile.TemporaryDirectory() as log_dir:
+    plog = PredictionLog(log_dir, max_pending=1000)
+    clusters_core, distances_core = bundle_scorer.score_batch(X_core[:1500])
+    plog.log_batch(2, X_core[:600], clusters_core[:600], distances_core[:600])
+    plog.log_batch(2, X_core[600:1200], clusters_core[600:1200], distances_core[600:1200])
+    plog.log(0, X_core[1200], int(clusters_core[1200]), float(distances_core[1200]))
+    assert plog.stats()["pending"] == 601 and plog.stats()["dropped"] == 600, "batas antrian bukan per baris"
+    plog.ensure_started()
+    plog.close()
+    logged = np.concatenate(list(iter_blocks(log_dir)))
+    assert len(logged) == plog.stats()["logged"] == 601, "record yang antri sebelum writer start hilang"
+print("  log prediksi: antrian per baris, batch penuh dibuang utuh, record antri tetap ditulis")
+
 print("\n" + "="*60)
 print("KESIMPULAN")
 print("="*60)
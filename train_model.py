@@ -1,197 +1,484 @@
+import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from scipy import stats
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score, davies_bouldin_score
 import joblib
-
-# Tentukan folder penyimpanan plot
-folder_plots = "hasil_train_plots"
-if not os.path.exists(folder_plots):
-    os.makedirs(folder_plots)
-
-# Load data
-df = pd.read_csv("data_core.csv")
-print(df.head())
-print(df.info())
-print(df.describe())
+from threadpoolctl import threadpool_limits
+from model_bundle import export_from_sklearn, load_bundle, BUNDLE_PATH
+import diagnostics
+from diagnostics import run_diagnostics, load_sweep, folder_plots, SWEEP_PATH
+from inference import FEATURES
+import cluster_profile
+import model_bundle
+import centroid_index as centroid_index_module
+from cluster_profile import build_cluster_table
+from centroid_index import build_index, verify_index, INDEX_MIN_CLUSTERS
+from pipeline import Pipeline, file_stamps, STAGE_CACHE_DIR, REPORT_PATH
+from data_cache import load_frame, open_cache, ensure_cache, hash_and_count
+from prediction_log import iter_features as iter_logged_features, segment_paths
+from feature_schema import training_ranges, save_training_ranges, FEATURE_RANGES_PATH
 
 # Fitur numerik
-features = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
-
-# Histogram distribusi
-plt.figure(figsize=(15, 10))
-for i, feature in enumerate(features):
-    plt.subplot(3, 3, i+1)
-    sns.histplot(df[feature], kde=True)
-    plt.title(f'Distribusi {feature}')
-plt.tight_layout()
-plt.savefig(os.path.join(folder_plots, "plot_histogram_distribusi.png"))
-plt.close()
-
-# Heatmap korelasi
-corr = df[features].corr()
-plt.figure(figsize=(8,6))
-sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f")
-plt.title('Matriks Korelasi Fitur Numerik')
-plt.savefig(os.path.join(folder_plots, "plot_korelasi_heatmap.png"))
-plt.close()
-
-# Pairplot (tanpa label karena unsupervised)
-sns.pairplot(df[features])
-plt.savefig(os.path.join(folder_plots, "plot_pairplot.png"))
-plt.close()
-
-# Skew dan Kurtosis
-numeric_df = df.select_dtypes(include=['number'])
-print("Skewness:\n", numeric_df.skew())
-print("Kurtosis:\n", numeric_df.kurt())
-
-# Missing value check
-missing_values = df.isnull().sum()
-print("Missing values:\n", missing_values[missing_values > 0])
-
-# Boxplot per fitur (independen dari label)
-plt.figure(figsize=(15,10))
-for i, feature in enumerate(features):
-    plt.subplot(3, 3, i+1)
-    sns.boxplot(y=df[feature])
-    plt.title(f'Boxplot {feature}')
-plt.tight_layout()
-plt.savefig(os.path.join(folder_plots, "plot_boxplot_all_features.png"))
-plt.close()
-
-# Persiapan data untuk unsupervised learning
-X = df[features]
-
-# Scaling data
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-print(f"Dataset shape: {X_scaled.shape}")
-print(f"Number of features: {len(features)}")
-
-# Menentukan jumlah cluster optimal menggunakan Elbow Method dan Silhouette Score
-print("\n[INFO] Mencari jumlah cluster optimal...")
-inertias = []
-silhouette_scores = []
+features = FEATURES
 K_range = range(2, 11)
+# Tahap training mode in-memory (lihat train_full)
+STAGES = ["load", "scale", "sweep", "fit", "profile", "export", "plots"]
+# File yang ditulis tahap export (tahap dijalankan ulang jika salah satunya hilang / berubah)
+EXPORT_OUTPUTS = ["model_cluster.pkl", "scaler.pkl", "cluster_info.pkl", BUNDLE_PATH, "cluster_centers.csv",
+                  SWEEP_PATH, FEATURE_RANGES_PATH]
+
+
+def build_centroid_index(kmeans_model, mode="auto"):
+    """IVF centroid index for high-k models (mode: auto / always / never), verified against brute force"""
+    k = kmeans_model.n_clusters
+    if mode == "never" or (mode == "auto" and k < INDEX_MIN_CLUSTERS):
+        return None
+    start = time.perf_counter()
+    index = build_index(kmeans_model.cluster_centers_)
+    agreement = verify_index(index, kmeans_model.cluster_centers_)
+    print(f"[INFO] Centroid index: {index.n_lists} list untuk {k} cluster ({time.perf_counter() - start:.2f} s), "
+          f"kecocokan dengan brute force {agreement:.2%}")
+    if agreement < 1.0:
+        print("[INFO] Centroid index tidak identik dengan brute force, index tidak disimpan")
+        return None
+    return index
+
+
+def save_artifacts(scaler, kmeans_model, cluster_info, metadata=None, centroid_index="auto", cluster_table=None):
+    """Write model_cluster.pkl, scaler.pkl, cluster_info.pkl, the model bundle and cluster_centers.csv"""
+    joblib.dump(kmeans_model, "model_cluster.pkl")
+    joblib.dump(scaler, "scaler.pkl")
+    joblib.dump(cluster_info, "cluster_info.pkl")
+
+    # Tabel profil per cluster (karakteristik, deskripsi, potongan JSON response) dihitung sekali di sini,
+    # serving layer tinggal memakainya
+    if cluster_table is None:
+        cluster_table = build_cluster_table(cluster_info[features].to_numpy().tolist())
+    print("\n[INFO] Deskripsi Cluster:")
+    for entry in cluster_table:
+        print(f"  {entry.description}")
+
+    # Simpan juga model bundle (format binary ringkas yang di-mmap oleh app.py / streamlit_app.py)
+    export_from_sklearn(BUNDLE_PATH, scaler, kmeans_model, cluster_info, metadata=metadata,
+                        cluster_table=cluster_table, index=build_centroid_index(kmeans_model, centroid_index))
+
+    # Simpan cluster centers untuk referensi
+    cluster_centers_df = pd.DataFrame(cluster_info.to_numpy(), columns=features)
+    cluster_centers_df.to_csv("cluster_centers.csv", index=False)
 
-for k in K_range:
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+    print("\n[INFO] Training selesai. Model clustering berhasil disimpan.")
+    print(f"[INFO] Model disimpan: model_cluster.pkl")
+    print(f"[INFO] Scaler disimpan: scaler.pkl")
+    print(f"[INFO] Informasi cluster disimpan: cluster_info.pkl")
+    print(f"[INFO] Cluster centers disimpan: cluster_centers.csv")
+    print(f"[INFO] Model bundle disimpan: {BUNDLE_PATH}")
+
+
+# Data ter-scale untuk worker process k-sweep (diisi sekali per worker lewat initializer)
+_sweep_X = None
+
+
+def _init_sweep_worker(X_scaled, limit_threads=True):
+    global _sweep_X
+    _sweep_X = X_scaled
+    if limit_threads:
+        # Satu thread BLAS/OpenMP per process supaya worker tidak saling berebut core
+        threadpool_limits(1)
+
+
+def _evaluate_k(k, silhouette_sample=None, silhouette_repeats=5, random_state=42):
+    """Fit KMeans for one k and score it (exact or sampled silhouette); runs in a worker process"""
+    X_scaled = _sweep_X
+    # CPU time (bukan wall time) supaya total kerja tidak ikut membengkak saat process berbagi core
+    start = time.process_time()
+    kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=10)
     kmeans.fit(X_scaled)
-    inertias.append(kmeans.inertia_)
-    silhouette_scores.append(silhouette_score(X_scaled, kmeans.labels_))
-
-# Plot Elbow Method
-plt.figure(figsize=(10, 5))
-plt.subplot(1, 2, 1)
-plt.plot(K_range, inertias, 'bo-')
-plt.xlabel('Number of Clusters (k)')
-plt.ylabel('Inertia')
-plt.title('Elbow Method')
-plt.grid(True)
-
-# Plot Silhouette Score
-plt.subplot(1, 2, 2)
-plt.plot(K_range, silhouette_scores, 'ro-')
-plt.xlabel('Number of Clusters (k)')
-plt.ylabel('Silhouette Score')
-plt.title('Silhouette Score')
-plt.grid(True)
-plt.tight_layout()
-plt.savefig(os.path.join(folder_plots, "plot_optimal_clusters.png"))
-plt.close()
-
-# Pilih jumlah cluster dengan silhouette score tertinggi
-optimal_k = K_range[np.argmax(silhouette_scores)]
-print(f"[INFO] Jumlah cluster optimal: {optimal_k} (Silhouette Score: {max(silhouette_scores):.4f})")
-
-# Training K-Means dengan jumlah cluster optimal
-print(f"\n[INFO] Training K-Means dengan {optimal_k} clusters...")
-kmeans_model = KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
-cluster_labels = kmeans_model.fit_predict(X_scaled)
-
-# Evaluasi clustering
-silhouette_avg = silhouette_score(X_scaled, cluster_labels)
-davies_bouldin = davies_bouldin_score(X_scaled, cluster_labels)
-
-print(f"[INFO] Silhouette Score: {silhouette_avg:.4f}")
-print(f"[INFO] Davies-Bouldin Score: {davies_bouldin:.4f}")
-
-# Tambahkan cluster labels ke dataframe untuk analisis
-df['cluster'] = cluster_labels
-
-# Visualisasi distribusi cluster
-plt.figure(figsize=(8, 6))
-sns.countplot(data=df, x='cluster')
-plt.title('Distribusi Data per Cluster')
-plt.xlabel('Cluster')
-plt.ylabel('Jumlah Data')
-plt.savefig(os.path.join(folder_plots, "plot_distribusi_cluster.png"))
-plt.close()
-
-# Visualisasi cluster dengan PCA (2D projection)
-from sklearn.decomposition import PCA
-pca = PCA(n_components=2, random_state=42)
-X_pca = pca.fit_transform(X_scaled)
-
-plt.figure(figsize=(10, 8))
-scatter = plt.scatter(X_pca[:, 0], X_pca[:, 1], c=cluster_labels, cmap='viridis', alpha=0.6)
-plt.scatter(pca.transform(kmeans_model.cluster_centers_)[:, 0], 
-            pca.transform(kmeans_model.cluster_centers_)[:, 1], 
-            c='red', marker='x', s=200, linewidths=3, label='Centroids')
-plt.xlabel(f'PC1 ({pca.explained_variance_ratio_[0]:.2%} variance)')
-plt.ylabel(f'PC2 ({pca.explained_variance_ratio_[1]:.2%} variance)')
-plt.title('K-Means Clustering (PCA Visualization)')
-plt.colorbar(scatter, label='Cluster')
-plt.legend()
-plt.savefig(os.path.join(folder_plots, "plot_clustering_pca.png"))
-plt.close()
-
-# Analisis karakteristik setiap cluster
-print("\n[INFO] Karakteristik Cluster:")
-cluster_centers_original = scaler.inverse_transform(kmeans_model.cluster_centers_)
-cluster_info = pd.DataFrame(cluster_centers_original, columns=features)
-cluster_info.index = [f'Cluster {i}' for i in range(optimal_k)]
-print(cluster_info)
-
-# Visualisasi karakteristik cluster
-plt.figure(figsize=(12, 8))
-cluster_info.T.plot(kind='bar', figsize=(12, 8))
-plt.title('Karakteristik Rata-rata Fitur per Cluster')
-plt.xlabel('Fitur')
-plt.ylabel('Nilai')
-plt.legend(title='Cluster', bbox_to_anchor=(1.05, 1), loc='upper left')
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.savefig(os.path.join(folder_plots, "plot_karakteristik_cluster.png"))
-plt.close()
-
-# Heatmap karakteristik cluster
-plt.figure(figsize=(10, 6))
-sns.heatmap(cluster_info, annot=True, fmt='.2f', cmap='YlOrRd', cbar_kws={'label': 'Nilai Rata-rata'})
-plt.title('Heatmap Karakteristik Cluster')
-plt.ylabel('Cluster')
-plt.xlabel('Fitur')
-plt.tight_layout()
-plt.savefig(os.path.join(folder_plots, "plot_heatmap_cluster.png"))
-plt.close()
-
-# Simpan model dan informasi cluster
-joblib.dump(kmeans_model, "model_cluster.pkl")
-joblib.dump(scaler, "scaler.pkl")
-joblib.dump(cluster_info, "cluster_info.pkl")
-
-# Simpan cluster centers untuk referensi
-cluster_centers_df = pd.DataFrame(cluster_centers_original, columns=features)
-cluster_centers_df.to_csv("cluster_centers.csv", index=False)
-
-print("\n[INFO] Training selesai. Model clustering dan plot berhasil disimpan.")
-print(f"[INFO] Model disimpan: model_cluster.pkl")
-print(f"[INFO] Scaler disimpan: scaler.pkl")
-print(f"[INFO] Informasi cluster disimpan: cluster_info.pkl")
-print(f"[INFO] Cluster centers disimpan: cluster_centers.csv")
\ No newline at end of file
+    fit_seconds = time.process_time() - start
+
+    start = time.process_time()
+    if silhouette_sample is None or silhouette_sample >= len(X_scaled):
+        scores = [silhouette_score(X_scaled, kmeans.labels_)]
+    else:
+        # Seed yang sama untuk setiap k, sehingga repeat ke-r memakai sample yang sama (perbandingan berpasangan)
+        scores = [silhouette_score(X_scaled, kmeans.labels_, sample_size=silhouette_sample,
+                                   random_state=random_state + r) for r in range(silhouette_repeats)]
+    silhouette_seconds = time.process_time() - start
+
+    return {"k": k, "model": kmeans, "inertia": kmeans.inertia_, "silhouette_runs": scores,
+            "fit_seconds": fit_seconds, "silhouette_seconds": silhouette_seconds}
+
+
+def save_sweep(sweep):
+    """Persist the k-sweep table for the diagnostics stage"""
+    sweep.drop(columns=["fit_seconds", "silhouette_seconds"], errors="ignore").to_csv(SWEEP_PATH)
+    print(f"[INFO] Hasil k-sweep disimpan: {SWEEP_PATH}")
+
+
+def run_k_sweep(X_scaled, n_jobs=None, silhouette_sample=None, silhouette_repeats=5, random_state=42):
+    """Evaluate every k in K_range in a process pool; returns (results DataFrame, models by k, wall seconds)"""
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(K_range))
+    task = partial(_evaluate_k, silhouette_sample=silhouette_sample,
+                   silhouette_repeats=silhouette_repeats, random_state=random_state)
+
+    start = time.perf_counter()
+    if n_jobs == 1:
+        _init_sweep_worker(X_scaled, limit_threads=False)
+        outputs = [task(k) for k in K_range]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_sweep_worker,
+                                 initargs=(X_scaled,)) as pool:
+            outputs = list(pool.map(task, K_range))
+    wall_seconds = time.perf_counter() - start
+
+    rows = []
+    for out in outputs:
+        runs = np.asarray(out["silhouette_runs"])
+        # Interval kepercayaan 95% (distribusi t, repeat sedikit) untuk rata-rata silhouette; lebar 0 untuk mode exact
+        n = len(runs)
+        half_width = stats.t.ppf(0.975, n - 1) * runs.std(ddof=1) / np.sqrt(n) if n > 1 else 0.0
+        rows.append({"k": out["k"], "inertia": out["inertia"], "silhouette": runs.mean(),
+                     "silhouette_ci_low": runs.mean() - half_width, "silhouette_ci_high": runs.mean() + half_width,
+                     "fit_seconds": out["fit_seconds"], "silhouette_seconds": out["silhouette_seconds"]})
+    results = pd.DataFrame(rows).set_index("k")
+
+    # Seberapa sering k terpilih juga menang pada tiap repeat sample
+    runs_matrix = np.array([out["silhouette_runs"] for out in outputs])
+    winners = np.array(K_range)[np.argmax(runs_matrix, axis=0)]
+    results["win_rate"] = [float(np.mean(winners == k)) for k in results.index]
+
+    models = {out["k"]: out["model"] for out in outputs}
+    return results, models, wall_seconds, n_jobs
+
+
+def print_sweep_report(results, wall_seconds, n_jobs, silhouette_sample):
+    """Print per-k scores with confidence intervals and the parallel timing report"""
+    mode = "exact" if silhouette_sample is None else f"sample {silhouette_sample} baris"
+    print(f"\n[INFO] Hasil k-sweep (silhouette {mode}):")
+    print(f"  {'k':>3} {'inertia':>12} {'silhouette':>11} {'95% CI':>19} {'win':>5} {'fit cpu':>8} {'sil cpu':>8}")
+    for k, row in results.iterrows():
+        print(f"  {k:>3} {row.inertia:>12.2f} {row.silhouette:>11.4f} "
+              f"[{row.silhouette_ci_low:.4f}, {row.silhouette_ci_high:.4f}] {row.win_rate:>5.0%} "
+              f"{row.fit_seconds:>8.2f} {row.silhouette_seconds:>8.2f}")
+
+    cpu_seconds = (results.fit_seconds + results.silhouette_seconds).sum()
+    print(f"[INFO] Waktu k-sweep: {wall_seconds:.2f} s wall dengan {n_jobs} process "
+          f"(total CPU {cpu_seconds:.2f} s, speedup vs sequential ~{cpu_seconds / wall_seconds:.2f}x)")
+
+
+def data_fingerprint(data_path, data_cache=True, replay_log=None):
+    """Content hash of the training data (and of the closed prediction log segments, if replayed)"""
+    digest = None
+    if data_cache:
+        try:
+            # Sekaligus membangun / mengecek cache kolumnar (data_cache.py), SHA-256 sudah ada di meta
+            digest = ensure_cache(data_path)["sha256"]
+        except (ValueError, OSError) as e:
+            print(f"[INFO] Cache data tidak dipakai ({e}), hash dihitung dari CSV")
+    if digest is None:
+        digest = hash_and_count(data_path)[0]
+    # Segment log yang sudah ditutup tidak pernah berubah: nama + ukuran cukup sebagai fingerprint
+    segments = file_stamps(segment_paths(replay_log)) if replay_log else {}
+    return {"sha256": digest, "replay_segments": {os.path.basename(p): s[0] for p, s in segments.items()}}
+
+
+def stage_load(data_path, data_cache=True, replay_log=None):
+    """Training frame (for the plots) and the float64 feature frame (plus the replayed prediction log)"""
+    # Load data (dari cache kolumnar ter-mmap jika tersedia, lihat data_cache.py)
+    df = load_frame(data_path, use_cache=data_cache)
+    print(df.head())
+    print(df.info())
+    print(df.describe())
+
+    # Skew dan Kurtosis
+    numeric_df = df.select_dtypes(include=['number'])
+    print("Skewness:\n", numeric_df.skew())
+    print("Kurtosis:\n", numeric_df.kurt())
+
+    # Missing value check
+    missing_values = df.isnull().sum()
+    print("Missing values:\n", missing_values[missing_values > 0])
+
+    # Persiapan data untuk unsupervised learning
+    # (kolom cache bertipe int16/float32, training tetap dihitung dalam float64)
+    X = df[features].astype(np.float64)
+    if replay_log:
+        # Input yang tercatat di log prediksi (prediction_log.py) ikut dipakai sebagai data training
+        logged = list(iter_logged_features(replay_log))
+        if logged:
+            X = pd.concat([X, pd.DataFrame(np.concatenate(logged), columns=features)], ignore_index=True)
+        print(f"[INFO] Replay log prediksi {replay_log}: {sum(len(c) for c in logged)} sampel ditambahkan")
+    return {"df": df, "X": X}
+
+
+def stage_scale(loaded):
+    """StandardScaler fit, scaled matrix and per-feature training ranges"""
+    X = loaded["X"]
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    print(f"Dataset shape: {X_scaled.shape}")
+    print(f"Number of features: {len(features)}")
+    return {"scaler": scaler, "X_scaled": X_scaled, "ranges": training_ranges(X.to_numpy()), "n_samples": len(X)}
+
+
+def stage_sweep(scaled, silhouette_sample=None, silhouette_repeats=5, n_jobs=None):
+    """KMeans for every candidate k, scored with the (exact or sampled) silhouette"""
+    # Menentukan jumlah cluster optimal menggunakan Elbow Method dan Silhouette Score
+    print("[INFO] Mencari jumlah cluster optimal...")
+    sweep, models, wall_seconds, n_jobs = run_k_sweep(
+        scaled["X_scaled"], n_jobs=n_jobs, silhouette_sample=silhouette_sample, silhouette_repeats=silhouette_repeats)
+    print_sweep_report(sweep, wall_seconds, n_jobs, silhouette_sample)
+    return {"sweep": sweep, "models": models}
+
+
+def stage_fit(swept, scaled):
+    """Model with the best silhouette score, evaluated with Davies-Bouldin"""
+    sweep = swept["sweep"]
+    # Pilih jumlah cluster dengan silhouette score tertinggi
+    optimal_k = int(sweep["silhouette"].idxmax())
+    best = sweep.loc[optimal_k]
+    print(f"[INFO] Jumlah cluster optimal: {optimal_k} (Silhouette Score: {best.silhouette:.4f}, "
+          f"95% CI [{best.silhouette_ci_low:.4f}, {best.silhouette_ci_high:.4f}], "
+          f"menang di {best.win_rate:.0%} sample)")
+
+    # Model K-Means dengan jumlah cluster optimal sudah dilatih saat k-sweep
+    # (parameter dan random_state sama), jadi tidak perlu fit ulang
+    print(f"[INFO] Training K-Means dengan {optimal_k} clusters...")
+    kmeans_model = swept["models"][optimal_k]
+
+    # Evaluasi clustering (silhouette diambil dari k-sweep)
+    silhouette_avg = float(best.silhouette)
+    davies_bouldin = float(davies_bouldin_score(scaled["X_scaled"], kmeans_model.labels_))
+    print(f"[INFO] Silhouette Score: {silhouette_avg:.4f}")
+    print(f"[INFO] Davies-Bouldin Score: {davies_bouldin:.4f}")
+    return {"model": kmeans_model, "k": optimal_k, "silhouette": silhouette_avg, "davies_bouldin": davies_bouldin}
+
+
+def stage_profile(fitted, scaled):
+    """Cluster centers in original units and the cluster profile table"""
+    # Analisis karakteristik setiap cluster
+    print("[INFO] Karakteristik Cluster:")
+    cluster_centers_original = scaled["scaler"].inverse_transform(fitted["model"].cluster_centers_)
+    cluster_info = pd.DataFrame(cluster_centers_original, columns=features)
+    cluster_info.index = [f'Cluster {i}' for i in range(fitted["k"])]
+    print(cluster_info)
+    return {"cluster_info": cluster_info,
+            "cluster_table": build_cluster_table(cluster_info[features].to_numpy().tolist())}
+
+
+def stage_export(scaled, swept, fitted, profiled, centroid_index="auto"):
+    """Write the model artifacts, the k-sweep table and feature_ranges.json"""
+    # Simpan model dan informasi cluster
+    metadata = {"silhouette": fitted["silhouette"], "davies_bouldin": fitted["davies_bouldin"]}
+    save_artifacts(scaled["scaler"], fitted["model"], profiled["cluster_info"], metadata=metadata,
+                   centroid_index=centroid_index, cluster_table=profiled["cluster_table"])
+    save_sweep(swept["sweep"])
+    # Rentang data training per fitur (flag out_of_distribution di API, lihat feature_schema.py)
+    save_training_ranges(scaled["ranges"], scaled["n_samples"])
+    print(f"[INFO] Rentang fitur disimpan ke {FEATURE_RANGES_PATH}")
+    return {"k": fitted["k"], **metadata}
+
+
+def stage_plots(loaded, exported, max_points=5000, out_dir=folder_plots, n_jobs=None):
+    """Diagnostic plots from the exported artifacts"""
+    run_diagnostics(loaded["df"], load_bundle(BUNDLE_PATH), load_sweep(), out_dir, max_points=max_points,
+                    n_jobs=n_jobs)
+    return sorted(os.listdir(out_dir))
+
+
+def train_full(data_path, n_jobs=None, silhouette_sample=None, silhouette_repeats=5,
+               plots=True, plot_jobs=None, max_plot_points=5000, centroid_index="auto", data_cache=True,
+               replay_log=None, stage_cache=STAGE_CACHE_DIR, rerun=()):
+    """In-memory training as cached stages (load, scale, sweep, fit, profile, export, plots), see pipeline.py"""
+    start = time.perf_counter()
+    source = data_fingerprint(data_path, data_cache, replay_log)
+    print(f"[INFO] Fingerprint data {data_path}: sha256 {source['sha256'][:16]}... "
+          f"({time.perf_counter() - start:.2f} s)")
+
+    pipeline = Pipeline(stage_cache or STAGE_CACHE_DIR, enabled=bool(stage_cache), rerun=rerun)
+    pipeline.add("load", stage_load, salt=source, store=False,
+                 params={"data_path": data_path, "data_cache": data_cache, "replay_log": replay_log})
+    pipeline.add("scale", stage_scale, ["load"])
+    # n_jobs tidak mengubah hasil k-sweep, jadi tidak ikut key
+    pipeline.add("sweep", partial(stage_sweep, n_jobs=n_jobs), ["scale"], code=(run_k_sweep, _evaluate_k),
+                 salt={"k_range": list(K_range)},
+                 params={"silhouette_sample": silhouette_sample, "silhouette_repeats": silhouette_repeats})
+    pipeline.add("fit", stage_fit, ["sweep", "scale"])
+    pipeline.add("profile", stage_profile, ["fit", "scale"], code=(cluster_profile,))
+    pipeline.add("export", stage_export, ["scale", "sweep", "fit", "profile"],
+                 code=(save_artifacts, save_sweep, build_centroid_index, model_bundle, centroid_index_module),
+                 params={"centroid_index": centroid_index}, outputs=EXPORT_OUTPUTS)
+    pipeline.add("plots", partial(stage_plots, n_jobs=plot_jobs), ["load", "export"], code=(diagnostics,),
+                 params={"max_points": max_plot_points, "out_dir": folder_plots},
+                 outputs=[os.path.join(folder_plots, f"{plot.__name__}.png") for plot in diagnostics.PLOTS])
+
+    # Plot dibuat terpisah dari artefak yang baru disimpan (bisa dimatikan dengan --no-plots)
+    exported = pipeline.run(*(["export", "plots"] if plots else ["export"]))[0]
+    print(f"\n[INFO] Model: {exported['k']} cluster, Silhouette Score {exported['silhouette']:.4f}, "
+          f"Davies-Bouldin Score {exported['davies_bouldin']:.4f}")
+    pipeline.print_report()
+    pipeline.save_report(data=data_path, data_sha256=source["sha256"])
+    print(f"[INFO] Laporan disimpan ke {REPORT_PATH}")
+
+
+def iter_chunks(data_path, chunk_size, data_cache=True, replay_log=None):
+    """Yield the feature columns of a CSV (then of the prediction log, if given) as float64 arrays"""
+    yield from iter_csv_chunks(data_path, chunk_size, data_cache)
+    if replay_log:
+        yield from iter_logged_features(replay_log, chunk_size)
+
+
+def iter_csv_chunks(data_path, chunk_size, data_cache=True):
+    """Yield the feature columns of a CSV as float64 arrays, chunk_size rows at a time"""
+    if data_cache:
+        try:
+            cache = open_cache(data_path)
+        except (ValueError, OSError) as e:
+            print(f"[INFO] Cache data tidak dipakai ({e}), membaca CSV langsung")
+        else:
+            yield from cache.iter_chunks(chunk_size, features)
+            return
+    for chunk in pd.read_csv(data_path, usecols=features, chunksize=chunk_size):
+        yield chunk[features].to_numpy(dtype=np.float64)
+
+
+def train_streaming(data_path, chunk_size, epochs=1, sample_size=20_000, random_state=42, centroid_index="auto",
+                    data_cache=True, replay_log=None, batch_size=4096):
+    """Out-of-core training: incremental StandardScaler and MiniBatchKMeans over CSV chunks"""
+    rng = np.random.default_rng(random_state)
+
+    # Pass 1: statistik scaler secara incremental + reservoir sample untuk evaluasi
+    print(f"\n[INFO] Mode streaming: chunk {chunk_size} baris, {epochs} epoch")
+    scaler = StandardScaler()
+    sample = np.empty((sample_size, len(features)), dtype=np.float64)
+    n_seen = 0
+    low = np.full(len(features), np.inf)
+    high = np.full(len(features), -np.inf)
+    for X_chunk in iter_chunks(data_path, chunk_size, data_cache, replay_log):
+        scaler.partial_fit(X_chunk)
+        low = np.fmin(low, np.nanmin(X_chunk, axis=0))
+        high = np.fmax(high, np.nanmax(X_chunk, axis=0))
+
+        # Reservoir sampling (Algorithm R) secara vectorized per chunk
+        n = len(X_chunk)
+        n_fill = max(0, min(sample_size - n_seen, n))
+        sample[n_seen:n_seen + n_fill] = X_chunk[:n_fill]
+        if n_fill < n:
+            idx = np.arange(n_seen + n_fill, n_seen + n)
+            slots = rng.integers(0, idx + 1)
+            keep = slots < sample_size
+            sample[slots[keep]] = X_chunk[n_fill:][keep]
+        n_seen += n
+    sample = sample[:min(n_seen, sample_size)]
+    print(f"[INFO] Total data: {n_seen} baris, sample evaluasi: {len(sample)} baris")
+    save_training_ranges({f: (float(lo), float(hi)) for f, lo, hi in zip(features, low, high)}, n_seen)
+    print(f"[INFO] Rentang fitur disimpan ke {FEATURE_RANGES_PATH}")
+
+    # Pass 2..: satu MiniBatchKMeans per kandidat k, di-update dari chunk yang sama. Setiap chunk diacak lalu
+    # dipotong per batch_size baris: satu partial_fit = satu langkah mini-batch, bukan satu langkah per chunk
+    batch_size = min(chunk_size, batch_size)
+    models = {k: MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3, batch_size=batch_size)
+              for k in K_range}
+    for epoch in range(epochs):
+        for X_chunk in iter_chunks(data_path, chunk_size, data_cache, replay_log):
+            X_chunk_scaled = scaler.transform(X_chunk)[rng.permutation(len(X_chunk))]
+            for start in range(0, len(X_chunk_scaled), batch_size):
+                X_batch = X_chunk_scaled[start:start + batch_size]
+                for model in models.values():
+                    model.partial_fit(X_batch)
+        print(f"[INFO] Epoch {epoch + 1}/{epochs} selesai")
+
+    # Pilih k dengan silhouette score tertinggi, dihitung pada reservoir sample
+    sample_scaled = scaler.transform(sample)
+    inertias = []
+    silhouette_scores = []
+    for k, model in models.items():
+        labels = model.predict(sample_scaled)
+        inertias.append(-model.score(sample_scaled))
+        silhouette_scores.append(silhouette_score(sample_scaled, labels))
+        print(f"  k={k}: inertia(sample)={inertias[-1]:.2f}, silhouette(sample)={silhouette_scores[-1]:.4f}")
+
+    optimal_k = K_range[np.argmax(silhouette_scores)]
+    kmeans_model = models[optimal_k]
+    print(f"[INFO] Jumlah cluster optimal: {optimal_k} (Silhouette Score: {max(silhouette_scores):.4f})")
+    sweep = pd.DataFrame({"inertia": inertias, "silhouette": silhouette_scores}, index=pd.Index(K_range, name="k"))
+
+    sample_labels = kmeans_model.predict(sample_scaled)
+    silhouette_avg = silhouette_score(sample_scaled, sample_labels)
+    davies_bouldin = davies_bouldin_score(sample_scaled, sample_labels)
+    print(f"[INFO] Silhouette Score (sample): {silhouette_avg:.4f}")
+    print(f"[INFO] Davies-Bouldin Score (sample): {davies_bouldin:.4f}")
+
+    # Analisis karakteristik setiap cluster
+    print("\n[INFO] Karakteristik Cluster:")
+    cluster_centers_original = scaler.inverse_transform(kmeans_model.cluster_centers_)
+    cluster_info = pd.DataFrame(cluster_centers_original, columns=features)
+    cluster_info.index = [f'Cluster {i}' for i in range(optimal_k)]
+    print(cluster_info)
+
+    save_artifacts(scaler, kmeans_model, cluster_info,
+                   metadata={"mode": "streaming", "n_samples": n_seen, "chunk_size": chunk_size,
+                             "batch_size": batch_size, "silhouette": float(silhouette_avg),
+                             "davies_bouldin": float(davies_bouldin)},
+                   centroid_index=centroid_index)
+    save_sweep(sweep)
+    print("[INFO] Plot tidak dibuat pada mode streaming, jalankan diagnostics.py secara terpisah.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Training model clustering SoilSense")
+    parser.add_argument("--data", default="data_core.csv", help="Path CSV data training")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Baca CSV per chunk: StandardScaler.partial_fit + MiniBatchKMeans (untuk data > RAM)")
+    parser.add_argument("--chunk-size", type=int, default=100_000,
+                        help="Jumlah baris per chunk pada mode streaming (membatasi pemakaian memori)")
+    parser.add_argument("--batch-size", type=int, default=4096,
+                        help="Ukuran mini-batch MiniBatchKMeans.partial_fit; chunk dipotong per batch (mode streaming)")
+    parser.add_argument("--epochs", type=int, default=1,
+                        help="Jumlah pass MiniBatchKMeans atas seluruh data (mode streaming)")
+    parser.add_argument("--sample-size", type=int, default=20_000,
+                        help="Ukuran reservoir sample untuk silhouette / Davies-Bouldin (mode streaming)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Jumlah process untuk k-sweep (default: jumlah core, 1 = sequential)")
+    parser.add_argument("--silhouette-sample", type=int, default=None,
+                        help="Estimasi silhouette dari sample berukuran ini (default: exact pada seluruh data)")
+    parser.add_argument("--silhouette-repeats", type=int, default=5,
+                        help="Jumlah sample silhouette (seed tetap) untuk interval kepercayaan")
+    parser.add_argument("--no-plots", action="store_true",
+                        help="Lewati semua plot diagnostik (jalankan diagnostics.py terpisah bila perlu)")
+    parser.add_argument("--plot-jobs", type=int, default=None, help="Jumlah process untuk render plot")
+    parser.add_argument("--max-plot-points", type=int, default=5000,
+                        help="Jumlah titik maksimum untuk scatter PCA dan pairplot")
+    parser.add_argument("--centroid-index", choices=["auto", "always", "never"], default="auto",
+                        help=f"Simpan index IVF nearest-centroid di model bundle (auto: k >= {INDEX_MIN_CLUSTERS})")
+    parser.add_argument("--no-data-cache", action="store_true",
+                        help="Baca CSV langsung tanpa cache kolumnar (data_cache.py)")
+    parser.add_argument("--replay-log", default=None,
+                        help="Direktori log prediksi (prediction_log.py) yang inputnya ikut dipakai untuk training")
+    parser.add_argument("--stage-cache", default=STAGE_CACHE_DIR,
+                        help="Direktori cache hasil per tahap (pipeline.py)")
+    parser.add_argument("--no-stage-cache", action="store_true",
+                        help="Jalankan semua tahap tanpa membaca / menulis cache tahap")
+    parser.add_argument("--rerun", nargs="+", default=(), choices=STAGES,
+                        help="Paksa hitung ulang tahap ini (dan tahap sesudahnya) walaupun ada di cache")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.streaming:
+        train_streaming(args.data, args.chunk_size, args.epochs, args.sample_size,
+                        centroid_index=args.centroid_index, data_cache=not args.no_data_cache,
+                        replay_log=args.replay_log, batch_size=args.batch_size)
+    else:
+        train_full(args.data, args.jobs, args.silhouette_sample, args.silhouette_repeats,
+                   plots=not args.no_plots, plot_jobs=args.plot_jobs, max_plot_points=args.max_plot_points,
+                   centroid_index=args.centroid_index, data_cache=not args.no_data_cache,
+                   replay_log=args.replay_log, stage_cache=None if args.no_stage_cache else args.stage_cache,
+                   rerun=args.rerun)